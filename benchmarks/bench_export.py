@@ -0,0 +1,70 @@
+"""JSONL导出吞吐量基准测试
+
+把一段日期区间（默认1950-2100年）的每日数据导出为JSONL并丢弃输出，
+报告每秒导出的天数。第一次运行包含农历朔日/节气表的计算，之后的运行使用已计算好的表。
+节假日数据只使用配置文件中的自定义节日，不访问网络。
+
+用法：
+    python benchmarks/bench_export.py [--start 1950] [--end 2100] [--runs 3] [--min-rate 20000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chinese_calendar import CompiledConfig, DayExporter, iter_day_records  # noqa: E402
+
+
+class NullSink:
+    """丢弃写入内容，只统计字节数"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def export_once(start, end, config):
+    """导出一次，返回 (天数, 字节数, 耗时)"""
+    sink = NullSink()
+    began = time.perf_counter()
+    records = iter_day_records(start, end, {"holidays": {}, "workdays": {}},
+                               config.solar_holidays, config.lunar_holidays)
+    days = DayExporter.write('jsonl', records, sink)
+    return days, sink.size, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description='chinese_calendar JSONL导出吞吐量基准测试')
+    parser.add_argument('--start', type=int, default=1950, help='开始年份')
+    parser.add_argument('--end', type=int, default=2100, help='结束年份（含）')
+    parser.add_argument('--runs', type=int, default=3, help='计算好农历表之后的测量次数')
+    parser.add_argument('--min-rate', type=float, default=20000, help='最低吞吐量（天/秒，取中位数比较）')
+    parser.add_argument('--config', default=os.path.join(ROOT, 'config.json'), help='配置文件路径')
+    args = parser.parse_args()
+
+    config = CompiledConfig.load(args.config)
+    start, end = date(args.start, 1, 1), date(args.end, 12, 31)
+
+    days, size, cold = export_once(start, end, config)
+    print(f"{args.start}-{args.end}年共 {days} 天，{size / 1024 / 1024:.1f} MB")
+    print(f"首次导出（含农历表计算）：{cold:.2f} s，{days / cold:,.0f} 天/秒")
+
+    rates = [days / export_once(start, end, config)[2] for _ in range(args.runs)]
+    rate = statistics.median(rates)
+    print(f"JSONL导出：{rate:,.0f} 天/秒（中位数，最低要求 {args.min_rate:,.0f} 天/秒）")
+
+    if rate < args.min_rate:
+        print("低于吞吐量要求")
+        sys.exit(1)
+    print("通过")
+
+
+if __name__ == "__main__":
+    main()
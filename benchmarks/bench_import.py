@@ -0,0 +1,77 @@
+"""导入耗时基准测试
+
+多次在新进程中执行 `import chinese_calendar`，取中位数与预算比较，
+同时检查导入时没有加载openpyxl、PIL、requests、lunar_python等第三方库。
+
+用法：
+    python benchmarks/bench_import.py [--runs 10] [--budget 0.1]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入本模块时不应加载的第三方库
+HEAVY_MODULES = ('openpyxl', 'PIL', 'requests', 'lunar_python', 'numpy', 'win32com')
+
+PROBE = (
+    "import sys, chinese_calendar; "
+    "print(','.join(sorted({m.split('.')[0] for m in sys.modules} & set(%r))))" % (HEAVY_MODULES,)
+)
+
+
+def measure(runs):
+    """返回每次导入的耗时（秒，包含解释器启动）以及导入时加载的第三方库"""
+    durations = []
+    loaded = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        durations.append(time.perf_counter() - start)
+        loaded = result.stdout.strip()
+    return durations, loaded
+
+
+def measure_baseline(runs):
+    """空解释器的启动耗时，用于扣除"""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='chinese_calendar 导入耗时基准测试')
+    parser.add_argument('--runs', type=int, default=10, help='测量次数')
+    parser.add_argument('--budget', type=float, default=0.1, help='导入耗时预算（秒，已扣除解释器启动）')
+    args = parser.parse_args()
+
+    durations, loaded = measure(args.runs)
+    startup = statistics.median(measure_baseline(args.runs))
+    median = statistics.median(durations)
+    import_time = max(median - startup, 0.0)
+
+    print(f"解释器启动：{startup * 1000:.1f} ms")
+    print(f"import chinese_calendar：{import_time * 1000:.1f} ms（中位数，预算 {args.budget * 1000:.0f} ms）")
+
+    failed = False
+    if loaded:
+        print(f"导入时加载了第三方库：{loaded}")
+        failed = True
+    if import_time > args.budget:
+        print("超出导入耗时预算")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("通过")
+
+
+if __name__ == "__main__":
+    main()
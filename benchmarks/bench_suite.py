@@ -0,0 +1,253 @@
+"""生成日历的基准测试套件
+
+离线运行，节假日数据使用 benchmarks/fixtures/chinese-days.json（2024-2025年），
+"休"字图片等缓存写入临时目录，不读写用户的缓存目录。
+每个测试在新的进程中运行：第一次为冷启动（包含农历表计算、"休"字图片绘制等），
+之后重复运行取耗时中位数，再单独运行一次用tracemalloc测量峰值内存。
+
+测试项目：
+    lunar   逐日调用get_lunar_date和is_holiday（2024-2025年）
+    month   generate_excel_calendar生成单月日历
+    year    generate_year_calendar生成全年日历
+    batch   generate_years逐年生成多个年份（单进程）
+    stream  generate_stream_calendar把多个年份流式写入一个文件
+
+结果与基准结果（默认为 benchmarks/baseline.json）比较，耗时、峰值内存或文件大小
+超过基准的比例大于--threshold时视为性能退化。
+
+用法：
+    python benchmarks/bench_suite.py [--cases month,year] [--repeat 5] [--threshold 0.25]
+    python benchmarks/bench_suite.py --save-baseline    # 保存本机结果作为基准
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, 'benchmarks', 'fixtures', 'chinese-days.json')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+BATCH_YEARS = list(range(2020, 2028))
+
+# 与基准结果比较的指标
+METRICS = (('seconds', '耗时'), ('peak_kb', '峰值内存'), ('size', '文件大小'))
+
+
+def output_size(directory):
+    """目录中生成的Excel文件总大小"""
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory) if name.endswith(('.xlsx', '.xlsm')))
+
+
+def case_lunar(cc, config, directory):
+    cal = cc.ChineseCalendar(2024, 1, config=config)
+    day = date(2024, 1, 1)
+    while day.year < 2026:
+        cal.get_lunar_date(day)
+        cal.is_holiday(day)
+        day += timedelta(days=1)
+    return None
+
+
+def case_month(cc, config, directory):
+    cal = cc.ChineseCalendar(2025, 1, config=config)
+    if not cal.generate_excel_calendar(os.path.join(directory, 'calendar.xlsx')):
+        raise RuntimeError('generate_excel_calendar 失败')
+    return output_size(directory)
+
+
+def case_year(cc, config, directory):
+    cal = cc.ChineseCalendar(2025, 1, config=config)
+    if not cal.generate_year_calendar(2025, os.path.join(directory, 'calendar_2025.xlsx')):
+        raise RuntimeError('generate_year_calendar 失败')
+    return output_size(directory)
+
+
+def case_batch(cc, config, directory):
+    pattern = os.path.join(directory, 'calendar_{year}.xlsx')
+    results = cc.generate_years(BATCH_YEARS, config, jobs=1, filename_pattern=pattern)
+    if not all(ok for _, _, ok in results):
+        raise RuntimeError('generate_years 失败')
+    return output_size(directory)
+
+
+def case_stream(cc, config, directory):
+    cal = cc.ChineseCalendar(2025, 1, config=config)
+    if not cal.generate_stream_calendar(BATCH_YEARS, os.path.join(directory, 'calendars.xlsx')):
+        raise RuntimeError('generate_stream_calendar 失败')
+    return output_size(directory)
+
+
+CASES = {
+    'lunar': case_lunar,
+    'month': case_month,
+    'year': case_year,
+    'batch': case_batch,
+    'stream': case_stream,
+}
+
+
+def run_case(name, repeat, workdir):
+    """在当前进程中运行一个测试（由子进程调用），返回结果字典"""
+    sys.path.insert(0, ROOT)
+    import chinese_calendar as cc
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        holiday_data = json.load(f)
+    config = cc.CompiledConfig.load(os.path.join(ROOT, 'config.json')).merged(
+        {'holiday_data': {'cache_dir': os.path.join(workdir, 'cache')}})
+    cc.HolidayDataStore.install(holiday_data)
+    case = CASES[name]
+
+    def run(index):
+        directory = os.path.join(workdir, f'run{index}')
+        os.makedirs(directory)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return case(cc, config, directory)
+
+    times = []
+    phases = {}
+    size = None
+    for i in range(repeat + 1):
+        cc.metrics.reset()
+        start = time.perf_counter()
+        size = run(i)
+        times.append(time.perf_counter() - start)
+        if i == 0:
+            phases = {phase: entry['seconds'] for phase, entry in cc.metrics.snapshot()['phases'].items()}
+
+    tracemalloc.start()
+    run('memory')
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'cold': round(times[0], 4),
+        'seconds': round(statistics.median(times[1:]), 4),
+        'peak_kb': peak // 1024,
+        'size': size,
+        'phases': phases,
+    }
+
+
+def run_isolated(name, repeat):
+    """在新进程中运行一个测试"""
+    workdir = tempfile.mkdtemp(prefix='chinese_calendar_bench_')
+    try:
+        result_path = os.path.join(workdir, 'result.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name,
+                        '--repeat', str(repeat), '--workdir', workdir, '--result', result_path],
+                       cwd=workdir, check=True)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, threshold):
+    """与基准结果比较，返回退化的项目列表"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key, label in METRICS:
+            old, new = base.get(key), result.get(key)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append(f"{name} {label}：{old} -> {new}（+{(new / old - 1) * 100:.0f}%）")
+    return regressions
+
+
+def pad(text, width):
+    """按显示宽度右对齐（中文字符占两列）"""
+    text = str(text)
+    size = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    return " " * max(width - size, 0) + text
+
+
+def print_table(results, baseline):
+    widths = (8, 12, 12, 12, 14, 12)
+    header = ('测试', '冷启动(秒)', '耗时(秒)', '基准(秒)', '峰值内存(KB)', '文件大小')
+    print(header[0].ljust(widths[0] - 2) + "".join(pad(text, width) for text, width in zip(header[1:], widths[1:])))
+    for name, result in results.items():
+        base = baseline.get(name, {}).get('seconds')
+        row = (f"{result['cold']:.3f}", f"{result['seconds']:.3f}", '-' if base is None else f"{base:.3f}",
+               result['peak_kb'], '-' if result['size'] is None else result['size'])
+        print(name.ljust(widths[0]) + "".join(pad(text, width) for text, width in zip(row, widths[1:])))
+    print()
+    for name, result in results.items():
+        top = sorted(result['phases'].items(), key=lambda item: -item[1])[:5]
+        print(f"{name} 冷启动各阶段：" + "，".join(f"{phase} {seconds:.3f}s" for phase, seconds in top))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='chinese_calendar 基准测试套件')
+    parser.add_argument('--cases', default=','.join(CASES), help='要运行的测试，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=5, help='冷启动之后重复运行的次数')
+    parser.add_argument('--threshold', type=float, default=0.25, help='超过基准的比例大于该值时视为退化')
+    parser.add_argument('--baseline', default=BASELINE, help='基准结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基准结果')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_case(args.child, args.repeat, args.workdir)
+        with open(args.result, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    names = [name.strip() for name in args.cases.split(',') if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"未知的测试：{', '.join(unknown)}")
+
+    results = {name: run_isolated(name, args.repeat) for name in names}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results, baseline)
+
+    if args.save_baseline:
+        saved = dict(baseline)
+        saved.update({name: {key: result[key] for key, _ in METRICS} for name, result in results.items()})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'results': saved}, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"\n已保存基准结果到 {args.baseline}")
+        return
+
+    if not baseline:
+        print("\n没有基准结果，可以使用 --save-baseline 保存本机结果")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n以下项目超过基准 {args.threshold * 100:.0f}% 以上：")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\n通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,150 +1,3009 @@
-from datetime import datetime, timedelta
-from lunar_python import Lunar
+from datetime import datetime, timedelta, date
+from array import array
+from collections import namedtuple, OrderedDict
 import calendar
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, NamedStyle
-from openpyxl.styles.numbers import FORMAT_TEXT
-import requests
-from PIL import Image, ImageDraw, ImageFont
-from openpyxl.drawing.image import Image as XLImage
+import contextlib
 import io
 import json
 import os
-import win32com.client
+import re
+import struct
+import sys
 import time
+import threading
+from types import MappingProxyType
+
+__version__ = "1.1.0"
+
+# 第三方库（lunar_python、openpyxl、requests、PIL）都在用到的地方按需导入，
+# 只查询节假日时不会加载Excel和图片相关的库，非Windows系统上也可以正常导入本模块
+
+# 在线节假日数据地址
+HOLIDAY_DATA_URL = "https://cdn.jsdelivr.net/npm/chinese-days/dist/chinese-days.json"
+
+
+def default_cache_dir():
+    """获取默认缓存目录"""
+    if os.environ.get('CHINESE_CALENDAR_CACHE'):
+        return os.environ['CHINESE_CALENDAR_CACHE']
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'chinese_calendar')
+
+
+class ConfigError(ValueError):
+    """配置文件错误"""
+
+
+# 没有配置文件时使用的自定义节日
+DEFAULT_CUSTOM_HOLIDAYS = {
+    "solar": {
+        "0101": "元旦",
+        "0501": "劳动节",
+        "1001": "国庆节"
+    },
+    "lunar": {
+        "0101": "春节",
+        "0115": "元宵节",
+        "0505": "端午节",
+        "0815": "中秋节"
+    }
+}
+
+# 各种样式的设置，不适用的项为None
+TextStyle = namedtuple('TextStyle', [
+    'font_name', 'font_size', 'bold', 'font_color', 'fill_color', 'weekend_color', 'holiday_color'
+], defaults=(None,) * 7)
+RowHeights = namedtuple('RowHeights', ['title', 'weekday', 'date', 'lunar'])
+RestMarkConfig = namedtuple('RestMarkConfig', [
+    'width', 'height', 'offset_x', 'offset_y', 'font_name', 'font_size', 'color', 'rgb',
+    'text_offset_x', 'text_offset_y', 'svg_file', 'use_shape'
+])
+
+
+class CompiledConfig:
+    """编译后的配置（只读）
+
+    配置文件在启动时读取并检查一次：未知的配置项、错误的类型和颜色会立即报错，
+    缺省值在这里统一补齐，颜色预先解析好。渲染器和子进程都直接读取属性。
+    """
+
+    __slots__ = ('source', 'year', 'column_width', 'backend', 'holiday_data',
+                 'solar_holidays', 'lunar_holidays', 'title_style', 'weekday_style',
+                 'date_style', 'lunar_style', 'row_heights', 'rest_mark')
+
+    # 配置项的类型和缺省值
+    SCHEMA = {
+        'column_width': ('number', 10.5),
+        'year': ('year', 2025),
+        'holiday_data': {
+            'url': ('str', HOLIDAY_DATA_URL),
+            'mirrors': ('str_list', ()),
+            'files': ('str_list', ()),
+            'cache_dir': ('str?', None),
+            'ttl_hours': ('number', 24),
+            'timeout': ('number', 5),
+            'retry_minutes': ('number', 10),
+            'offline': ('bool', False),
+        },
+        'output': {
+            'backend': (('workbook', 'stream'), 'workbook'),
+        },
+        'styles': {
+            'title': {
+                'font_name': ('str', '微软雅黑'),
+                'font_size': ('number', 16),
+                'bold': ('bool', True),
+            },
+            'weekday': {
+                'font_name': ('str', '微软雅黑'),
+                'font_size': ('number', 10),
+                'bold': ('bool', True),
+                'fill_color': ('color', 'CCCCCC'),
+                'font_color': ('color?', None),
+            },
+            'date': {
+                'font_name': ('str', 'DINPro-Bold'),
+                'font_size': ('number', 16),
+                'weekend_color': ('color', 'FF0000'),
+            },
+            'lunar': {
+                'font_name': ('str', '华文细黑'),
+                'font_size': ('number', 8),
+                'weekend_color': ('color', 'FF0000'),
+                'holiday_color': ('color', '008000'),
+            },
+        },
+        'layout': {
+            'row_heights': {
+                'title': ('number', 30),
+                'weekday': ('number', 20),
+                'date': ('number', 30),
+                'lunar': ('number', 30),
+            },
+            'rest_mark': {
+                'width': ('number', 15),
+                'height': ('number', 15),
+                'offset_x': ('number', 44),
+                'offset_y': ('number', 0),
+                'font_name': ('str', '华文细黑'),
+                'font_size': ('number', 8),
+                'color': ('color', '008000'),
+                'text_offset_x': ('number', 3),
+                'text_offset_y': ('number', 2),
+                'svg_file': ('str?', '休.svg'),
+                'use_shape': ('bool', True),
+            },
+        },
+        'custom_holidays': {
+            'solar': ('holidays', {}),
+            'lunar': ('lunar_holidays', {}),
+        },
+    }
+
+    def __init__(self, config=None):
+        config = json.loads(json.dumps(config or {}))  # 复制一份，之后不受调用者修改的影响
+        values = self._resolve(self.SCHEMA, config, '')
+        styles = values['styles']
+        layout = values['layout']
+        rest_mark = layout['rest_mark']
+
+        # 星期标题没有设置字体颜色时使用与背景色相反的颜色
+        weekday = styles['weekday']
+        if weekday['font_color'] is None:
+            weekday['font_color'] = ''.join(
+                f"{255 - int(weekday['fill_color'][i:i + 2], 16):02X}" for i in (0, 2, 4))
+
+        assign = super().__setattr__
+        assign('source', config)
+        assign('year', values['year'])
+        assign('column_width', values['column_width'])
+        assign('backend', values['output']['backend'])
+        assign('holiday_data', MappingProxyType(values['holiday_data']))
+        assign('solar_holidays', MappingProxyType(values['custom_holidays']['solar']))
+        assign('lunar_holidays', MappingProxyType(values['custom_holidays']['lunar']))
+        assign('title_style', TextStyle(**styles['title']))
+        assign('weekday_style', TextStyle(**weekday))
+        assign('date_style', TextStyle(**styles['date']))
+        assign('lunar_style', TextStyle(**styles['lunar']))
+        assign('row_heights', RowHeights(**layout['row_heights']))
+        assign('rest_mark', RestMarkConfig(
+            rgb=tuple(int(rest_mark['color'][i:i + 2], 16) for i in (0, 2, 4)), **rest_mark))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("配置是只读的，请使用merged()创建新的配置")
+
+    def __reduce__(self):
+        # 传给子进程时只传原始配置，在子进程中重新编译
+        return (CompiledConfig, (self.source,))
+
+    @classmethod
+    def load(cls, config_file):
+        """读取并编译配置文件，文件不存在时使用默认配置"""
+        if not os.path.exists(config_file):
+            return cls({"column_width": 10.5, "year": 2025, "custom_holidays": DEFAULT_CUSTOM_HOLIDAYS})
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except ValueError as e:
+            raise ConfigError(f"配置文件 {config_file} 格式错误: {e}")
+        if not isinstance(config, dict):
+            raise ConfigError(f"配置文件 {config_file} 的内容应为JSON对象")
+        return cls(config)
+
+    def merged(self, overrides):
+        """返回合并了overrides（与配置文件结构相同）之后的新配置"""
+        def merge(base, extra):
+            result = dict(base)
+            for key, value in extra.items():
+                if isinstance(value, dict) and isinstance(result.get(key), dict):
+                    result[key] = merge(result[key], value)
+                else:
+                    result[key] = value
+            return result
+        return CompiledConfig(merge(self.source, overrides))
+
+    @classmethod
+    def _resolve(cls, schema, values, path):
+        """按schema检查配置并补齐缺省值"""
+        if not isinstance(values, dict):
+            raise ConfigError(f"配置项 {path.rstrip('.')} 应为JSON对象")
+        unknown = sorted(set(values) - set(schema))
+        if unknown:
+            raise ConfigError(f"未知的配置项: {', '.join(path + key for key in unknown)}")
+        result = {}
+        for key, spec in schema.items():
+            if isinstance(spec, dict):
+                result[key] = cls._resolve(spec, values.get(key, {}), f"{path}{key}.")
+            else:
+                kind, default = spec
+                result[key] = cls._check(kind, values[key], path + key) if key in values else default
+        return result
+
+    @staticmethod
+    def _check(kind, value, name):
+        """检查单个配置值，返回规范化后的值"""
+        if isinstance(kind, tuple):
+            if value not in kind:
+                raise ConfigError(f"配置项 {name} 的值应为 {' 或 '.join(kind)}，而不是 {value!r}")
+            return value
+        if kind.endswith('?'):
+            if value is None:
+                return None
+            kind = kind[:-1]
+        if kind in ('number', 'year'):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ConfigError(f"配置项 {name} 应为非负数，而不是 {value!r}")
+            if kind == 'year' and (not isinstance(value, int) or not 1 <= value <= 9999):
+                raise ConfigError(f"配置项 {name} 应为年份，而不是 {value!r}")
+            return value
+        if kind == 'bool':
+            if not isinstance(value, bool):
+                raise ConfigError(f"配置项 {name} 应为true或false，而不是 {value!r}")
+            return value
+        if kind == 'str':
+            if not isinstance(value, str):
+                raise ConfigError(f"配置项 {name} 应为字符串，而不是 {value!r}")
+            return value
+        if kind == 'str_list':
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ConfigError(f"配置项 {name} 应为字符串列表，而不是 {value!r}")
+            return tuple(value)
+        if kind == 'color':
+            if not isinstance(value, str) or not re.fullmatch(r'[0-9A-Fa-f]{6}', value):
+                raise ConfigError(f"配置项 {name} 应为6位十六进制颜色（如\"FF0000\"），而不是 {value!r}")
+            return value.upper()
+        if kind in ('holidays', 'lunar_holidays'):
+            if not isinstance(value, dict):
+                raise ConfigError(f"配置项 {name} 应为JSON对象")
+            for key, holiday in value.items():
+                if kind == 'holidays':
+                    if not re.fullmatch(r'(0[1-9]|1[0-2])(0[1-9]|[12][0-9]|3[01])', key):
+                        raise ConfigError(f"配置项 {name} 中的日期 {key!r} 应为MMDD格式，如\"0101\"")
+                elif not re.fullmatch(r'闰?(0[1-9]|1[0-2])([012][0-9]|30)', key):
+                    raise ConfigError(f"配置项 {name} 中的日期 {key!r} 应为MMDD或闰MMDD格式，"
+                                      f"日为00表示该月最后一天，如\"1200\"为除夕")
+                if not isinstance(holiday, str):
+                    raise ConfigError(f"配置项 {name}.{key} 应为节日名称")
+            return dict(value)
+        raise ValueError(kind)
+
+
+class Metrics:
+    """分阶段计时和计数
+
+    phase()包住一个阶段，累计次数和耗时（嵌套的阶段各自计时）；count()累加计数器；
+    observe()记录一个取样值（如队列深度），报告其平均值和最大值。
+    add_listener()注册的回调在每次记录时调用：callback(kind, name, value)，
+    kind为"phase"时value为本次耗时（秒），为"count"时value为增量，为"gauge"时value为取样值，
+    可以用来转发到自己的监控系统。
+    """
+
+    def __init__(self):
+        self.phases = {}    # 名称 -> [次数, 累计耗时]
+        self.counters = {}  # 名称 -> 计数
+        self.gauges = {}    # 名称 -> [取样次数, 累计值, 最大值]
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """注册回调"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """取消注册回调"""
+        self.listeners.remove(callback)
+
+    def count(self, name, n=1):
+        """累加计数器"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        for listener in self.listeners:
+            listener('count', name, n)
+
+    def record_phase(self, name, seconds, calls=1):
+        """记录一个阶段的耗时"""
+        with self._lock:
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        for listener in self.listeners:
+            listener('phase', name, seconds)
+
+    def observe(self, name, value, samples=1, total=None):
+        """记录取样值"""
+        with self._lock:
+            entry = self.gauges.setdefault(name, [0, 0, 0])
+            entry[0] += samples
+            entry[1] += value if total is None else total
+            entry[2] = max(entry[2], value)
+        for listener in self.listeners:
+            listener('gauge', name, value)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """计时一个阶段：with metrics.phase('save'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def reset(self):
+        """清空已记录的数据（回调保留）"""
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def snapshot(self):
+        """当前数据，格式为 {"phases": {名称: {"calls", "seconds"}}, "counters": {名称: 计数},
+        "gauges": {名称: {"samples", "mean", "max"}}}"""
+        with self._lock:
+            return {
+                'phases': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                           for name, (calls, seconds) in self.phases.items()},
+                'counters': dict(sorted(self.counters.items())),
+                'gauges': {name: {'samples': samples, 'mean': round(total / samples, 3), 'max': peak}
+                           for name, (samples, total, peak) in sorted(self.gauges.items())},
+            }
+
+    def merge(self, snapshot):
+        """合并其他进程的snapshot()"""
+        for name, entry in snapshot['phases'].items():
+            self.record_phase(name, entry['seconds'], entry['calls'])
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+        for name, entry in snapshot.get('gauges', {}).items():
+            self.observe(name, entry['max'], entry['samples'], entry['mean'] * entry['samples'])
+
+    def report(self, fmt='table'):
+        """生成报告，fmt为"table"或"json"
+        """
+        data = self.snapshot()
+        if fmt == 'json':
+            return json.dumps(data, ensure_ascii=False, indent=2)
+
+        lines = [f"{'阶段':<22}{'次数':>8}{'耗时(秒)':>11}"]
+        phases = sorted(data['phases'].items(), key=lambda item: -item[1]['seconds'])
+        for name, entry in phases:
+            lines.append(f"{name:<24}{entry['calls']:>10}{entry['seconds']:>14.3f}")
+        lines.append("")
+        lines.append(f"{'计数器':<21}{'数量':>8}")
+        for name, n in data['counters'].items():
+            lines.append(f"{name:<24}{n:>10}")
+        if data['gauges']:
+            lines.append("")
+            lines.append(f"{'取样值':<21}{'次数':>8}{'平均':>8}{'最大':>8}")
+            for name, entry in data['gauges'].items():
+                lines.append(f"{name:<24}{entry['samples']:>10}{entry['mean']:>10.2f}{entry['max']:>10}")
+        return "\n".join(lines)
+
+
+# 进程内共享的计时和计数
+metrics = Metrics()
+
+
+class Pipeline:
+    """按阶段运行的线程流水线
+
+    每个阶段在自己的线程中依次处理上一阶段的输出，阶段之间用有界队列连接（下游来不及处理时上游等待），
+    各阶段同时进行：如下载节假日数据时计算农历表，写出前面的月份时计算后面月份的版面。
+    每个阶段的耗时记为"pipeline.<阶段>"（不含等待队列的时间），每次放入队列时取样队列深度
+    "queue.<阶段>"（<阶段>为接收方，最后一个阶段的输出为"queue.output"）：
+    深度经常接近maxsize说明接收方最慢，经常为0说明接收方在等上游。
+    """
+
+    _DONE = object()
+
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self.stages = []      # (名称, 函数)
+        self.background = []  # (名称, 函数)
+        self._errors = []
+        self._stop = threading.Event()
+
+    def add_stage(self, name, func):
+        """添加阶段，func(item)返回（或逐个yield）交给下一阶段的结果"""
+        self.stages.append((name, func))
+        return self
+
+    def add_task(self, name, func):
+        """添加与各阶段同时运行的单个任务func()，如预先下载数据"""
+        self.background.append((name, func))
+        return self
+
+    def _put(self, queue, name, item):
+        from queue import Full
+
+        metrics.observe(f"queue.{name}", queue.qsize())
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _get(self, queue):
+        """从队列中取出一项；已停止时返回_DONE，不会一直等待已经退出的上游"""
+        from queue import Empty
+
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                continue
+        return self._DONE
+
+    def _close(self, queue):
+        """向下游发送结束标记；已停止时各阶段自行退出，不再等待队列空出位置"""
+        from queue import Full
+
+        while not self._stop.is_set():
+            try:
+                queue.put(self._DONE, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def _run_task(self, name, func):
+        try:
+            with metrics.phase(f"pipeline.{name}"):
+                func()
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _run_stage(self, name, func, inbox, outbox, outbox_name):
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is self._DONE:
+                    break
+                # 只计算处理的时间，不包括等待下游队列的时间
+                elapsed = 0.0
+                start = time.perf_counter()
+                results = iter(func(item))
+                for result in results:
+                    elapsed += time.perf_counter() - start
+                    if not self._put(outbox, outbox_name, result):
+                        return
+                    start = time.perf_counter()
+                metrics.record_phase(f"pipeline.{name}", elapsed + time.perf_counter() - start)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._close(outbox)
+
+    def run(self, items):
+        """立即启动流水线，返回逐个产生最后一个阶段结果的迭代器；某个阶段出错时停止，读取结果时抛出该异常"""
+        from queue import Queue
+
+        names = [name for name, _ in self.stages] + ['output']
+        queues = [Queue(self.maxsize) for _ in names]
+        threads = [threading.Thread(target=self._run_task, args=task, daemon=True) for task in self.background]
+        for i, (name, func) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage, daemon=True,
+                                            args=(name, func, queues[i], queues[i + 1], names[i + 1])))
+        for thread in threads:
+            thread.start()
+
+        def feed():
+            for item in items:
+                if not self._put(queues[0], names[0], item):
+                    break
+            self._close(queues[0])
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        return self._results(queues, threads + [feeder])
+
+    def _results(self, queues, threads):
+        try:
+            while True:
+                result = self._get(queues[-1])
+                if result is self._DONE:
+                    break
+                yield result
+        finally:
+            # 提前结束（出错或调用方不再读取）时让各阶段退出：等待队列的线程都会检查停止标志
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+
+class LRUCache:
+    """按条目数限制大小的LRU缓存（不加锁，由调用方加锁）
+
+    进程内的各种缓存（数据表、版面、样式表等）在服务中会随请求的配置不断增加，
+    超过max_entries时丢弃最久没有使用的条目。
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        item = self._items.get(key, default)
+        if key in self._items:
+            self._items.move_to_end(key)
+        return item
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class HolidayDataset:
+    """编译后的节假日数据，使用mmap只读加载
+
+    文件结构（小端）：
+        文件头    魔数"CCHD"、版本、起始年份、年数、名称数、源JSON文件的SHA-256
+        每年一块  节假日位图(46字节)、调休上班位图(46字节)、每天的名称序号(366个2字节整数，0表示没有)
+        名称表    每个名称为2字节长度加UTF-8内容（chinese-days.json中的原始值）
+
+    查询直接读取映射的内存；多个进程打开同一个文件时共享操作系统的页缓存，
+    不必在每个进程中解析JSON、保存一份字符串字典。
+    """
+
+    MAGIC = b'CCHD'
+    VERSION = 2
+    HEADER = struct.Struct('<4sHHHH32s')
+    BITSET_SIZE = 46  # 366天
+    NAME_INDEX = struct.Struct('<366H')
+    YEAR_SIZE = 2 * BITSET_SIZE + NAME_INDEX.size
+    MAX_NAMES = 0xFFFF
+
+    def __init__(self, buffer, path=None):
+        magic, version, first_year, year_count, name_count, digest = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("节假日数据文件格式错误")
+        self.path = path
+        self.first_year = first_year
+        self.year_count = year_count
+        self.digest = digest
+
+        values = [""]
+        offset = self.HEADER.size + year_count * self.YEAR_SIZE
+        for _ in range(name_count):
+            (length,) = struct.unpack_from('<H', buffer, offset)
+            values.append(str(buffer[offset + 2:offset + 2 + length], 'utf-8'))
+            offset += 2 + length
+        # 解析失败时不留下引用buffer的memoryview，open才能关闭映射
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        # 原始值形如"New Year's Day,元旦,1"，显示名称为第二段
+        self.values = values
+        self.names = [value.split(",")[1] if "," in value else value for value in values]
+
+    def __reduce__(self):
+        # 基于文件的数据在子进程中重新映射同一个文件，不复制内容
+        if self.path is not None:
+            return (self._reopen, (self.path,))
+        return (self.__class__, (bytes(self._buffer),))
+
+    @classmethod
+    def _reopen(cls, path):
+        dataset = cls.open(path)
+        if dataset is None:
+            raise ValueError(f"无法打开节假日数据文件 {path}")
+        return dataset
+
+    @classmethod
+    def compile(cls, data, digest=bytes(32)):
+        """把chinese-days.json格式的数据编译为二进制内容"""
+        entries = []
+        for kind, key in enumerate(("holidays", "workdays")):
+            for day, value in (data.get(key) or {}).items():
+                entries.append((date(int(day[:4]), int(day[5:7]), int(day[8:10])), kind, value))
+
+        first_year = min(day.year for day, _, _ in entries) if entries else 0
+        year_count = max(day.year for day, _, _ in entries) - first_year + 1 if entries else 0
+        blocks = bytearray(year_count * cls.YEAR_SIZE)
+        value_index = {}
+        for day, kind, value in entries:
+            index = value_index.setdefault(value, len(value_index) + 1)
+            if index > cls.MAX_NAMES:
+                raise ValueError("节假日名称过多")
+            start = (day.year - first_year) * cls.YEAR_SIZE
+            offset = day.timetuple().tm_yday - 1
+            blocks[start + kind * cls.BITSET_SIZE + (offset >> 3)] |= 1 << (offset & 7)
+            struct.pack_into('<H', blocks, start + 2 * cls.BITSET_SIZE + 2 * offset, index)
+
+        names = bytearray()
+        for value in value_index:
+            encoded = value.encode('utf-8')
+            names += struct.pack('<H', len(encoded)) + encoded
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, first_year, year_count, len(value_index), digest)
+        return header + bytes(blocks) + bytes(names)
+
+    @classmethod
+    def open(cls, path, digest=None):
+        """使用mmap打开编译好的文件，文件不存在、损坏或与digest不符时返回None"""
+        import mmap
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            dataset = cls(buffer, path)
+        except (ValueError, struct.error, UnicodeDecodeError):
+            buffer.close()
+            return None
+        if digest is not None and dataset.digest != digest:
+            dataset._view.release()
+            buffer.close()
+            return None
+        return dataset
+
+    @classmethod
+    def coerce(cls, holiday_data):
+        """chinese-days.json格式的字典在内存中编译，HolidayDataset原样返回"""
+        if isinstance(holiday_data, cls):
+            return holiday_data
+        return cls(cls.compile(holiday_data))
+
+    def _block(self, year):
+        """某年数据块的位置，不在数据范围内时返回None"""
+        i = year - self.first_year
+        if not 0 <= i < self.year_count:
+            return None
+        return self.HEADER.size + i * self.YEAR_SIZE
+
+    def _name_index(self, start):
+        """某年数据块中每天的名称序号"""
+        return self.NAME_INDEX.unpack_from(self._buffer, start + 2 * self.BITSET_SIZE)
+
+    def _ordinals(self, year, kind):
+        start = self._block(year)
+        if start is None:
+            return []
+        base = date(year, 1, 1).toordinal()
+        bits = self._view[start + kind * self.BITSET_SIZE:start + (kind + 1) * self.BITSET_SIZE]
+        return [base + i * 8 + bit
+                for i, byte in enumerate(bits) if byte
+                for bit in range(8) if byte >> bit & 1]
+
+    def years(self):
+        """有数据的年份"""
+        return [year for year in range(self.first_year, self.first_year + self.year_count)
+                if any(self._view[self._block(year):self._block(year) + 2 * self.BITSET_SIZE])]
+
+    def holidays(self, year):
+        """某年的法定节假日，返回 {日期序号: 名称}"""
+        start = self._block(year)
+        if start is None:
+            return {}
+        base = date(year, 1, 1).toordinal()
+        index = self._name_index(start)
+        return {ordinal: self.names[index[ordinal - base]] for ordinal in self._ordinals(year, 0)}
+
+    def workdays(self, year):
+        """某年的调休上班日，返回日期序号的集合"""
+        return set(self._ordinals(year, 1))
+
+    def _bit(self, day, kind):
+        start = self._block(day.year)
+        if start is None:
+            return False
+        offset = day.timetuple().tm_yday - 1
+        return bool(self._view[start + kind * self.BITSET_SIZE + (offset >> 3)] >> (offset & 7) & 1)
+
+    def holiday_name(self, day):
+        """某天的法定节假日名称，不是节假日时返回空字符串"""
+        if not self._bit(day, 0):
+            return ""
+        offset = day.timetuple().tm_yday - 1
+        (index,) = struct.unpack_from('<H', self._buffer, self._block(day.year) + 2 * self.BITSET_SIZE + 2 * offset)
+        return self.names[index]
+
+    def is_adjusted_workday(self, day):
+        """是否调休上班日"""
+        return self._bit(day, 1)
+
+    def to_dict(self):
+        """还原为chinese-days.json格式的字典（只含holidays和workdays）"""
+        result = {"holidays": {}, "workdays": {}}
+        for year in range(self.first_year, self.first_year + self.year_count):
+            base = date(year, 1, 1).toordinal()
+            index = self._name_index(self._block(year))
+            for kind, key in enumerate(("holidays", "workdays")):
+                for ordinal in self._ordinals(year, kind):
+                    result[key][date.fromordinal(ordinal).isoformat()] = self.values[index[ordinal - base]]
+        return result
+
+
+def validate_holiday_data(data, source="节假日数据"):
+    """按chinese-days.json的格式检查节假日数据，返回只含holidays和workdays的新字典
+
+    holidays为必需项，workdays可以省略；键为YYYY-MM-DD格式的日期，值为字符串
+    （如"New Year's Day,元旦,1"）。其他键（如inLieuDays）不使用，直接忽略。格式错误时抛出ValueError。
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('holidays'), dict):
+        raise ValueError(f"{source}格式错误：应为包含holidays的JSON对象")
+    result = {}
+    for key in ('holidays', 'workdays'):
+        days = data.get(key, {})
+        if not isinstance(days, dict):
+            raise ValueError(f"{source}格式错误：{key}应为JSON对象")
+        for day, value in days.items():
+            if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', day):
+                raise ValueError(f"{source}格式错误：{key}中的日期 {day!r} 应为YYYY-MM-DD格式")
+            try:
+                date(int(day[:4]), int(day[5:7]), int(day[8:10]))
+            except ValueError:
+                raise ValueError(f"{source}格式错误：{key}中的日期 {day!r} 不存在")
+            if not isinstance(value, str):
+                raise ValueError(f"{source}格式错误：{key}.{day} 应为字符串，而不是 {value!r}")
+        result[key] = dict(days)
+    return result
+
+
+class HolidaySource:
+    """节假日数据来源
+
+    fetch(validators, deadline)返回 (data, validators)：data为检查过格式的节假日数据（见validate_holiday_data），
+    内容与上次相同（HTTP 304）时为None；validators为下次条件请求使用的信息（ETag等），没有时为None。
+    deadline为time.monotonic()的截止时间，超过时应尽快抛出TimeoutError，不再占用线程。
+    出错时抛出异常。name用于提示信息和缓存元数据中的记录，不同来源的name应不同。
+    """
+
+    name = ""
+
+    def fetch(self, validators=None, deadline=None):
+        raise NotImplementedError
+
+
+class HttpHolidaySource(HolidaySource):
+    """在线节假日数据（chinese-days.json的地址或其镜像）"""
+
+    def __init__(self, url, timeout=5):
+        self.name = url
+        self.url = url
+        self.timeout = timeout
+
+    def _remaining(self, deadline):
+        """距截止时间的秒数（不超过timeout），已超过时抛出TimeoutError"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"超过{self.timeout}秒没有返回")
+        return min(remaining, self.timeout)
+
+    def fetch(self, validators=None, deadline=None):
+        import requests
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        metrics.count('network.fetch')
+        # requests的timeout只限制单次连接和读取，这里每收到一段数据就检查截止时间，
+        # 缓慢返回数据的服务器也不会超过截止时间太久（urllib3 2以上的read1收到数据即返回）
+        response = requests.get(self.url, headers=headers, timeout=self._remaining(deadline), stream=True)
+        with response:
+            if response.status_code == 304 and headers:
+                return None, validators
+            response.raise_for_status()
+            raw = response.raw
+            read = raw.read1 if hasattr(raw, 'read1') else raw.read
+            body = bytearray()
+            while True:
+                chunk = read(64 * 1024, decode_content=True)
+                if not chunk:
+                    break
+                body += chunk
+                self._remaining(deadline)
+        data = validate_holiday_data(json.loads(body), "节假日数据")
+        return data, {'etag': response.headers.get('ETag'),
+                      'last_modified': response.headers.get('Last-Modified')}
+
+
+class FileHolidaySource(HolidaySource):
+    """本地的节假日数据文件（chinese-days.json格式）"""
+
+    def __init__(self, path):
+        self.name = path
+        self.path = path
+
+    def fetch(self, validators=None, deadline=None):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return validate_holiday_data(data, f"节假日数据文件 {self.path} "), None
+
+
+class HolidayDataStore:
+    """进程内共享的节假日数据存储
+
+    数据保存在缓存目录中，超过有效期后使用ETag/If-Modified-Since重新验证，
+    离线模式下只使用上次成功获取的数据，不访问网络。
+    缓存的JSON同时编译为二进制文件（见HolidayDataset），之后直接映射打开。
+
+    在线来源（url和mirrors，或sources）同时请求，使用最先返回的有效数据，每个来源最多等待timeout秒；
+    本地文件（files，或overrides）按顺序按日期覆盖在线数据，后面的文件优先。
+    优先级从高到低：本地文件、在线数据（失败时为上次缓存的数据）；两者都优先于配置文件中的自定义节日
+    （见YearTable.compile_holidays）。
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, url=HOLIDAY_DATA_URL, cache_dir=None, ttl_hours=24,
+                 timeout=5, retry_minutes=10, offline=False, mirrors=(), files=(),
+                 sources=None, overrides=None):
+        if sources is None:
+            urls = [url] if url else []
+            sources = [HttpHolidaySource(u, timeout) for u in dict.fromkeys(urls + list(mirrors))]
+        if overrides is None:
+            overrides = [FileHolidaySource(path) for path in files]
+        self.sources = list(sources)
+        self.overrides = list(overrides)
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.ttl = ttl_hours * 3600
+        self.timeout = timeout
+        self.retry_interval = retry_minutes * 60
+        self.offline = offline
+        self.data_path = os.path.join(self.cache_dir, 'chinese-days.json')
+        self.meta_path = os.path.join(self.cache_dir, 'chinese-days.meta.json')
+        self.binary_path = os.path.join(self.cache_dir, 'chinese-days.bin')
+        self._data = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, settings=None, offline=False):
+        """按配置文件中的holiday_data设置创建共享实例"""
+        settings = dict(settings or {})
+        with cls._shared_lock:
+            cls._shared = cls(
+                url=settings.get('url', HOLIDAY_DATA_URL),
+                mirrors=settings.get('mirrors', ()),
+                files=settings.get('files', ()),
+                cache_dir=settings.get('cache_dir'),
+                ttl_hours=settings.get('ttl_hours', 24),
+                timeout=settings.get('timeout', 5),
+                retry_minutes=settings.get('retry_minutes', 10),
+                offline=offline or settings.get('offline', False)
+            )
+            return cls._shared
+
+    @classmethod
+    def shared(cls, settings=None):
+        """获取共享实例，尚未创建时按给定设置创建"""
+        if cls._shared is None:
+            return cls.configure(settings)
+        return cls._shared
+
+    @classmethod
+    def install(cls, data):
+        """直接使用已加载的数据作为共享实例（用于子进程）"""
+        with cls._shared_lock:
+            store = cls(offline=True)
+            store._data = HolidayDataset.coerce(data)
+            cls._shared = store
+            return store
+
+    def get(self):
+        """获取节假日数据（HolidayDataset），同一进程内只加载一次"""
+        with self._lock:
+            if self._data is None:
+                with metrics.phase('holiday_data'):
+                    self._data = HolidayDataset.coerce(self._load())
+            return self._data
+
+    def _read_json(self, path):
+        """读取缓存的JSON文件，不存在或损坏时返回None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, data):
+        """原子地写入缓存文件，返回写入内容的SHA-256，失败时返回None"""
+        import hashlib
+        raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(raw)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入节假日缓存失败: {e}")
+            return None
+        return hashlib.sha256(raw).digest()
+
+    def _read_cached(self):
+        """读取缓存的节假日数据，没有缓存时返回None
+
+        与缓存JSON对应的二进制文件直接映射打开，不再解析JSON；不对应时重新编译。
+        """
+        import hashlib
+        try:
+            with open(self.data_path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        digest = hashlib.sha256(raw).digest()
+        dataset = HolidayDataset.open(self.binary_path, digest)
+        if dataset is not None:
+            return dataset
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return self._compile(data, digest)
+
+    def _compile(self, data, digest):
+        """编译节假日数据并写入二进制缓存文件，写入失败时只在内存中使用"""
+        blob = HolidayDataset.compile(data, digest)
+        try:
+            temp_path = f"{self.binary_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(temp_path, self.binary_path)
+        except OSError:
+            return HolidayDataset(blob)
+        return HolidayDataset.open(self.binary_path, digest) or HolidayDataset(blob)
+
+    def _load(self):
+        data = self._load_online()
+        if self.overrides:
+            data = self._apply_overrides(data)
+        return data
+
+    def _load_online(self):
+        cached = self._read_cached()
+        meta = self._read_json(self.meta_path) or {}
+        names = [source.name for source in self.sources]
+        if meta.get('sources') != names:
+            meta = {}
+
+        # 没有在线来源（url为空）时只使用本地文件和配置文件中的节假日
+        if not self.sources:
+            return {"holidays": {}, "workdays": {}}
+        if self.offline:
+            if cached is not None:
+                metrics.count('holiday_cache.hit')
+                print("离线模式：使用缓存的节假日数据")
+                return cached
+            print("离线模式：没有可用的节假日缓存，将仅使用配置文件中的节假日")
+            return {"holidays": {}, "workdays": {}}
+
+        now = time.time()
+        # 缓存仍在有效期内，不访问网络
+        if cached is not None and now - meta.get('checked_at', 0) < self.ttl:
+            metrics.count('holiday_cache.hit')
+            return cached
+        # 最近一次请求失败，在重试间隔内不再访问网络
+        if now - meta.get('failed_at', 0) < self.retry_interval:
+            if cached is not None:
+                return cached
+            return {"holidays": {}, "workdays": {}}
+
+        # 只保存提供了缓存内容的来源的验证信息，其他来源的304不能说明缓存是最新的
+        validators = meta.get('validators', {}) if cached is not None else {}
+        try:
+            source, (data, source_validators) = self._race(validators)
+        except Exception as e:
+            print(f"获取在线节假日数据失败: {e}")
+            meta['sources'] = names
+            meta['failed_at'] = now
+            self._write_json(self.meta_path, meta)
+            if cached is not None:
+                print("将使用上次缓存的节假日数据")
+                return cached
+            print("将仅使用配置文件中的节假日")
+            return {"holidays": {}, "workdays": {}}
+
+        if data is None:
+            metrics.count('holiday_cache.hit')
+            meta['checked_at'] = now
+            meta.pop('failed_at', None)
+            self._write_json(self.meta_path, meta)
+            return cached
+        metrics.count('holiday_cache.miss')
+        digest = self._write_json(self.data_path, data)
+        self._write_json(self.meta_path, {
+            'sources': names,
+            'validators': {source.name: source_validators},
+            'checked_at': now
+        })
+        print(f"成功获取在线节假日数据（{source.name}）")
+        if digest is None:
+            return data
+        return self._compile(data, digest)
+
+    def _race(self, validators):
+        """同时请求所有在线来源，返回最先成功的 (来源, (数据, 验证信息))，都失败或超时时抛出异常
+
+        每个来源最多等待timeout秒。各来源在后台线程中按同一个截止时间读取，
+        超时的请求在截止时间后自行结束；落后的请求的结果直接丢弃。
+        """
+        from queue import Queue, Empty
+
+        results = Queue()
+
+        deadline = time.monotonic() + self.timeout
+
+        def fetch(source):
+            try:
+                results.put((source, source.fetch(validators.get(source.name), deadline), None))
+            except Exception as e:
+                results.put((source, None, e))
+
+        for source in self.sources:
+            threading.Thread(target=fetch, args=(source,), daemon=True, name='holiday-source').start()
+        pending = list(self.sources)
+        errors = []
+        while pending:
+            try:
+                source, result, error = results.get(timeout=max(deadline - time.monotonic(), 0))
+            except Empty:
+                break
+            pending.remove(source)
+            if error is None:
+                return source, result
+            errors.append(f"{source.name}: {error}")
+        errors += [f"{source.name}: 超过{self.timeout}秒没有返回" for source in pending]
+        raise RuntimeError("；".join(errors))
+
+    def _apply_overrides(self, data):
+        """把本地文件中的节假日数据按日期覆盖到data上，后面的文件优先；读取失败的文件跳过"""
+        merged = HolidayDataset.coerce(data).to_dict()
+        for source in self.overrides:
+            try:
+                layer, _ = source.fetch()
+            except (OSError, ValueError) as e:
+                print(f"读取节假日数据 {source.name} 失败，已跳过: {e}")
+                continue
+            # 同一天只能是节假日或调休上班日之一，覆盖时去掉另一类中的记录
+            for key, other in (('holidays', 'workdays'), ('workdays', 'holidays')):
+                for day, value in layer[key].items():
+                    merged[key][day] = value
+                    merged[other].pop(day, None)
+        return merged
+
+
+class LunarDate:
+    """农历日期"""
+
+    __slots__ = ('lunar_month', 'lunar_day', 'solar_term')
+
+    def __init__(self, lunar_month, lunar_day, solar_term=None):
+        # 闰月的月份为负数，与lunar_python一致
+        self.lunar_month = lunar_month
+        self.lunar_day = lunar_day
+        self.solar_term = solar_term
+
+    @property
+    def is_leap(self):
+        return self.lunar_month < 0
+
+
+# 二十四节气，按公历年内的顺序排列
+SOLAR_TERMS = (
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨",
+    "立夏", "小满", "芒种", "夏至", "小暑", "大暑", "立秋", "处暑",
+    "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至"
+)
+SOLAR_TERM_INDEX = {name: i for i, name in enumerate(SOLAR_TERMS)}
+
+# 批量计算结果：按列保存，start为起始日期的序号
+LunarColumns = namedtuple('LunarColumns', ['start', 'month', 'day', 'leap', 'term'])
+
+_numpy_module = False
+
+
+def _numpy():
+    """按需加载numpy，未安装时返回None"""
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = None
+    return _numpy_module
+
+
+class LunarEngine:
+    """批量农历/节气计算
+
+    每个公历年只计算一次朔日（每月初一）和节气的边界表，
+    之后按日期区间批量推算，不再逐日构造Lunar对象。
+    """
+
+    _tables = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _julian_to_ordinal(julian_day):
+        from lunar_python import Solar
+        solar = Solar.fromJulianDay(julian_day)
+        return date(solar.getYear(), solar.getMonth(), solar.getDay()).toordinal()
+
+    @classmethod
+    def year_boundaries(cls, year):
+        """获取某个公历年的朔日表和节气表
+
+        返回 (月首日期序号, 月份(闰月为负), 节气日期序号, 节气序号)，
+        与lunar_python一样使用该公历年对应的LunarYear计算。
+        """
+        with cls._lock:
+            table = cls._tables.get(year)
+            if table is not None:
+                return table
+        with metrics.phase('lunar_tables'):
+            table = cls._compute_boundaries(year)
+        metrics.count('lunar.tables')
+        with cls._lock:
+            cls._tables[year] = table
+        return table
+
+    @classmethod
+    def _compute_boundaries(cls, year):
+        from lunar_python import Lunar, LunarYear
+        lunar_year = LunarYear.fromYear(year)
+        month_starts = []
+        month_values = []
+        for m in lunar_year.getMonths():
+            month_starts.append(cls._julian_to_ordinal(m.getFirstJulianDay()))
+            month_values.append(m.getMonth())
+
+        first = date(year, 1, 1).toordinal()
+        last = date(year, 12, 31).toordinal()
+        terms = {}
+        julian_days = lunar_year.getJieQiJulianDays()
+        for name, julian_day in zip(Lunar.JIE_QI_IN_USE, julian_days):
+            ordinal = cls._julian_to_ordinal(julian_day)
+            if first <= ordinal <= last:
+                terms[ordinal] = SOLAR_TERM_INDEX[cls._term_name(name)]
+        term_ordinals = sorted(terms)
+        return (month_starts, month_values, term_ordinals, [terms[o] for o in term_ordinals])
+
+    @classmethod
+    def month_spans(cls, year):
+        """与公历某年有重叠的各个农历月
+
+        返回 [(月首日期序号, 天数, 月份(闰月为负)), ...]，最后一个月的天数由下一年的朔日表确定。
+        """
+        starts, values = [], []
+        for y in (year, year + 1):
+            month_starts, month_values, _, _ = cls.year_boundaries(y)
+            for start, value in zip(month_starts, month_values):
+                if not starts or start > starts[-1]:
+                    starts.append(start)
+                    values.append(value)
+        first = date(year, 1, 1).toordinal()
+        last = date(year, 12, 31).toordinal()
+        return [(starts[i], starts[i + 1] - starts[i], values[i])
+                for i in range(len(starts) - 1)
+                if starts[i + 1] > first and starts[i] <= last]
+
+    @staticmethod
+    def _term_name(name):
+        """将lunar_python内部的节气键名转换为中文名称"""
+        return {
+            "DONG_ZHI": "冬至", "XIAO_HAN": "小寒", "DA_HAN": "大寒",
+            "LI_CHUN": "立春", "DA_XUE": "大雪", "YU_SHUI": "雨水",
+            "JING_ZHE": "惊蛰"
+        }.get(name, name)
+
+    @classmethod
+    def lunar_range(cls, start, end):
+        """计算从start到end（含）每一天的农历月、日、闰月标记和节气序号
+
+        安装了numpy时各列为numpy数组，否则为array数组；节气序号-1表示不是节气。
+        """
+        first = start.toordinal()
+        last = end.toordinal()
+        if last < first:
+            raise ValueError("结束日期不能早于开始日期")
+        metrics.count('lunar.conversions', last - first + 1)
+        np = _numpy()
+        if np is not None:
+            months, days, leaps, terms = [], [], [], []
+        else:
+            months, days = array('b'), array('b')
+            leaps, terms = array('b'), array('b')
+
+        for year in range(date.fromordinal(first).year, date.fromordinal(last).year + 1):
+            month_starts, month_values, term_ordinals, term_indices = cls.year_boundaries(year)
+            a = max(first, date(year, 1, 1).toordinal())
+            b = min(last, date(year, 12, 31).toordinal())
+            if np is not None:
+                ordinals = np.arange(a, b + 1, dtype=np.int64)
+                starts = np.asarray(month_starts, dtype=np.int64)
+                values = np.asarray(month_values, dtype=np.int8)
+                index = np.searchsorted(starts, ordinals, side='right') - 1
+                month = values[index]
+                term = np.full(len(ordinals), -1, dtype=np.int8)
+                if term_ordinals:
+                    term_pos = np.asarray(term_ordinals, dtype=np.int64) - a
+                    mask = (term_pos >= 0) & (term_pos < len(ordinals))
+                    term[term_pos[mask]] = np.asarray(term_indices, dtype=np.int8)[mask]
+                months.append(np.abs(month).astype(np.int8))
+                days.append((ordinals - starts[index] + 1).astype(np.int8))
+                leaps.append((month < 0).astype(np.int8))
+                terms.append(term)
+            else:
+                term_map = dict(zip(term_ordinals, term_indices))
+                i = 0
+                while i + 1 < len(month_starts) and month_starts[i + 1] <= a:
+                    i += 1
+                for ordinal in range(a, b + 1):
+                    if i + 1 < len(month_starts) and month_starts[i + 1] <= ordinal:
+                        i += 1
+                    month = month_values[i]
+                    months.append(abs(month))
+                    days.append(ordinal - month_starts[i] + 1)
+                    leaps.append(1 if month < 0 else 0)
+                    terms.append(term_map.get(ordinal, -1))
+
+        if np is not None:
+            return LunarColumns(first, np.concatenate(months), np.concatenate(days),
+                                np.concatenate(leaps), np.concatenate(terms))
+        return LunarColumns(first, months, days, leaps, terms)
+
+
+def verify_lunar_engine(start_year=1900, end_year=2100):
+    """逐日与lunar_python的结果对比，返回不一致的日期列表"""
+    from lunar_python import Lunar
+    columns = LunarEngine.lunar_range(date(start_year, 1, 1), date(end_year, 12, 31))
+    mismatches = []
+    for i in range(len(columns.month)):
+        current = date.fromordinal(columns.start + i)
+        lunar = Lunar.fromDate(datetime(current.year, current.month, current.day))
+        jieqi = lunar.getJieQi()
+        month = int(columns.month[i])
+        if columns.leap[i]:
+            month = -month
+        term = int(columns.term[i])
+        expected = (lunar.getMonth(), lunar.getDay(), jieqi or None)
+        actual = (month, int(columns.day[i]), SOLAR_TERMS[term] if term >= 0 else None)
+        if expected != actual:
+            mismatches.append((current, expected, actual))
+    return mismatches
+
+
+def parse_lunar_holiday_key(key):
+    """解析自定义农历节日的键
+
+    "MMDD"为非闰月的某一天，"闰MMDD"为闰月的某一天，日为"00"表示该月最后一天（如"1200"为除夕）。
+    返回 (月份(闰月为负), 日)。
+    """
+    leap = key.startswith('闰')
+    if leap:
+        key = key[1:]
+    month, day = int(key[:2]), int(key[2:])
+    return (-month if leap else month), day
+
+
+def lunar_holiday_dates(year, lunar_holidays):
+    """把自定义农历节日换算为公历某年中的具体日期，返回 {日期序号: 节日名称}"""
+    rules = {}
+    for key, name in lunar_holidays.items():
+        month, day = parse_lunar_holiday_key(key)
+        rules.setdefault(month, []).append((day, name))
+    for month_rules in rules.values():
+        # 同一天既有具体日期又有"最后一天"规则时，具体日期优先
+        month_rules.sort(key=lambda rule: rule[0] == 0)
+
+    first = date(year, 1, 1).toordinal()
+    last = date(year, 12, 31).toordinal()
+    dates = {}
+    for start, length, month in LunarEngine.month_spans(year):
+        for day, name in rules.get(month, ()):
+            if day > length:
+                continue  # 小月没有三十
+            ordinal = start + (length if day == 0 else day) - 1
+            if first <= ordinal <= last:
+                dates.setdefault(ordinal, name)
+    return dates
+
+
+# 每日记录
+DayRecord = namedtuple('DayRecord', [
+    'date', 'lunar_month', 'lunar_day', 'is_leap', 'solar_term',
+    'weekday', 'holiday', 'is_workday'
+])
+
+
+class YearTable:
+    """按年预先计算的每日数据表
+
+    每年只做一次农历转换；法定节假日、自定义公历节日和换算成公历日期的农历节日
+    先合并成一张按日期序号查找的表，结果按天保存在紧凑数组中，
+    之后所有查询都是按日期序号直接取值。
+    有自定义节日的表由只含法定节假日的表叠加而成（见overlay），共用农历数据。
+    """
+
+    # {(年份, id(节假日数据), 自定义节日): (节假日数据, 数据表)}，保存节假日数据本身，
+    # 避免被丢弃的数据对象的id被新对象重用时取到错误的表
+    _cache = LRUCache(512)
+    _cache_lock = threading.RLock()
+
+    def __init__(self, year, holiday_data, solar_holidays, lunar_holidays):
+        self.year = year
+        self.start = date(year, 1, 1).toordinal()
+        self.days = 366 if calendar.isleap(year) else 365
+        self.base = None             # 叠加前的数据表
+        self.overlaid = frozenset()  # 叠加时有变化的日期序号
+
+        self.lunar_month = array('b')   # 农历月份（正数）
+        self.lunar_day = array('b')     # 农历日期
+        self.leap = array('b')          # 是否闰月
+        self.solar_term = array('b')    # 节气序号，-1表示不是节气
+        self.weekday = array('b')       # 星期，0为周一
+        self.holiday = array('h')       # 节假日名称序号，0表示不是节假日
+        self.workday = array('b')       # 是否工作日（已考虑调休）
+        self.holiday_names = [""]
+
+        holiday_data = HolidayDataset.coerce(holiday_data)
+        holidays = self.compile_holidays(year, holiday_data, solar_holidays, lunar_holidays)
+        workdays = holiday_data.workdays(year)
+        name_index = {"": 0}
+        columns = LunarEngine.lunar_range(date(year, 1, 1), date(year, 12, 31))
+
+        for offset in range(self.days):
+            ordinal = self.start + offset
+            name = holidays.get(ordinal, "")
+            if name not in name_index:
+                name_index[name] = len(self.holiday_names)
+                self.holiday_names.append(name)
+
+            weekday = (ordinal + 6) % 7
+            if ordinal in workdays:
+                is_workday = True
+            else:
+                is_workday = not name and weekday < 5
+
+            self.lunar_month.append(int(columns.month[offset]))
+            self.lunar_day.append(int(columns.day[offset]))
+            self.leap.append(int(columns.leap[offset]))
+            self.solar_term.append(int(columns.term[offset]))
+            self.weekday.append(weekday)
+            self.holiday.append(name_index[name])
+            self.workday.append(1 if is_workday else 0)
+
+    @classmethod
+    def compile_holidays(cls, year, holiday_data, solar_holidays, lunar_holidays):
+        """合并某年的全部节假日，返回 {日期序号: 节假日名称}
+
+        优先级：法定节假日 > 自定义公历节日 > 自定义农历节日。
+        """
+        holidays = cls.custom_holidays(year, solar_holidays, lunar_holidays)
+        holidays.update(HolidayDataset.coerce(holiday_data).holidays(year))
+        return holidays
+
+    @staticmethod
+    def custom_holidays(year, solar_holidays, lunar_holidays):
+        """某年的自定义节日，返回 {日期序号: 节日名称}，公历节日优先于农历节日"""
+        holidays = lunar_holiday_dates(year, lunar_holidays)
+        for key, name in solar_holidays.items():
+            month, day = int(key[:2]), int(key[2:])
+            if day <= calendar.monthrange(year, month)[1]:  # 平年没有2月29日
+                holidays[date(year, month, day).toordinal()] = name
+        return holidays
+
+    @classmethod
+    def get(cls, year, holiday_data, solar_holidays, lunar_holidays):
+        """获取某年的数据表，相同的数据和节假日配置只计算一次
+
+        有自定义节日时先获取只含法定节假日的表，再叠加自定义节日，
+        不同的自定义节日配置（如各地区的节日）共用同一份农历和法定节假日数据。
+        """
+        key = (year, id(holiday_data),
+               tuple(sorted(solar_holidays.items())),
+               tuple(sorted(lunar_holidays.items())))
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is holiday_data:
+                metrics.count('year_table.hit')
+                return entry[1]
+            metrics.count('year_table.miss')
+            if solar_holidays or lunar_holidays:
+                base = cls.get(year, holiday_data, {}, {})
+                with metrics.phase('year_table'):
+                    table = base.overlay(holiday_data, solar_holidays, lunar_holidays)
+            else:
+                with metrics.phase('year_table'):
+                    table = cls(year, holiday_data, {}, {})
+            cls._cache[key] = (holiday_data, table)
+            return table
+
+    def overlay(self, holiday_data, solar_holidays, lunar_holidays):
+        """在本表上叠加自定义节日，返回新的数据表
+
+        农历、节气和星期与本表共用同一份数组，只复制节假日和工作日两列，
+        再修改自定义节日所在的日期，计算量与自定义节日的天数成正比。法定节假日优先。
+        """
+        from copy import copy
+
+        table = copy(self)
+        table.base = self
+        table.holiday = array('h', self.holiday)
+        table.workday = array('b', self.workday)
+        table.holiday_names = list(self.holiday_names)
+        name_index = {name: i for i, name in enumerate(table.holiday_names)}
+        workdays = HolidayDataset.coerce(holiday_data).workdays(self.year)
+
+        overlaid = []
+        for ordinal, name in self.custom_holidays(self.year, solar_holidays, lunar_holidays).items():
+            i = ordinal - self.start
+            if not name or self.holiday[i]:
+                continue
+            if name not in name_index:
+                name_index[name] = len(table.holiday_names)
+                table.holiday_names.append(name)
+            table.holiday[i] = name_index[name]
+            table.workday[i] = 1 if ordinal in workdays else 0
+            overlaid.append(ordinal)
+        table.overlaid = frozenset(overlaid)
+        return table
+
+    def index(self, day):
+        """日期在表中的序号"""
+        i = day.toordinal() - self.start
+        if not 0 <= i < self.days:
+            raise ValueError(f"{day} 不在 {self.year} 年的数据表中")
+        return i
+
+    def lunar_date(self, day):
+        """获取农历日期"""
+        i = self.index(day)
+        month = self.lunar_month[i]
+        if self.leap[i]:
+            month = -month
+        term = self.solar_term[i]
+        return LunarDate(month, self.lunar_day[i], SOLAR_TERMS[term] if term >= 0 else None)
+
+    def holiday_name(self, day):
+        """获取节假日名称，不是节假日时返回空字符串"""
+        return self.holiday_names[self.holiday[self.index(day)]]
+
+    def is_workday(self, day):
+        """是否工作日"""
+        return bool(self.workday[self.index(day)])
+
+    def record(self, day):
+        """获取某一天的完整记录"""
+        i = self.index(day)
+        term = self.solar_term[i]
+        return DayRecord(
+            date.fromordinal(self.start + i),
+            self.lunar_month[i],
+            self.lunar_day[i],
+            bool(self.leap[i]),
+            SOLAR_TERMS[term] if term >= 0 else None,
+            self.weekday[i],
+            self.holiday_names[self.holiday[i]],
+            bool(self.workday[i])
+        )
+
+
+# numpy的datetime64[D]以1970-01-01为0
+_DATETIME64_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _weekdays_before(ordinal):
+    """公元1年1月1日（周一，序号为1）到ordinal（不含）之间周一至周五的天数"""
+    weeks, rest = divmod(ordinal - 1, 7)
+    return weeks * 5 + min(rest, 5)
+
+
+def _nth_weekday(n):
+    """第n个（从0开始）周一至周五的日期序号，_weekdays_before的反函数"""
+    weeks, rest = divmod(n, 5)
+    return 1 + weeks * 7 + rest
+
+
+class WorkdayIndex:
+    """工作日索引，用于批量查询工作日
+
+    节假日数据覆盖的年份内按天保存是否工作日（已考虑法定节假日、调休上班和自定义节日），
+    并预先计算前缀和与工作日序号表，查询都是O(1)；范围之外按周一至周五为工作日处理。
+    """
+
+    _cache = LRUCache(16)  # 与YearTable._cache相同，同时保存节假日数据本身
+    _cache_lock = threading.Lock()
+
+    def __init__(self, holiday_data, solar_holidays, lunar_holidays, start_year=None, end_year=None):
+        holiday_data = HolidayDataset.coerce(holiday_data)
+        years = holiday_data.years()
+        if start_year is None:
+            start_year = years[0] if years else datetime.now().year
+        if end_year is None:
+            end_year = years[-1] if years else start_year
+
+        self.start = date(start_year, 1, 1).toordinal()
+        self.end = date(end_year, 12, 31).toordinal() + 1  # 不含
+        self.flags = bytearray()
+        for year in range(start_year, end_year + 1):
+            self.flags += YearTable.get(year, holiday_data, solar_holidays, lunar_holidays).workday.tobytes()
+
+        # prefix[i]：start到start+i（不含）之间的工作日数；ordinals[k]：范围内第k个工作日
+        self.prefix = array('l', [0])
+        self.ordinals = array('l')
+        count = 0
+        for offset, flag in enumerate(self.flags):
+            if flag:
+                count += 1
+                self.ordinals.append(self.start + offset)
+            self.prefix.append(count)
+        self._weekdays_at_start = _weekdays_before(self.start)
+        self._weekdays_at_end = _weekdays_before(self.end)
+
+    @classmethod
+    def get(cls, holiday_data, solar_holidays, lunar_holidays):
+        """获取工作日索引，相同的数据和节假日配置只创建一次"""
+        key = (id(holiday_data),
+               tuple(sorted(solar_holidays.items())),
+               tuple(sorted(lunar_holidays.items())))
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is holiday_data:
+                return entry[1]
+            index = cls(holiday_data, solar_holidays, lunar_holidays)
+            cls._cache[key] = (holiday_data, index)
+            return index
+
+    def _is_workday(self, ordinal):
+        if self.start <= ordinal < self.end:
+            return bool(self.flags[ordinal - self.start])
+        return (ordinal - 1) % 7 < 5
+
+    def _rank(self, ordinal):
+        """ordinal之前（不含）的工作日数，以start为0"""
+        if ordinal <= self.start:
+            return _weekdays_before(ordinal) - self._weekdays_at_start
+        if ordinal <= self.end:
+            return self.prefix[ordinal - self.start]
+        return self.prefix[-1] + _weekdays_before(ordinal) - self._weekdays_at_end
+
+    def _select(self, rank):
+        """第rank个工作日的日期序号，_rank的反函数"""
+        if rank < 0:
+            return _nth_weekday(self._weekdays_at_start + rank)
+        if rank < len(self.ordinals):
+            return self.ordinals[rank]
+        return _nth_weekday(self._weekdays_at_end + rank - len(self.ordinals))
+
+    def is_workday(self, day):
+        """是否工作日"""
+        return self._is_workday(day.toordinal())
+
+    def next_workday(self, day):
+        """day之后（不含day）的第一个工作日"""
+        return date.fromordinal(self._select(self._rank(day.toordinal() + 1)))
+
+    def add_workdays(self, day, n):
+        """day之后第n个工作日，n为负数时为之前第-n个工作日，n为0时返回day"""
+        ordinal = day.toordinal()
+        if n > 0:
+            return date.fromordinal(self._select(self._rank(ordinal + 1) + n - 1))
+        if n < 0:
+            return date.fromordinal(self._select(self._rank(ordinal) + n))
+        return day
+
+    def count_workdays(self, start, end):
+        """start到end之间（含两端）的工作日数，end早于start时为0"""
+        a, b = start.toordinal(), end.toordinal()
+        if b < a:
+            return 0
+        return self._rank(b + 1) - self._rank(a)
+
+    # 批量查询：参数可以是date列表、numpy的datetime64数组或日期序号数组，
+    # 安装了numpy时返回numpy数组，否则返回列表
+
+    @staticmethod
+    def _to_ordinals(np, days):
+        days = np.asarray(days) if not isinstance(days, np.ndarray) else days
+        if days.dtype.kind == 'M':
+            return days.astype('datetime64[D]').astype(np.int64) + _DATETIME64_EPOCH
+        if days.dtype.kind in 'iu':
+            return days.astype(np.int64)
+        return np.fromiter((day.toordinal() for day in days.ravel()), np.int64, days.size).reshape(days.shape)
+
+    def _ranks(self, np, ordinals):
+        def weekdays_before(x):
+            weeks, rest = np.divmod(x - 1, 7)
+            return weeks * 5 + np.minimum(rest, 5)
+
+        prefix = np.frombuffer(self.prefix, dtype=np.dtype(self.prefix.typecode))
+        inside = np.clip(ordinals - self.start, 0, len(self.flags))
+        return np.where(ordinals <= self.start,
+                        weekdays_before(ordinals) - self._weekdays_at_start,
+                        np.where(ordinals <= self.end,
+                                 prefix[inside],
+                                 prefix[-1] + weekdays_before(ordinals) - self._weekdays_at_end))
+
+    def _selects(self, np, ranks):
+        def nth_weekday(n):
+            weeks, rest = np.divmod(n, 5)
+            return 1 + weeks * 7 + rest
+
+        ordinals = np.frombuffer(self.ordinals, dtype=np.dtype(self.ordinals.typecode))
+        total = len(ordinals)
+        inside = ordinals[np.clip(ranks, 0, max(total - 1, 0))] if total else np.zeros_like(ranks)
+        return np.where(ranks < 0,
+                        nth_weekday(self._weekdays_at_start + ranks),
+                        np.where(ranks < total,
+                                 inside,
+                                 nth_weekday(self._weekdays_at_end + ranks - total)))
+
+    @staticmethod
+    def _to_dates(np, ordinals):
+        return (ordinals - _DATETIME64_EPOCH).astype('datetime64[D]')
+
+    def is_workday_many(self, days):
+        """批量判断是否工作日"""
+        np = _numpy()
+        if np is None:
+            return [self.is_workday(day) for day in days]
+        ordinals = self._to_ordinals(np, days)
+        flags = np.frombuffer(bytes(self.flags), dtype=np.uint8)
+        offsets = ordinals - self.start
+        inside = (offsets >= 0) & (offsets < len(flags))
+        return np.where(inside,
+                        flags[np.clip(offsets, 0, max(len(flags) - 1, 0))].astype(bool) if len(flags) else False,
+                        (ordinals - 1) % 7 < 5)
+
+    def add_workdays_many(self, days, n):
+        """批量计算第n个工作日，n可以是整数或与days等长的数组，结果为datetime64[D]数组"""
+        np = _numpy()
+        if np is None:
+            if isinstance(n, int):
+                return [self.add_workdays(day, n) for day in days]
+            return [self.add_workdays(day, k) for day, k in zip(days, n)]
+        ordinals = self._to_ordinals(np, days)
+        n = np.asarray(n, dtype=np.int64)
+        forward = self._selects(np, self._ranks(np, ordinals + 1) + n - 1)
+        backward = self._selects(np, self._ranks(np, ordinals) + n)
+        return self._to_dates(np, np.where(n > 0, forward, np.where(n < 0, backward, ordinals)))
+
+    def next_workday_many(self, days):
+        """批量计算下一个工作日，结果为datetime64[D]数组"""
+        return self.add_workdays_many(days, 1)
+
+    def count_workdays_many(self, starts, ends):
+        """批量计算区间（含两端）内的工作日数"""
+        np = _numpy()
+        if np is None:
+            return [self.count_workdays(a, b) for a, b in zip(starts, ends)]
+        a = self._to_ordinals(np, starts)
+        b = self._to_ordinals(np, ends)
+        return np.where(b < a, 0, self._ranks(np, b + 1) - self._ranks(np, a))
+
+
+# 农历月份和日期的中文表示
+LUNAR_MONTH_NAMES = {
+    1: "正月", 2: "二月", 3: "三月", 4: "四月", 5: "五月", 6: "六月",
+    7: "七月", 8: "八月", 9: "九月", 10: "十月", 11: "冬月", 12: "腊月"
+}
+LUNAR_DAY_NAMES = {
+    1: "初一", 2: "初二", 3: "初三", 4: "初四", 5: "初五",
+    6: "初六", 7: "初七", 8: "初八", 9: "初九", 10: "初十",
+    11: "十一", 12: "十二", 13: "十三", 14: "十四", 15: "十五",
+    16: "十六", 17: "十七", 18: "十八", 19: "十九", 20: "二十",
+    21: "廿一", 22: "廿二", 23: "廿三", 24: "廿四", 25: "廿五",
+    26: "廿六", 27: "廿七", 28: "廿八", 29: "廿九", 30: "三十"
+}
+
+
+def lunar_date_str(lunar_date):
+    """将农历日期转换为中文格式"""
+    # 如果是节气，返回节气名称
+    if lunar_date.solar_term:
+        return lunar_date.solar_term
+
+    # 确保月份为正数
+    month = abs(lunar_date.lunar_month)
+    if month == 0:  # 处理月份为0的特殊情况
+        month = 1
+    month_str = LUNAR_MONTH_NAMES[month]
+
+    # 确保日期为正数
+    day = abs(lunar_date.lunar_day)
+    if day == 0:  # 处理日期为0的特殊情况
+        day = 1
+
+    # 如果是初一，只显示月份
+    if day == 1:
+        return month_str
+    else:
+        return LUNAR_DAY_NAMES[day]
+
+
+def lunar_full_text(lunar_month, lunar_day, is_leap=False):
+    """完整的农历日期，如 闰二月十五"""
+    return ("闰" if is_leap else "") + LUNAR_MONTH_NAMES[lunar_month] + LUNAR_DAY_NAMES[lunar_day]
+
+
+def iter_day_records(start, end, holiday_data, solar_holidays, lunar_holidays):
+    """逐日生成start到end（含）的DayRecord
+
+    按年计算数据表，同一时间只保留一年的表，任意长的区间内存占用都不变。
+    """
+    if end < start:
+        raise ValueError("结束日期不能早于开始日期")
+    holiday_data = HolidayDataset.coerce(holiday_data)
+    for year in range(start.year, end.year + 1):
+        table = YearTable(year, holiday_data, solar_holidays, lunar_holidays)
+        first = max(start.toordinal(), table.start) - table.start
+        last = min(end.toordinal(), table.start + table.days - 1) - table.start
+        names = table.holiday_names
+        for i in range(first, last + 1):
+            term = table.solar_term[i]
+            yield DayRecord(
+                date.fromordinal(table.start + i),
+                table.lunar_month[i],
+                table.lunar_day[i],
+                bool(table.leap[i]),
+                SOLAR_TERMS[term] if term >= 0 else None,
+                table.weekday[i],
+                names[table.holiday[i]],
+                bool(table.workday[i])
+            )
+
+
+class DayExporter:
+    """把每日记录导出为JSONL、CSV或iCalendar
+
+    各格式的方法都是生成器，逐条产出文本，写入时不在内存中拼接整个文件。
+    """
+
+    CONTENT_TYPES = {
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+        'ics': 'text/calendar; charset=utf-8',
+    }
+
+    CSV_FIELDS = ('date', 'weekday', 'lunar_month', 'lunar_day', 'is_leap',
+                  'lunar', 'solar_term', 'holiday', 'is_workday')
+
+    @staticmethod
+    def _fields(record):
+        """记录导出时的各字段（星期1-7，1为周一）"""
+        return (record.date.isoformat(), record.weekday + 1, record.lunar_month, record.lunar_day,
+                record.is_leap, lunar_full_text(record.lunar_month, record.lunar_day, record.is_leap),
+                record.solar_term or "", record.holiday, record.is_workday)
+
+    @classmethod
+    def jsonl(cls, records):
+        """每行一个JSON对象"""
+        fields = cls.CSV_FIELDS
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        for record in records:
+            yield encode(dict(zip(fields, cls._fields(record)))) + "\n"
+
+    @classmethod
+    def csv(cls, records):
+        """带表头的CSV"""
+        import csv
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(cls.CSV_FIELDS)
+        for record in records:
+            row = list(cls._fields(record))
+            row[4] = int(row[4])
+            row[8] = int(row[8])
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    @staticmethod
+    def _ics_line(text):
+        """按RFC 5545折行（每行不超过75字节）"""
+        data = text.encode('utf-8')
+        if len(data) <= 75:
+            return text + "\r\n"
+        lines = []
+        line = ""
+        size = 0
+        for char in text:
+            width = len(char.encode('utf-8'))
+            if size + width > 75:
+                lines.append(line)
+                line, size = " ", 1  # 续行以空格开头
+            line += char
+            size += width
+        lines.append(line)
+        return "\r\n".join(lines) + "\r\n"
+
+    @staticmethod
+    def _ics_escape(text):
+        return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+
+    @classmethod
+    def ics(cls, records):
+        """iCalendar，每天一个全天事件，标题为农历日期、节气和节假日"""
+        line = cls._ics_line
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        yield ("BEGIN:VCALENDAR\r\n"
+               "VERSION:2.0\r\n"
+               "PRODID:-//chinese_calendar//%s//ZH\r\n"
+               "CALSCALE:GREGORIAN\r\n"
+               "X-WR-CALNAME:中国农历\r\n" % __version__)
+        for record in records:
+            day = record.date
+            parts = [lunar_full_text(record.lunar_month, record.lunar_day, record.is_leap)]
+            if record.solar_term:
+                parts.append(record.solar_term)
+            if record.holiday:
+                parts.append(record.holiday)
+            if record.holiday and not record.is_workday:
+                parts.append("休")
+            elif record.is_workday and record.weekday >= 5:
+                parts.append("班")
+            yield ("BEGIN:VEVENT\r\n"
+                   f"UID:{day:%Y%m%d}@chinese-calendar\r\n"
+                   f"DTSTAMP:{stamp}\r\n"
+                   f"DTSTART;VALUE=DATE:{day:%Y%m%d}\r\n"
+                   f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}\r\n"
+                   + line("SUMMARY:" + cls._ics_escape(" ".join(parts)))
+                   + "TRANSP:TRANSPARENT\r\n"
+                   "END:VEVENT\r\n")
+        yield "END:VCALENDAR\r\n"
+
+    @classmethod
+    def write(cls, fmt, records, stream):
+        """把记录以fmt格式写入二进制流，返回写入的天数"""
+        count = 0
+
+        def counted():
+            nonlocal count
+            for record in records:
+                count += 1
+                yield record
+
+        with metrics.phase('export'):
+            for text in getattr(cls, fmt)(counted()):
+                stream.write(text.encode('utf-8'))
+        metrics.count('exported_days', count)
+        return count
+
+
+# 版面中的一天：日期单元格位于(row, col)，农历单元格位于(row + 1, col)
+GridDay = namedtuple('GridDay', [
+    'row', 'col', 'day', 'lunar_text', 'holiday', 'solar_term', 'is_weekend'
+])
+
+
+class MonthGrid:
+    """一个月的日历版面
+
+    只包含单元格坐标、每天的显示内容、行高和边框位置等纯数据，不依赖openpyxl。
+    所有输出方式共用同一份版面，相同年月和配置的版面只计算一次。
+    叠加了自定义节日的数据表只重新计算有变化的日期（见overlay）。
+    """
+
+    TITLE_ROW = 2         # 标题行
+    WEEKDAY_ROW = 3       # 星期行
+    FIRST_DATE_ROW = 4    # 第一周的日期行
+    FIRST_COL = 2         # B列
+    LAST_COL = 8          # H列
+    WEEKEND_COLS = (7, 8)  # 周六、周日
+    WEEKDAYS = ("周一", "周二", "周三", "周四", "周五", "周六", "周日")
+
+    _cache = LRUCache(1024)  # {(年, 月, id(数据表), 行高): (数据表, 版面)}
+    _cache_lock = threading.RLock()
+
+    def __init__(self, year, month, table, row_heights):
+        self.year = year
+        self.month = month
+        self.title = f"{year}年{month}月"
+
+        # 计算需要的总行数
+        first_weekday = date(year, month, 1).weekday()
+        total_days = calendar.monthrange(year, month)[1]
+        self.total_weeks = (first_weekday + total_days + 6) // 7
+        self.total_rows = 3 + (self.total_weeks * 2)  # 标题行 + 星期行 + (每周2行)
+
+        # 行高
+        heights = [
+            (self.TITLE_ROW, row_heights.title),
+            (self.WEEKDAY_ROW, row_heights.weekday),
+        ]
+        for r in range(self.FIRST_DATE_ROW, self.total_rows + 1, 2):
+            heights.append((r, row_heights.date))
+            heights.append((r + 1, row_heights.lunar))
+        self.row_heights = tuple(heights)
+
+        # 每天的位置和显示内容
+        days = []
+        for offset in range(total_days):
+            current = date(year, month, offset + 1)
+            position = first_weekday + offset
+            row = self.FIRST_DATE_ROW + (position // 7) * 2
+            col = self.FIRST_COL + position % 7
+            days.append(self._grid_day(table, current, row, col))
+        self.days = tuple(days)
+
+        # 日历区域外边框
+        borders = []
+        for row in range(self.TITLE_ROW, self.total_rows + 1):
+            for col in range(self.FIRST_COL, self.LAST_COL + 1):
+                role = self.border_role(row, col)
+                if role:
+                    borders.append((row, col, role))
+        self.borders = tuple(borders)
+
+    def _grid_day(self, table, current, row, col):
+        """某一天的位置和显示内容"""
+        lunar_date = table.lunar_date(current)
+        holiday = table.holiday_name(current)
+        lunar_text = lunar_date_str(lunar_date)
+        if holiday:
+            lunar_text = f"{lunar_text}\n{holiday}"
+        # 周末显示红色（如果不是节假日和节气）
+        is_weekend = col in self.WEEKEND_COLS and not holiday and not lunar_date.solar_term
+        return GridDay(row, col, current.day, lunar_text, holiday, lunar_date.solar_term, is_weekend)
+
+    @classmethod
+    def get(cls, year, month, table, row_heights):
+        """获取某月的版面，相同的年月、数据表和行高只计算一次"""
+        key = (year, month, id(table), row_heights)
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0] is table:
+                metrics.count('month_grid.hit')
+                return entry[1]
+            metrics.count('month_grid.miss')
+            if table.base is not None:
+                grid = cls.get(year, month, table.base, row_heights).overlay(table)
+            else:
+                grid = cls(year, month, table, row_heights)
+            cls._cache[key] = (table, grid)
+            return grid
+
+    def overlay(self, table):
+        """按叠加后的数据表（见YearTable.overlay）生成版面
+
+        只重新计算叠加时有变化的日期，当月没有变化时直接返回本版面。
+        """
+        from copy import copy
+
+        first = date(self.year, self.month, 1).toordinal()
+        offsets = sorted(ordinal - first for ordinal in table.overlaid
+                         if 0 <= ordinal - first < len(self.days))
+        if not offsets:
+            return self
+        grid = copy(self)
+        days = list(self.days)
+        for offset in offsets:
+            day = days[offset]
+            days[offset] = self._grid_day(table, date.fromordinal(first + offset), day.row, day.col)
+        grid.days = tuple(days)
+        return grid
+
+    def border_role(self, row, col):
+        """单元格在日历区域边框中的位置，不在边上时返回None"""
+        vertical = 'top' if row == self.TITLE_ROW else 'bottom' if row == self.total_rows else None
+        horizontal = 'left' if col == self.FIRST_COL else 'right' if col == self.LAST_COL else None
+        if vertical and horizontal:
+            return f"{vertical}-{horizontal}"
+        return vertical or horizontal
+
+
+class StyleRegistry:
+    """日历样式表
+
+    根据编译后配置中的样式一次性创建所有命名样式，单元格按名称引用样式，
+    不再为每个单元格创建新的Font/Alignment对象。
+    """
+
+    TITLE = 'calendar-title'
+    WEEKDAY = 'calendar-weekday'
+    DATE = 'calendar-date'
+    DATE_WEEKEND = 'calendar-date-weekend'
+    LUNAR = 'calendar-lunar'
+    LUNAR_TERM = 'calendar-lunar-term'
+    LUNAR_HOLIDAY = 'calendar-lunar-holiday'
+    LUNAR_WEEKEND = 'calendar-lunar-weekend'
+
+    # 节气文字颜色（橙色）
+    SOLAR_TERM_COLOR = "FFA500"
+
+    # 按配置对象共享的样式表 {id(config): (config, StyleRegistry)}，只保留最近使用的配置
+    _shared = LRUCache(32)
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, config):
+        """同一个配置对象共用一个样式表（样式只读，可以在线程间共享）"""
+        with cls._shared_lock:
+            entry = cls._shared.get(id(config))
+            if entry is None or entry[0] is not config:
+                entry = cls._shared[id(config)] = (config, cls(config))
+            return entry[1]
+
+    def __init__(self, config):
+        from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
+
+        title_style = config.title_style
+        weekday_style = config.weekday_style
+        date_style = config.date_style
+        lunar_style = config.lunar_style
+        fill_color = weekday_style.fill_color
+
+        center = Alignment(horizontal='center', vertical='center')
+        date_alignment = Alignment(horizontal='center', vertical='bottom')
+        lunar_alignment = Alignment(horizontal='center', vertical='top', wrap_text=True)
+        date_font = dict(name=date_style.font_name, size=date_style.font_size)
+        lunar_font = dict(name=lunar_style.font_name, size=lunar_style.font_size)
+
+        self._specs = {
+            self.TITLE: dict(
+                font=Font(name=title_style.font_name,
+                          size=title_style.font_size,
+                          bold=title_style.bold),
+                alignment=center),
+            self.WEEKDAY: dict(
+                font=Font(name=weekday_style.font_name,
+                          size=weekday_style.font_size,
+                          bold=weekday_style.bold,
+                          color=weekday_style.font_color),
+                fill=PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid"),
+                alignment=center),
+            self.DATE: dict(font=Font(**date_font), alignment=date_alignment),
+            self.DATE_WEEKEND: dict(
+                font=Font(color=date_style.weekend_color, **date_font),
+                alignment=date_alignment),
+            self.LUNAR: dict(font=Font(**lunar_font), alignment=lunar_alignment),
+            self.LUNAR_TERM: dict(
+                font=Font(color=self.SOLAR_TERM_COLOR, **lunar_font),
+                alignment=lunar_alignment),
+            self.LUNAR_HOLIDAY: dict(
+                font=Font(color=lunar_style.holiday_color, **lunar_font),
+                alignment=lunar_alignment),
+            self.LUNAR_WEEKEND: dict(
+                font=Font(color=lunar_style.weekend_color, **lunar_font),
+                alignment=lunar_alignment),
+        }
+
+        # 日历区域外边框（粗线），按位置共享同一个Border对象
+        thick = Side(style='thick')
+        self.borders = {
+            'top': Border(top=thick),
+            'bottom': Border(bottom=thick),
+            'left': Border(left=thick),
+            'right': Border(right=thick),
+            'top-left': Border(left=thick, top=thick),
+            'top-right': Border(right=thick, top=thick),
+            'bottom-left': Border(left=thick, bottom=thick),
+            'bottom-right': Border(right=thick, bottom=thick),
+        }
+
+    def register(self, wb):
+        """将命名样式添加到工作簿（每个工作簿只添加一次）"""
+        from openpyxl.styles import NamedStyle
+        existing = set(wb.named_styles)
+        for name, spec in self._specs.items():
+            if name not in existing:
+                wb.add_named_style(NamedStyle(name=name, **spec))
+
+    def date_style(self, is_weekend):
+        """日期单元格的样式名"""
+        return self.DATE_WEEKEND if is_weekend else self.DATE
+
+    def lunar_style(self, is_holiday, is_solar_term, is_weekend):
+        """农历单元格的样式名"""
+        if is_holiday:
+            return self.LUNAR_HOLIDAY
+        if is_weekend:
+            return self.LUNAR_WEEKEND
+        if is_solar_term:
+            return self.LUNAR_TERM
+        return self.LUNAR
+
+
+class SheetTemplates:
+    """月份工作表的骨架模板（每个工作簿一份）
+
+    月份版面只有4、5、6周三种形状。每种形状第一次用到时生成一次骨架：
+    标题、星期行和日历区域边上各单元格的值与样式（命名样式加边框）；之后每个月只按骨架
+    复制单元格的样式索引，再填入标题和每天的内容，不再逐个单元格查找命名样式、创建边框。
+    日期、农历单元格的样式组合同样只计算一次。
+    """
+
+    def __init__(self, wb, registry, column_width):
+        self.wb = wb
+        self.registry = registry
+        self.column_width = column_width
+        self._skeletons = {}  # 周数 -> ((行, 列, 值, 样式索引), ...)
+        self._styles = {}     # (样式名, 边框位置) -> 样式索引
+
+    def _combinations(self):
+        """月份版面中可能出现的命名样式与边框组合（固定顺序）
+
+        标题在左上角；星期行和日期行不在最下面；周末的日期、农历只在最右边两列；
+        其余日历区域边上的单元格只有边框。
+        """
+        registry = self.registry
+        sides = (None, 'left', 'right')
+        bottoms = ('bottom', 'bottom-left', 'bottom-right')
+        combinations = [(registry.TITLE, 'top-left')]
+        combinations += [(registry.WEEKDAY, role) for role in sides]
+        combinations += [(None, role) for role in registry.borders if role != 'top-left']
+        combinations += [(registry.DATE, role) for role in sides]
+        combinations += [(registry.DATE_WEEKEND, role) for role in (None, 'right')]
+        for style_name in (registry.LUNAR, registry.LUNAR_TERM, registry.LUNAR_HOLIDAY):
+            combinations += [(style_name, role) for role in sides + bottoms]
+        combinations += [(registry.LUNAR_WEEKEND, role) for role in (None, 'right', 'bottom', 'bottom-right')]
+        return combinations
+
+    def _prepare(self, ws):
+        """按固定顺序计算版面中可能出现的样式组合
+
+        工作簿中的样式索引因此与渲染了哪些月份无关，增量生成时从上次的文件中复制的工作表
+        可以直接引用新工作簿的样式表。
+        """
+        for style_name, role in self._combinations():
+            # openpyxl在写出单元格时才按出现顺序分配样式索引，这里预先加入
+            self.wb._cell_styles.add(self.style(ws, style_name, role))
+
+    def style(self, ws, style_name, role=None):
+        """命名样式加上边框后的样式索引（StyleArray），每种组合只计算一次"""
+        key = (style_name, role)
+        style = self._styles.get(key)
+        if style is None:
+            from openpyxl.cell import Cell
+
+            # 在不加入工作表的临时单元格上计算
+            scratch = Cell(ws)
+            if style_name:
+                scratch.style = style_name
+            if role:
+                scratch.border = self.registry.borders[role]
+            style = self._styles[key] = scratch._style
+        return style
+
+    def _skeleton(self, ws, grid):
+        """生成一种形状的骨架"""
+        registry = self.registry
+        cells = {(grid.TITLE_ROW, grid.FIRST_COL): (None, registry.TITLE)}
+        for col, day in enumerate(grid.WEEKDAYS, grid.FIRST_COL):
+            cells[(grid.WEEKDAY_ROW, col)] = (day, registry.WEEKDAY)
+        skeleton = []
+        roles = {(row, col): role for row, col, role in grid.borders}
+        for (row, col), (value, style_name) in cells.items():
+            skeleton.append((row, col, value, self.style(ws, style_name, roles.pop((row, col), None))))
+        # 日历区域边上其余的单元格只有边框
+        for (row, col), role in roles.items():
+            skeleton.append((row, col, None, self.style(ws, None, role)))
+        return tuple(skeleton)
+
+    def create_sheet(self, grid, title, index=None):
+        """按骨架生成一个新的工作表"""
+        from copy import copy
+        from openpyxl.worksheet.merge import MergedCellRange
+
+        ws = self.wb.create_sheet(title=title, index=index)
+        if not self._styles:
+            self._prepare(ws)
+        skeleton = self._skeletons.get(grid.total_weeks)
+        if skeleton is None:
+            skeleton = self._skeletons[grid.total_weeks] = self._skeleton(ws, grid)
+
+        # 隐藏网格线，设置列宽（A列为左边空白列）、合并标题和行高
+        ws.sheet_view.showGridLines = False
+        for col in range(grid.FIRST_COL - 1, grid.LAST_COL + 1):
+            ws.column_dimensions[chr(64 + col)].width = self.column_width
+        # 合并区域的边框已在骨架中，不再用merge_cells逐个格式化合并的单元格
+        ws.merged_cells.add(MergedCellRange(ws, 'B2:H2'))
+        for row, height in grid.row_heights:
+            ws.row_dimensions[row].height = height
+
+        for row, col, value, style in skeleton:
+            cell = ws.cell(row=row, column=col)
+            if value is not None:
+                cell.value = value
+            cell._style = copy(style)
+        return ws
+
+    def apply(self, cell, style_name, role=None):
+        """设置单元格的命名样式，位于日历区域边上时再加上边框"""
+        from copy import copy
+        cell._style = copy(self.style(cell.parent, style_name, role))
+
+
+class StreamingWorkbookWriter:
+    """流式写入的工作簿（openpyxl的write_only模式）
+
+    每个月的工作表按行依次写出，写完即释放单元格对象，
+    适合把很多年份或版本的日历写进同一个文件，内存占用不随工作表数量增长。
+    """
+
+    def __init__(self, cal):
+        from openpyxl import Workbook
+
+        self.cal = cal
+        self.wb = Workbook(write_only=True)
+        self.registry = cal.style_registry
+        self.registry.register(self.wb)
+        cal.start_rest_marks()
+        self.sheet_count = 0
+
+        self.column_width = cal.config.column_width
+        self.use_shape = cal.config.rest_mark.use_shape
+
+    def add_month(self, year, month, title=None):
+        """写出一个月的工作表"""
+        with metrics.phase('render'):
+            self._add_month(year, month, title)
+
+    def _add_month(self, year, month, title):
+        from openpyxl.cell import WriteOnlyCell
+
+        registry = self.registry
+        grid = self.cal.get_month_grid(year, month)
+        ws = self.wb.create_sheet(title=title or f"{month}月")
+        self.sheet_count += 1
+
+        # 工作表属性需要在写出第一行之前设置
+        ws.sheet_view.showGridLines = False
+        ws.column_dimensions['A'].width = self.column_width
+        for col in range(grid.FIRST_COL, grid.LAST_COL + 1):  # B到H列
+            ws.column_dimensions[chr(64 + col)].width = self.column_width
+        ws.merged_cells.add('B2:H2')
+        for row, height in grid.row_heights:
+            ws.row_dimensions[row].height = height
+
+        # 先收集本月的单元格（不超过一百个），再按行写出
+        cells = {}
+
+        def cell(row, col, value=None, style=None):
+            c = WriteOnlyCell(ws, value=value)
+            if style:
+                c.style = style
+            cells[(row, col)] = c
+            return c
+
+        cell(grid.TITLE_ROW, grid.FIRST_COL, grid.title, registry.TITLE)
+        for col, day in enumerate(grid.WEEKDAYS, grid.FIRST_COL):
+            cell(grid.WEEKDAY_ROW, col, day, registry.WEEKDAY)
+
+        for day in grid.days:
+            if day.holiday:
+                self.cal.add_rest_mark(ws, day.col - 1, day.row - 1, self.use_shape)
+            cell(day.row, day.col, day.day, registry.date_style(day.is_weekend))
+            cell(day.row + 1, day.col, day.lunar_text,
+                 registry.lunar_style(bool(day.holiday), bool(day.solar_term), day.is_weekend))
+
+        # 边框：边缘上没有内容的单元格也需要写出
+        for row, col, role in grid.borders:
+            target = cells.get((row, col)) or cell(row, col)
+            target.border = registry.borders[role]
+
+        metrics.count('cells', len(cells))
+        for r in range(1, grid.total_rows + 1):
+            ws.append([cells.get((r, c)) for c in range(1, grid.LAST_COL + 1)])
+        # 立即写出表尾并关闭临时文件，不必等到保存整个工作簿
+        ws.close()
+
+    def save(self, filename):
+        """保存工作簿（write_only模式的工作簿只能序列化一次，被占用时只重试替换文件）"""
+        return self.cal.save_with_retry(self.wb, filename)
+
+
+def atomic_write(filename, serialize, retries=3, delay=1):
+    """原子地写入文件，serialize(f)把内容写入二进制文件对象f
+
+    先写入同一目录下的临时文件并fsync，再用os.replace替换目标文件：写入失败或进程中途退出时
+    原来的文件保持不变，也不会留下写了一半的文件。目标文件被其他程序（如打开了该文件的Excel）
+    占用而无法替换时，等待delay秒后重试替换，内容不会重新生成。失败时抛出异常。
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    temp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_filename, 'wb') as f:
+            serialize(f)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(retries):
+            try:
+                os.replace(temp_filename, filename)
+                break
+            except PermissionError:
+                if attempt == retries - 1:
+                    raise
+                metrics.count('save.retries')
+                print(f"{filename} 被其他程序占用，{delay}秒后重试...")
+                time.sleep(delay)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+    # 把重命名也写入磁盘（Windows不支持打开目录，跳过）
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class OutputWriter:
+    """保存生成的工作簿
+
+    工作簿用atomic_write原子地写入，保存失败时上次生成的文件保持不变。
+    background为True时，submit()把保存及之后的处理交给后台线程，主线程可以同时计算下一个工作簿；
+    最多有max_pending个任务在写入或等待写入，再提交时等待前面的任务完成，
+    wait()等待全部任务完成并返回 {文件名: 是否成功}。
+    """
+
+    def __init__(self, background=False, max_pending=1, retries=3, delay=1):
+        self.background = background
+        self.retries = retries
+        self.delay = delay
+        self.results = {}
+        self._futures = {}
+        self._executor = None
+        self._slots = threading.Semaphore(max_pending)
+
+    def save(self, wb, filename):
+        """原子地保存工作簿，返回是否成功"""
+        try:
+            atomic_write(filename, wb.save, self.retries, self.delay)
+            return True
+        except PermissionError:
+            print(f"无法保存文件 {filename}，请确保文件未被其他程序打开")
+        except Exception as e:
+            print(f"保存文件时出错: {e}")
+        return False
+
+    def submit(self, filename, task, *args):
+        """执行保存filename的任务task(*args)（返回是否成功）
+
+        后台模式下在后台线程中执行并立即返回True，结果见wait()；否则直接执行并返回结果。
+        """
+        if not self.background:
+            self.results[filename] = ok = task(*args)
+            return ok
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._slots.acquire()
+        future = self._executor.submit(task, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures[filename] = future
+        return True
+
+    def wait(self):
+        """等待后台任务全部完成，返回 {文件名: 是否成功}"""
+        futures, self._futures = self._futures, {}
+        for filename, future in futures.items():
+            try:
+                self.results[filename] = future.result()
+            except Exception as e:
+                print(f"保存文件 {filename} 时出错: {e}")
+                self.results[filename] = False
+        return dict(self.results)
+
+    def close(self):
+        """等待后台任务完成并结束后台线程"""
+        results = self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+WORKSHEET_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+
+
+def _read_package(filename):
+    """读取.xlsx压缩包中的全部文件，返回 {文件名: 内容}"""
+    import zipfile
+
+    with zipfile.ZipFile(filename) as source:
+        return {info.filename: source.read(info.filename) for info in source.infolist()}
+
+
+def _write_package(filename, parts):
+    """把 {文件名: 内容} 写成压缩包，原子地替换目标文件（见atomic_write）"""
+    import zipfile
+
+    parts = dict(parts)
+
+    def serialize(f):
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as target:
+            # [Content_Types].xml放在最前面
+            target.writestr('[Content_Types].xml', parts.pop('[Content_Types].xml'))
+            for name, data in parts.items():
+                target.writestr(name, data)
+    atomic_write(filename, serialize)
+
+
+def _sheet_parts(parts):
+    """按工作簿中的顺序返回 [(工作表名称, 工作表文件名), ...]"""
+    from xml.sax.saxutils import unescape
+
+    workbook_xml = parts['xl/workbook.xml'].decode('utf-8')
+    rels_xml = parts['xl/_rels/workbook.xml.rels'].decode('utf-8')
+
+    targets = {}
+    for element in re.findall(r'<Relationship\b[^>]*>', rels_xml):
+        attributes = dict(re.findall(r'(\w+)="([^"]*)"', element))
+        targets[attributes['Id']] = attributes['Target']
+
+    sheets = []
+    for element in re.findall(r'<sheet\b[^>]*>', workbook_xml):
+        name = unescape(re.search(r'\bname="([^"]*)"', element).group(1), {'&quot;': '"', '&apos;': "'"})
+        target = targets[re.search(r'\br:id="([^"]+)"', element).group(1)]
+        sheets.append((name, target.lstrip('/') if target.startswith('/') else 'xl/' + target))
+    return sheets
+
+
+def _select_sheets(parts, sheets):
+    """从压缩包中选出部分工作表组成一个新的工作簿
+
+    sheets为 [(新的工作表名称, 原工作表文件名), ...]，按顺序写为sheet1.xml、sheet2.xml……，
+    同一个工作表可以被多个新工作簿选用；样式、主题等其余部分原样保留。
+    返回新的 {文件名: 内容}，不修改parts。
+    """
+    from xml.sax.saxutils import quoteattr
+
+    worksheets = {part for _, part in _sheet_parts(parts)}
+    worksheet_rels = {f"{part.rsplit('/', 1)[0]}/_rels/{part.rsplit('/', 1)[1]}.rels" for part in worksheets}
+    result = {name: data for name, data in parts.items()
+              if name not in worksheets and name not in worksheet_rels}
+
+    elements, relationships, overrides = [], [], []
+    for index, (title, part) in enumerate(sheets, 1):
+        name = f"xl/worksheets/sheet{index}.xml"
+        result[name] = parts[part]
+        directory, filename = part.rsplit('/', 1)
+        rels_part = f"{directory}/_rels/{filename}.rels"
+        if rels_part in parts:
+            result[f"xl/worksheets/_rels/sheet{index}.xml.rels"] = parts[rels_part]
+        elements.append(f'<sheet name={quoteattr(title)} sheetId="{index}" state="visible" r:id="rIdSheet{index}" />')
+        relationships.append(f'<Relationship Type="{WORKSHEET_RELATIONSHIP}" Target="/{name}" Id="rIdSheet{index}" />')
+        overrides.append(f'<Override PartName="/{name}" ContentType="{WORKSHEET_CONTENT_TYPE}" />')
+
+    workbook_xml = parts['xl/workbook.xml'].decode('utf-8')
+    workbook_xml = re.sub(r'<sheets>.*?</sheets>', lambda _: '<sheets>' + ''.join(elements) + '</sheets>',
+                          workbook_xml, count=1, flags=re.S)
+    rels_xml = parts['xl/_rels/workbook.xml.rels'].decode('utf-8')
+    rels_xml = re.sub(r'<Relationship\b[^>]*\bType="%s"[^>]*>' % re.escape(WORKSHEET_RELATIONSHIP), '', rels_xml)
+    content_types = parts['[Content_Types].xml'].decode('utf-8')
+    content_types = re.sub(r'<Override\b[^>]*\bContentType="%s"[^>]*>' % re.escape(WORKSHEET_CONTENT_TYPE),
+                           '', content_types)
+
+    result['xl/workbook.xml'] = workbook_xml.encode('utf-8')
+    result['xl/_rels/workbook.xml.rels'] = rels_xml.replace(
+        '</Relationships>', ''.join(relationships) + '</Relationships>').encode('utf-8')
+    result['[Content_Types].xml'] = content_types.replace('</Types>', ''.join(overrides) + '</Types>').encode('utf-8')
+    return result
+
+
+def _add_default_content_type(content_types, extension, content_type):
+    """在[Content_Types].xml中声明扩展名的默认类型"""
+    if f'Extension="{extension}"' in content_types:
+        return content_types
+    return re.sub(r'(<Types\b[^>]*>)',
+                  rf'\1<Default Extension="{extension}" ContentType="{content_type}"/>',
+                  content_types, count=1)
+
+
+class RestMarkCache:
+    """"休"字图片缓存
+
+    图片内容只取决于字体、字号、颜色、尺寸、文字偏移、放大倍数和Pillow版本，
+    以这些参数的哈希值为键，先查进程内缓存，再查缓存目录中的文件，都没有时才查找字体并绘制。
+    找不到指定字体、使用备用字体绘制的图片只保存在进程内，不写入缓存目录，
+    之后安装了该字体时会重新绘制。
+    """
+
+    SCALE = 2  # 先按2倍大小绘制再缩小，以获得抗锯齿效果
+    # 找不到指定字体时依次尝试的字体
+    FALLBACK_FONTS = ("STXIHEI.TTF",)
+
+    _images = LRUCache(64)
+    _font_paths = {}
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), 'rest_marks')
+
+    @classmethod
+    def key(cls, rest_config):
+        """图片内容的哈希值"""
+        import hashlib
+        from PIL import __version__ as pillow_version
+
+        parts = (rest_config.font_name, rest_config.font_size, rest_config.color,
+                 rest_config.width, rest_config.height,
+                 rest_config.text_offset_x, rest_config.text_offset_y,
+                 cls.SCALE, pillow_version)
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+    def get(self, rest_config):
+        """获取"休"字图片的PNG数据"""
+        key = self.key(rest_config)
+        with self._lock:
+            data = self._images.get(key)
+        if data is not None:
+            metrics.count('rest_mark_cache.hit')
+            return data
+
+        path = os.path.join(self.cache_dir, f"{key}.png")
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            metrics.count('rest_mark_cache.hit')
+        except OSError:
+            metrics.count('rest_mark_cache.miss')
+            with metrics.phase('rest_mark_render'):
+                data = self.render(rest_config)
+            if self.has_font(rest_config.font_name):
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    temp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(temp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(temp_path, path)
+                except OSError as e:
+                    print(f"保存'休'字图片缓存失败: {e}")
+
+        with self._lock:
+            self._images[key] = data
+        return data
+
+    @classmethod
+    def load_font(cls, font_name, font_size):
+        """加载字体，成功加载的字体文件按字体名称记住，之后不再逐个尝试"""
+        from PIL import ImageFont
+
+        with cls._lock:
+            candidates = [cls._font_paths[font_name]] if font_name in cls._font_paths else \
+                [font_name, f"{font_name}.ttf", *cls.FALLBACK_FONTS]
+        for candidate in candidates:
+            if candidate is None:
+                break
+            try:
+                font = ImageFont.truetype(candidate, font_size)
+            except OSError:
+                continue
+            with cls._lock:
+                cls._font_paths[font_name] = candidate
+            return font
+
+        with cls._lock:
+            if cls._font_paths.get(font_name, False) is not None:
+                print("警告：无法加载指定字体，将使用默认字体")
+            cls._font_paths[font_name] = None
+        # 如果还是失败，使用系统默认的字体
+        return ImageFont.load_default()
+
+    @classmethod
+    def has_font(cls, font_name):
+        """上次加载font_name时是否加载到了指定的字体（而不是备用字体或默认字体）"""
+        with cls._lock:
+            return cls._font_paths.get(font_name) in (font_name, f"{font_name}.ttf")
+
+    @classmethod
+    def render(cls, rest_config):
+        """绘制"休"字图片，返回PNG数据"""
+        from PIL import Image, ImageDraw
+
+        scale = cls.SCALE
+        img_size = (rest_config.width, rest_config.height)
+
+        # 创建一个透明背景的图片，使用2倍大小以实现抗锯齿效果
+        img = Image.new('RGBA', (img_size[0] * scale, img_size[1] * scale), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(img)
+        font = cls.load_font(rest_config.font_name, rest_config.font_size * scale)
+
+        # 绘制"休"字（颜色在编译配置时已转换为RGB值）
+        draw.text((rest_config.text_offset_x * scale, rest_config.text_offset_y * scale), "休",
+                  font=font, fill=(*rest_config.rgb, 255))
+
+        # 将图片缩小回原始大小，这样可以获得抗锯齿效果
+        img = img.resize(img_size, Image.LANCZOS)
+
+        output = io.BytesIO()
+        img.save(output, format='PNG')
+        return output.getvalue()
+
+
+class VectorRestMarks:
+    """以矢量图写入的"休"字标记
+
+    渲染时只记录每个标记的位置，保存后在压缩包中为每个工作表写入一个绘图，
+    所有标记都引用同一份"休.svg"（svgBlip），并带一份PNG备用图给不支持SVG的Excel版本。
+    这样生成的文件不需要再运行宏替换图片。
+    """
+
+    EMU_PER_PIXEL = 9525
+    SVG_EXTENSION_URI = "{96DAC541-7B7A-43D3-8B79-37D633B846F1}"
+    IMAGE_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+    DRAWING_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing"
+    DRAWING_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.drawing+xml"
+    # 工作表中<drawing>之后可能出现的元素，<drawing>要插在它们之前
+    ELEMENTS_AFTER_DRAWING = ('legacyDrawing', 'legacyDrawingHF', 'drawingHF', 'picture', 'oleObjects',
+                              'controls', 'webPublishItems', 'tableParts', 'extLst')
+
+    def __init__(self, svg_data, width, height, offset_x, offset_y):
+        self.svg_data = svg_data
+        self.width = width
+        self.height = height
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.marks = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """按配置创建，使用文本框标记或找不到SVG文件时返回None"""
+        rest_config = config.rest_mark
+        if rest_config.use_shape:
+            return None
+        svg_file = rest_config.svg_file
+        if not svg_file:
+            return None
+        # 相对路径先在当前目录查找，再在程序所在目录查找
+        candidates = [svg_file]
+        if not os.path.isabs(svg_file):
+            candidates.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), svg_file))
+        for path in candidates:
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    svg_data = f.read()
+                break
+        else:
+            return None
+        return cls(svg_data, rest_config.width, rest_config.height,
+                   rest_config.offset_x, rest_config.offset_y)
+
+    @property
+    def count(self):
+        return sum(len(marks) for marks in self.marks.values())
+
+    def add(self, sheet_title, col, row):
+        """记录一个标记，col和row从0开始"""
+        self.marks.setdefault(sheet_title, []).append((col, row))
+
+    def _drawing_xml(self, marks):
+        emu = self.EMU_PER_PIXEL
+        cx, cy = self.width * emu, self.height * emu
+        anchors = []
+        for index, (col, row) in enumerate(marks, 1):
+            anchors.append(
+                '<xdr:oneCellAnchor>'
+                f'<xdr:from><xdr:col>{col}</xdr:col><xdr:colOff>{self.offset_x * emu}</xdr:colOff>'
+                f'<xdr:row>{row}</xdr:row><xdr:rowOff>{self.offset_y * emu}</xdr:rowOff></xdr:from>'
+                f'<xdr:ext cx="{cx}" cy="{cy}"/>'
+                '<xdr:pic>'
+                f'<xdr:nvPicPr><xdr:cNvPr id="{index + 1}" name="休 {index}" descr="休"/>'
+                '<xdr:cNvPicPr><a:picLocks noChangeAspect="1"/></xdr:cNvPicPr></xdr:nvPicPr>'
+                '<xdr:blipFill><a:blip r:embed="rId1"><a:extLst>'
+                f'<a:ext uri="{self.SVG_EXTENSION_URI}">'
+                '<asvg:svgBlip xmlns:asvg="http://schemas.microsoft.com/office/drawing/2016/SVG/main" r:embed="rId2"/>'
+                '</a:ext></a:extLst></a:blip><a:stretch><a:fillRect/></a:stretch></xdr:blipFill>'
+                f'<xdr:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+                '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></xdr:spPr>'
+                '</xdr:pic><xdr:clientData/></xdr:oneCellAnchor>')
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<xdr:wsDr xmlns:xdr="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+                'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                + ''.join(anchors) + '</xdr:wsDr>').encode('utf-8')
+
+    def _drawing_rels_xml(self, png_name, svg_name):
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                f'<Relationship Id="rId1" Type="{self.IMAGE_RELATIONSHIP}" Target="../media/{png_name}"/>'
+                f'<Relationship Id="rId2" Type="{self.IMAGE_RELATIONSHIP}" Target="../media/{svg_name}"/>'
+                '</Relationships>').encode('utf-8')
+
+    def _add_sheet_drawing(self, parts, sheet_part, drawing_part):
+        """在工作表中加入<drawing>元素及对应的关系"""
+        rel_id = "rIdRestMarks"
+        sheet_xml = parts[sheet_part].decode('utf-8')
+        if '<drawing ' in sheet_xml:
+            raise ValueError(f"{sheet_part} 中已经有绘图")
+        element = (f'<drawing xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+                   f'r:id="{rel_id}"/>')
+        match = re.search(r'<(?:%s)\b' % '|'.join(self.ELEMENTS_AFTER_DRAWING), sheet_xml)
+        position = match.start() if match else sheet_xml.rindex('</worksheet>')
+        parts[sheet_part] = (sheet_xml[:position] + element + sheet_xml[position:]).encode('utf-8')
+
+        directory, name = sheet_part.rsplit('/', 1)
+        rels_part = f"{directory}/_rels/{name}.rels"
+        relationship = (f'<Relationship Id="{rel_id}" Type="{self.DRAWING_RELATIONSHIP}" '
+                        f'Target="/{drawing_part}"/>')
+        if rels_part in parts:
+            rels_xml = parts[rels_part].decode('utf-8').replace('</Relationships>',
+                                                                relationship + '</Relationships>')
+        else:
+            rels_xml = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                        + relationship + '</Relationships>')
+        parts[rels_part] = rels_xml.encode('utf-8')
+
+    def embed(self, filename, png_data):
+        """把记录的标记写入已保存的工作簿，png_data为备用的位图"""
+        if not self.marks:
+            return 0
+        parts = _read_package(filename)
+        count = self.embed_parts(parts, png_data)
+        _write_package(filename, parts)
+        return count
+
+    def embed_parts(self, parts, png_data):
+        """把记录的标记写入工作簿压缩包的内容 {文件名: 内容}（直接修改parts），返回标记数量"""
+        marks, self.marks = self.marks, {}
+        if not marks:
+            return 0
+
+        png_name, svg_name = "rest_mark.png", "rest_mark.svg"
+        parts[f'xl/media/{png_name}'] = png_data
+        parts[f'xl/media/{svg_name}'] = self.svg_data
+
+        content_types = parts['[Content_Types].xml'].decode('utf-8')
+        content_types = _add_default_content_type(content_types, 'png', 'image/png')
+        content_types = _add_default_content_type(content_types, 'svg', 'image/svg+xml')
+        overrides = []
+
+        drawing_index = 0
+        for title, sheet_part in _sheet_parts(parts):
+            sheet_marks = marks.get(title)
+            if not sheet_marks:
+                continue
+            drawing_index += 1
+            while f'xl/drawings/drawing{drawing_index}.xml' in parts:
+                drawing_index += 1
+            drawing_part = f'xl/drawings/drawing{drawing_index}.xml'
+            parts[drawing_part] = self._drawing_xml(sheet_marks)
+            parts[f'xl/drawings/_rels/drawing{drawing_index}.xml.rels'] = \
+                self._drawing_rels_xml(png_name, svg_name)
+            overrides.append(f'<Override PartName="/{drawing_part}" ContentType="{self.DRAWING_CONTENT_TYPE}"/>')
+            self._add_sheet_drawing(parts, sheet_part, drawing_part)
+
+        parts['[Content_Types].xml'] = content_types.replace(
+            '</Types>', ''.join(overrides) + '</Types>').encode('utf-8')
+        return sum(len(sheet_marks) for sheet_marks in marks.values())
+
+
+# 由Excel保存的VBA工程，包含"替换所有对象为图片"宏（源代码见替换图片.bas），打包时原样写入
+VBA_PROJECT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vbaProject.bin')
+
+
+def package_xlsm(xlsx_filename, xlsm_filename, vba_project=None):
+    """把.xlsx文件打包为启用宏的.xlsm文件
+
+    在压缩包中加入vbaProject.bin（默认为VBA_PROJECT_FILE的内容），修改内容类型和工作簿关系，
+    并给工作簿和各工作表设置与VBA文档模块对应的代码名称。
+    """
+    parts = _read_package(xlsx_filename)
+    workbook_xml = parts['xl/workbook.xml'].decode('utf-8')
+    rels_xml = parts['xl/_rels/workbook.xml.rels'].decode('utf-8')
+    sheet_parts = [part for _, part in _sheet_parts(parts)]
+
+    if vba_project is None:
+        with open(VBA_PROJECT_FILE, 'rb') as f:
+            vba_project = f.read()
+
+    # 工作簿和工作表的代码名称
+    if re.search(r'<workbookPr\b[^>]*codeName=', workbook_xml) is None:
+        if '<workbookPr' in workbook_xml:
+            workbook_xml = workbook_xml.replace('<workbookPr', '<workbookPr codeName="ThisWorkbook"', 1)
+        else:
+            workbook_xml = re.sub(r'(<workbook\b[^>]*>(?:<fileVersion[^>]*/>)?)',
+                                  r'\1<workbookPr codeName="ThisWorkbook"/>', workbook_xml, count=1)
+    parts['xl/workbook.xml'] = workbook_xml.encode('utf-8')
+
+    for index, part in enumerate(sheet_parts, 1):
+        sheet_xml = parts[part].decode('utf-8')
+        code_name = f'Sheet{index}'
+        if '<sheetPr' in sheet_xml:
+            sheet_xml = re.sub(r'<sheetPr\b(?![^>]*codeName=)', f'<sheetPr codeName="{code_name}"',
+                               sheet_xml, count=1)
+        else:
+            sheet_xml = re.sub(r'(<worksheet\b[^>]*>)', rf'\1<sheetPr codeName="{code_name}"/>',
+                               sheet_xml, count=1)
+        parts[part] = sheet_xml.encode('utf-8')
+
+    # 工作簿关系中加入VBA工程
+    if 'relationships/vbaProject' not in rels_xml:
+        rels_xml = rels_xml.replace(
+            '</Relationships>',
+            '<Relationship Id="rIdVbaProject" '
+            'Type="http://schemas.microsoft.com/office/2006/relationships/vbaProject" '
+            'Target="vbaProject.bin"/></Relationships>')
+    parts['xl/_rels/workbook.xml.rels'] = rels_xml.encode('utf-8')
+
+    # 内容类型：工作簿改为启用宏的类型，并声明.bin文件
+    content_types = parts['[Content_Types].xml'].decode('utf-8')
+    content_types = content_types.replace(
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml',
+        'application/vnd.ms-excel.sheet.macroEnabled.main+xml')
+    content_types = _add_default_content_type(content_types, 'bin', 'application/vnd.ms-office.vbaProject')
+    parts['[Content_Types].xml'] = content_types.encode('utf-8')
+    parts['xl/vbaProject.bin'] = vba_project
+
+    _write_package(xlsm_filename, parts)
+    return xlsm_filename
+
+
+_code_version = None
+
+
+def code_version():
+    """程序版本加上本模块源代码的哈希值
+
+    用于增量生成的清单：修改了渲染代码但没有改版本号时，清单同样作废，不会沿用旧的工作表。
+    """
+    global _code_version
+    if _code_version is None:
+        import hashlib
+        with open(__file__, 'rb') as f:
+            _code_version = f"{__version__}+{hashlib.sha256(f.read()).hexdigest()[:16]}"
+    return _code_version
+
+
+class BuildManifest:
+    """增量生成的清单，保存在输出文件旁边（如calendar_2025.manifest.json）
+
+    记录每个月工作表输入内容的哈希值和生成的文件，再次生成时只重新渲染哈希值有变化的月份。
+    程序代码有变化（见code_version）或生成的文件（.xlsx及同名的.xlsm）缺少时清单作废。
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = os.path.splitext(filename)[0] + '.manifest.json'
+
+    def outputs(self):
+        """输出文件及同名的.xlsm中已存在的文件名"""
+        names = [self.filename, os.path.splitext(self.filename)[0] + '.xlsm']
+        return [os.path.basename(name) for name in dict.fromkeys(names) if os.path.exists(name)]
+
+    def load(self):
+        """读取上次生成的 {工作表名称: 哈希值}，没有清单或已作废时返回空字典"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('version') != code_version():
+            return {}
+        # 上次生成的文件被删除时需要重新生成
+        directory = os.path.dirname(self.filename)
+        outputs = manifest.get('outputs') or [os.path.basename(self.filename)]
+        if not all(os.path.exists(os.path.join(directory, name)) for name in outputs):
+            return {}
+        return manifest.get('sheets', {})
+
+    def save(self, sheets):
+        """保存 {工作表名称: 哈希值}，同时记录已生成的文件"""
+        data = json.dumps({'version': code_version(), 'outputs': self.outputs(), 'sheets': sheets},
+                          ensure_ascii=False, indent=2)
+        atomic_write(self.path, lambda f: f.write(data.encode('utf-8')))
+
+    def clear(self):
+        """删除清单（输出文件写入失败时下次会完整生成）"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
 
 class ChineseCalendar:
-    def __init__(self, year, month, config_file='config.json'):
+    def __init__(self, year, month, config_file='config.json', config=None):
         self.year = year
         self.month = month
         
-        # 加载配置文件
-        self.config = self.load_config(config_file)
+        # 加载配置文件（已编译的配置可以直接传入，传入字典时先编译）
+        if config is None:
+            config = self.load_config(config_file)
+        elif not isinstance(config, CompiledConfig):
+            config = CompiledConfig(config)
+        self.config = config
         
         # 从配置文件加载节假日
-        self.holidays = self.config['custom_holidays']['solar']
-        self.lunar_holidays = self.config['custom_holidays']['lunar']
+        self.holidays = self.config.solar_holidays
+        self.lunar_holidays = self.config.lunar_holidays
         
         # 添加农历月份和日期的中文表示
-        self.lunar_month_names = {
-            1: "正月", 2: "二月", 3: "三月", 4: "四月", 5: "五月", 6: "六月",
-            7: "七月", 8: "八月", 9: "九月", 10: "十月", 11: "冬月", 12: "腊月"
-        }
-        self.lunar_day_names = {
-            1: "初一", 2: "初二", 3: "初三", 4: "初四", 5: "初五",
-            6: "初六", 7: "初七", 8: "初八", 9: "初九", 10: "初十",
-            11: "十一", 12: "十二", 13: "十三", 14: "十四", 15: "十五",
-            16: "十六", 17: "十七", 18: "十八", 19: "十九", 20: "二十",
-            21: "廿一", 22: "廿二", 23: "廿三", 24: "廿四", 25: "廿五",
-            26: "廿六", 27: "廿七", 28: "廿八", 29: "廿九", 30: "三十"
-        }
+        self.lunar_month_names = LUNAR_MONTH_NAMES
+        self.lunar_day_names = LUNAR_DAY_NAMES
         
-        # 初始化节假日数据缓存
-        self._holiday_data_cache = None
-        # 获取节假日数据
-        self.holiday_data = self.get_holiday_data()
-        # 创建"休"字图片
-        self.rest_image = self.create_rest_mark()
-
-    def load_config(self, config_file):
-        """加载配置文件"""
-        try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                # 使用默认配置
-                return {
-                    "column_width": 10.5,
-                    "year": 2025,
-                    "custom_holidays": {
-                        "solar": {
-                            "0101": "元旦",
-                            "0501": "劳动节",
-                            "1001": "国庆节"
-                        },
-                        "lunar": {
-                            "0101": "春节",
-                            "0115": "元宵节",
-                            "0505": "端午节",
-                            "0815": "中秋节"
-                        }
-                    }
-                }
-        except Exception as e:
-            print(f"加载配置文件失败: {e}，将使用默认配置")
-            return {
-                "column_width": 10.5,
-                "year": 2025,
-                "custom_holidays": {
-                    "solar": {
-                        "0101": "元旦",
-                        "0501": "劳动节",
-                        "1001": "国庆节"
-                    },
-                    "lunar": {
-                        "0101": "春节",
-                        "0115": "元宵节",
-                        "0505": "端午节",
-                        "0815": "中秋节"
-                    }
-                }
-            }
+        # 节假日数据在第一次用到时加载（进程内共享），生成日历时与农历计算同时进行
+        self._holiday_data = None
+        # "休"字图片和样式表在第一次生成Excel时再创建
+        self._style_registry = None
+        # 当前工作簿中以矢量图写入的"休"字标记，见start_rest_marks
+        self.rest_marks = None
+
+    @property
+    def rest_image(self):
+        """"休"字图片数据"""
+        if not hasattr(self, '_rest_image_data'):
+            self.create_rest_mark()
+        return self._rest_image_data
+
+    @property
+    def holiday_data(self):
+        """节假日数据"""
+        if self._holiday_data is None:
+            self._holiday_data = self.get_holiday_data()
+        return self._holiday_data
+
+    @property
+    def style_registry(self):
+        """样式表"""
+        if self._style_registry is None:
+            self._style_registry = StyleRegistry.shared(self.config)
+        return self._style_registry
+
+    @staticmethod
+    def load_config(config_file):
+        """加载并编译配置文件，见CompiledConfig.load"""
+        return CompiledConfig.load(config_file)
 
     def get_holiday_data(self):
         """获取节假日数据"""
-        # 如果已经有缓存数据，直接返回
-        if self._holiday_data_cache is not None:
-            return self._holiday_data_cache
-            
-        url = "https://cdn.jsdelivr.net/npm/chinese-days/dist/chinese-days.json"
-        try:
-            response = requests.get(url)
-            data = response.json()
-            print("成功获取在线节假日数据")
-            # 缓存数据
-            self._holiday_data_cache = data
-            return data
-        except Exception as e:
-            print(f"获取在线节假日数据失败: {e}")
-            print("将仅使用配置文件中的节假日")
-            default_data = {"holidays": {}, "workdays": {}}
-            self._holiday_data_cache = default_data
-            return default_data
+        return HolidayDataStore.shared(self.config.holiday_data).get()
+
+    @staticmethod
+    def lunar_range(start, end):
+        """批量计算日期区间（含结束日期）内每天的农历和节气，见LunarEngine.lunar_range"""
+        return LunarEngine.lunar_range(start, end)
+
+    def get_year_table(self, year=None):
+        """获取某年的每日数据表"""
+        return YearTable.get(year or self.year, self.holiday_data,
+                             self.holidays, self.lunar_holidays)
+
+    @property
+    def workday_index(self):
+        """工作日索引，见WorkdayIndex"""
+        return WorkdayIndex.get(self.holiday_data, self.holidays, self.lunar_holidays)
+
+    def is_workday(self, date):
+        """判断是否为工作日（已考虑调休上班）"""
+        return self.workday_index.is_workday(date)
 
     def is_holiday(self, date):
         """判断是否为节假日，并返回节假日名称"""
-        # 1. 检查在线节假日数据（法定节假日）
-        date_str = date.strftime("%Y-%m-%d")
-        if date_str in self.holiday_data["holidays"]:
-            holiday_info = self.holiday_data["holidays"][date_str]
-            return True, holiday_info.split(",")[1]  # 返回中文名称
-            
-        # 2. 检查配置文件中的自定义公历节日
-        date_str = date.strftime("%m%d")
-        if date_str in self.holidays:
-            return True, self.holidays[date_str]
-            
-        # 3. 检查配置文件中的自定义农历节日
-        lunar_date = self.get_lunar_date(date)
-        lunar_str = f"{lunar_date.lunar_month:02d}{lunar_date.lunar_day:02d}"
-        if lunar_str in self.lunar_holidays:
-            return True, self.lunar_holidays[lunar_str]
-            
-        return False, ""
+        holiday_name = self.get_year_table(date.year).holiday_name(date)
+        return bool(holiday_name), holiday_name
 
     def get_lunar_date(self, solar_date):
         """将公历日期转换为农历日期"""
-        lunar = Lunar.fromDate(solar_date)
-        # 创建一个类来模拟 ZhDate 的接口
-        class LunarDate:
-            def __init__(self, lunar):
-                self.lunar_month = lunar.getMonth()
-                self.lunar_day = lunar.getDay()
-                # 获取节气（如果当天是节气的话）
-                jieqi = lunar.getJieQi()
-                self.solar_term = jieqi if jieqi else None
-        return LunarDate(lunar)
+        return self.get_year_table(solar_date.year).lunar_date(solar_date)
 
     def get_holiday(self, date):
         """获取节假日信息"""
@@ -157,26 +3016,7 @@ class ChineseCalendar:
 
     def get_lunar_date_str(self, lunar_date):
         """将农历日期转换为中文格式"""
-        # 如果是节气，返回节气名称
-        if lunar_date.solar_term:
-            return lunar_date.solar_term
-            
-        # 确保月份为正数
-        month = abs(lunar_date.lunar_month)
-        if month == 0:  # 处理月份为0的特殊情况
-            month = 1
-        month_str = self.lunar_month_names[month]
-        
-        # 确保日期为正数
-        day = abs(lunar_date.lunar_day)
-        if day == 0:  # 处理日期为0的特殊情况
-            day = 1
-        
-        # 如果是初一，只显示月份
-        if day == 1:
-            return month_str
-        else:
-            return self.lunar_day_names[day]
+        return lunar_date_str(lunar_date)
 
     def generate_month_calendar(self):
         """生成指定月份的日历"""
@@ -208,69 +3048,11 @@ class ChineseCalendar:
                 
             current_day += timedelta(days=1)
         print("\n")
-
-    def create_rest_mark(self):
-        """创建'休'字图片"""
-        # 从配置文件获取休字标记的设置
-        rest_config = self.config.get('layout', {}).get('rest_mark', {})
-        img_size = (
-            rest_config.get('width', 20),
-            rest_config.get('height', 20)
-        )
-        
-        # 创建一个透明背景的图片，使用2倍大小以实现抗锯齿效果
-        scale = 2
-        img = Image.new('RGBA', 
-                       (img_size[0] * scale, img_size[1] * scale), 
-                       (255, 255, 255, 0))
-        draw = ImageDraw.Draw(img)
-        
-        # 从配置文件获取字体设置
-        font_name = rest_config.get('font_name', "华文细黑")
-        font_size = rest_config.get('font_size', 14) * scale  # 字体也放大2倍
-        
-        try:
-            # 尝试使用系统字体名称
-            font = ImageFont.truetype(font_name, font_size)
-        except:
-            try:
-                # 如果失败，尝试使用字体文件路径
-                font = ImageFont.truetype(f"{font_name}.ttf", font_size)
-            except:
-                try:
-                    # 再尝试使用STXIHEI.TTF
-                    font = ImageFont.truetype("STXIHEI.TTF", font_size)
-                except:
-                    print("警告：无法加载指定字体，将使用默认字体")
-                    # 如果还是失败，使用系统默认的中文字体
-                    font = ImageFont.load_default()
-        
-        # 从配置文件获取颜色设置
-        color_str = rest_config.get('color', "008000")
-        # 将颜色代码转换为RGB值
-        r = int(color_str[0:2], 16)
-        g = int(color_str[2:4], 16)
-        b = int(color_str[4:6], 16)
-        
-        # 获取文字偏移量
-        text_offset_x = rest_config.get('text_offset_x', 3) * scale
-        text_offset_y = rest_config.get('text_offset_y', 2) * scale
-        
-        # 绘制"休"字
-        draw.text((text_offset_x, text_offset_y), "休", 
-                 font=font, fill=(r, g, b, 255))
-        
-        # 将图片缩小回原始大小，这样可以获得抗锯齿效果
-        img = img.resize(img_size, Image.LANCZOS)
-        
-        # 将图片保存到内存中
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # 保存图片数据的副本
-        self._rest_image_data = img_byte_arr.getvalue()
-        
+
+    def create_rest_mark(self):
+        """创建'休'字图片（相同设置的图片只绘制一次，并缓存在缓存目录中）"""
+        cache = RestMarkCache(self.config.holiday_data.get('cache_dir'))
+        self._rest_image_data = cache.get(self.config.rest_mark)
         return self._rest_image_data
 
     def get_rest_image(self):
@@ -291,9 +3073,9 @@ class ChineseCalendar:
         size = XDRPositiveSize2D(p2e(w), p2e(h))
 
         # 从配置文件获取偏移设置
-        rest_config = self.config.get('layout', {}).get('rest_mark', {})
-        pixels_right = rest_config.get('offset_x', 44)  # 默认向右偏移44像素
-        pixels_down = rest_config.get('offset_y', 0)    # 默认向下偏移0像素
+        rest_config = self.config.rest_mark
+        pixels_right = rest_config.offset_x
+        pixels_down = rest_config.offset_y
         
         marker = AnchorMarker(
             col=col, 
@@ -303,8 +3085,41 @@ class ChineseCalendar:
         )
         img.anchor = OneCellAnchor(_from=marker, ext=size)
 
+    def start_rest_marks(self):
+        """开始生成一个新的工作簿
+
+        找到"休.svg"时只记录"休"字标记的位置，保存后由finish_workbook统一写入矢量图。
+        """
+        self.rest_marks = VectorRestMarks.from_config(self.config)
+
+    def finish_workbook(self, filename):
+        """工作簿保存后的处理：写入矢量"休"字标记，没有矢量标记时添加VBA宏并转换为.xlsm"""
+        rest_marks, self.rest_marks = self.rest_marks, None
+        return self._finish_workbook(filename, rest_marks)
+
+    def _finish_workbook(self, filename, rest_marks):
+        if rest_marks is not None:
+            try:
+                with metrics.phase('embed_rest_marks'):
+                    count = rest_marks.embed(filename, self.rest_image)
+            except Exception as e:
+                print(f"写入矢量'休'字标记失败: {e}")
+                return False
+            if count:
+                print(f"已写入{count}个矢量'休'字标记")
+            return True
+
+        if filename.endswith('.xlsx'):
+            xlsm_filename = filename[:-5] + '.xlsm'
+            if self.add_vba_macro(filename):
+                print(f"已生成启用宏的Excel文件: {xlsm_filename}")
+        return True
+
     def add_vba_macro(self, filename):
-        """使用win32com添加VBA宏代码"""
+        """添加VBA宏代码，把.xlsx文件另存为启用宏的.xlsm文件
+
+        把程序目录下由Excel保存的vbaProject.bin原样写入压缩包，不需要Excel和pywin32。
+        """
         try:
             # 确保文件是.xlsx格式
             if filename.endswith('.xlsm'):
@@ -312,592 +3127,366 @@ class ChineseCalendar:
             else:
                 temp_filename = filename
                 filename = filename[:-5] + '.xlsm'
-            
-            # 创建Excel应用程序实例
-            excel = win32com.client.Dispatch("Excel.Application")
-            excel.Visible = False
-            excel.DisplayAlerts = False
-            
-            try:
-                # 打开工作簿
-                wb = excel.Workbooks.Open(os.path.abspath(temp_filename))
-                
-                try:
-                    # 尝试访问VBA项目
-                    vba_module = wb.VBProject.VBComponents.Add(1)  # 1 = vbext_ct_StdModule
-                except Exception as e:
-                    if "不信任到 Visual Basic Project 的程序连接" in str(e):
-                        print("\n需要修改Excel安全设置才能添加宏代码：")
-                        print("1. 打开Excel")
-                        print("2. 点击'文件' -> '选项' -> '信任中心'")
-                        print("3. 点击'信任中心设置' -> 'VBA工程对象模型访问'")
-                        print("4. 选中'信任对VBA工程对象模型的访问'")
-                        print("5. 点击'确定'保存设置")
-                        print("\n修改设置后，请重新运行程序。")
-                        return False
-                    else:
-                        raise
-                
-                # 获取Excel文件所在的目录的绝对路径
-                excel_dir = os.path.abspath(os.path.dirname(filename))
-                svg_path = os.path.join(excel_dir, "休.svg")
-                # 确保路径使用正斜杠
-                svg_path = svg_path.replace('\\', '\\\\')
-                
-                vba_code = '''Sub 替换所有对象为图片()
-    Dim ws As Worksheet
-    Dim shp As Shape
-    Dim picturePath As String
-    
-    ' 设置图片路径为绝对路径
-    picturePath = "''' + svg_path + '''"
-    
-    ' 确认图片文件存在
-    If Dir(picturePath) = "" Then
-        MsgBox "找不到指定的图片文件！" & vbCrLf & picturePath, vbExclamation
-        Exit Sub
-    End If
-    
-    ' 遍历当前工作簿的所有工作表
-    For Each ws In ThisWorkbook.Worksheets
-        ' 如果工作表中有形状对象
-        If ws.Shapes.Count > 0 Then
-            ' 从后向前遍历所有形状（这样删除对象时不会影响索引）
-            For i = ws.Shapes.Count To 1 Step -1
-                ' 获取当前形状对象
-                Set shp = ws.Shapes(i)
-                
-                ' 记录原始位置和大小
-                Dim Left As Double: Left = shp.Left
-                Dim Top As Double: Top = shp.Top
-                Dim Width As Double: Width = shp.Width
-                Dim Height As Double: Height = shp.Height
-                
-                ' 删除原始对象
-                shp.Delete
-                
-                ' 插入新图片并设置位置和大小
-                ws.Shapes.AddPicture _
-                    Filename:=picturePath, _
-                    LinkToFile:=False, _
-                    SaveWithDocument:=True, _
-                    Left:=Left, _
-                    Top:=Top, _
-                    Width:=Width, _
-                    Height:=Height
-            Next i
-        End If
-    Next ws
-    
-    MsgBox "所有对象已替换完成！", vbInformation
-End Sub'''
-                
-                # 将代码写入模块
-                vba_module.CodeModule.AddFromString(vba_code)
-                
-                # 另存为.xlsm文件
-                wb.SaveAs(os.path.abspath(filename), FileFormat=52)  # 52 = xlOpenXMLWorkbookMacroEnabled
-                wb.Close()
-                
-                print("已添加VBA宏代码")
-                return True
-            finally:
-                # 确保Excel实例被关闭
-                excel.Quit()
+
+            with metrics.phase('vba_macro'):
+                package_xlsm(temp_filename, filename)
+            print("已添加VBA宏代码")
+            return True
         except Exception as e:
             print(f"添加VBA宏代码失败: {e}")
             return False
 
-    def close_excel_instances(self):
-        """关闭所有Excel实例"""
-        try:
-            import win32com.client
-            excel = win32com.client.GetObject(Class="Excel.Application")
-            excel.Quit()
-        except:
-            pass  # 如果没有打开的Excel实例，会抛出异常，我们可以忽略
-
     def save_with_retry(self, wb, filename, max_retries=3, delay=1):
-        """尝试保存文件，如果失败则重试"""
-        import time
-        
-        for i in range(max_retries):
-            try:
-                # 尝试关闭Excel实例
-                self.close_excel_instances()
-                
-                # 如果文件存在，先尝试删除
-                if os.path.exists(filename):
-                    try:
-                        os.remove(filename)
-                    except:
-                        pass
-                
-                # 保存文件
-                wb.save(filename)
-                return True
-            except PermissionError:
-                if i < max_retries - 1:  # 如果不是最后一次尝试
-                    print(f"保存失败，{delay}秒后重试...")
-                    time.sleep(delay)
-                else:
-                    print(f"无法保存文件 {filename}，请确保文件未被其他程序打开")
-                    return False
-            except Exception as e:
-                print(f"保存文件时出错: {e}")
-                return False
-        return False
+        """原子地保存工作簿（见OutputWriter），目标文件被占用时重试"""
+        with metrics.phase('save'):
+            return OutputWriter(retries=max_retries, delay=delay).save(wb, filename)
+
+    def render_month_sheet(self, templates, grid, title, index=None):
+        """复制骨架模板生成一个月的工作表，只填入标题和每天的内容"""
+        with metrics.phase('render'):
+            ws = templates.create_sheet(grid, title, index)
+            self._fill_month_sheet(ws, grid, templates)
+        # 标题和每天的日期、农历
+        metrics.count('cells', 1 + 2 * len(grid.days))
+        return ws
+
+    def _fill_month_sheet(self, ws, grid, templates):
+        registry = self.style_registry
+        use_shape = self.config.rest_mark.use_shape
+
+        ws['B2'] = grid.title
+
+        # 填充日历数据
+        for day in grid.days:
+            if day.holiday:
+                # 添加"休"字标记
+                self.add_rest_mark(ws, day.col - 1, day.row - 1, use_shape)  # 因为Excel的行列索引从0开始
+
+            date_cell = ws.cell(row=day.row, column=day.col)
+            date_cell.value = day.day
+            templates.apply(date_cell, registry.date_style(day.is_weekend),
+                            grid.border_role(day.row, day.col))
+
+            lunar_cell = ws.cell(row=day.row + 1, column=day.col)
+            lunar_cell.value = day.lunar_text
+            templates.apply(lunar_cell,
+                            registry.lunar_style(bool(day.holiday), bool(day.solar_term), day.is_weekend),
+                            grid.border_role(day.row + 1, day.col))
+
+    def get_month_grid(self, year, month):
+        """获取某月的版面"""
+        return MonthGrid.get(year, month, self.get_year_table(year), self.config.row_heights)
+
+    def iter_month_grids(self, years):
+        """按年月顺序逐个生成各年份每个月的版面
+
+        下载节假日数据、计算农历表（朔日和节气）和排版在后台线程中流水线进行（见Pipeline）：
+        下载数据的同时计算农历表和绘制"休"字图片，调用方处理前面的月份时继续排版后面的月份。
+        调用时立即开始，调用方可以在读取结果之前先做其他准备（如导入openpyxl）。
+        """
+        def lunar(year):
+            # 月末的农历月需要下一年的朔日表
+            LunarEngine.year_boundaries(year)
+            LunarEngine.year_boundaries(year + 1)
+            yield year
+
+        def layout(year):
+            for month in range(1, 13):
+                yield self.get_month_grid(year, month)
+
+        pipeline = Pipeline()
+        pipeline.add_task('fetch', lambda: self.holiday_data)
+        if not self.config.rest_mark.use_shape:
+            pipeline.add_task('rest_mark', lambda: self.rest_image)
+        pipeline.add_stage('lunar', lunar)
+        pipeline.add_stage('layout', layout)
+        return pipeline.run(years)
 
     def generate_excel_calendar(self, filename="calendar.xlsx"):
         """生成Excel格式的日历"""
+        from openpyxl import Workbook
+
         # 先生成.xlsx文件
         wb = Workbook()
-        ws = wb.active
-        ws.title = f"{self.year}年{self.month}月"
+        wb.remove(wb.active)
         
-        # 隐藏网格线
-        ws.sheet_view.showGridLines = False
-
-        # 插入一列在日历区域左边
-        ws.insert_cols(1)
+        # 注册命名样式
+        self.style_registry.register(wb)
+        self.start_rest_marks()
 
         # 从配置文件获取列宽并转换为字符数（1个字符约等于1.1个单位宽度）
-        column_width = self.config.get('column_width', 10.5) * 1.1
-        # 设置列宽
-        for col in range(2, 9):  # B到H列
-            ws.column_dimensions[chr(64 + col)].width = column_width
-        # 设置A列宽度（左边空白列）
-        ws.column_dimensions['A'].width = column_width
-
-        # 从配置文件获取样式设置
-        styles = self.config.get('styles', {})
-        layout = self.config.get('layout', {})
-
-        # 设置标题（从第2行开始）
-        ws.merge_cells('B2:H2')
-        ws['B2'] = f"{self.year}年{self.month}月"
-        title_style = styles.get('title', {})
-        ws['B2'].font = Font(
-            name=title_style.get('font_name', '微软雅黑'),
-            size=title_style.get('font_size', 16),
-            bold=title_style.get('bold', True)
-        )
-        ws['B2'].alignment = Alignment(horizontal='center', vertical='center')
+        templates = SheetTemplates(wb, self.style_registry, self.config.column_width * 1.1)
+        self.render_month_sheet(templates, self.get_month_grid(self.year, self.month),
+                                f"{self.year}年{self.month}月")
 
-        # 设置星期标题
-        weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        weekday_style = styles.get('weekday', {})
+        # 保存为.xlsx文件
+        if not self.save_with_retry(wb, filename):
+            return False
         
-        # 获取背景色和字体颜色
-        fill_color = weekday_style.get('fill_color', "CCCCCC")
-        # 如果没有设置字体颜色，则使用与背景色相反的颜色
-        if 'font_color' not in weekday_style:
-            # 将背景色转换为RGB值
-            r = int(fill_color[0:2], 16)
-            g = int(fill_color[2:4], 16)
-            b = int(fill_color[4:6], 16)
-            # 计算反色
-            r = 255 - r
-            g = 255 - g
-            b = 255 - b
-            # 转换回十六进制
-            font_color = f"{r:02X}{g:02X}{b:02X}"
-        else:
-            font_color = weekday_style.get('font_color')
+        print(f"日历已保存到 {filename}")
         
-        for col, day in enumerate(weekdays, 2):  # 从B列开始
-            cell = ws.cell(row=3, column=col)
-            cell.value = day
-            cell.alignment = Alignment(horizontal='center', vertical='center')  # 水平垂直居中
-            cell.font = Font(
-                name=weekday_style.get('font_name', '微软雅黑'),
-                size=weekday_style.get('font_size', 10),
-                bold=weekday_style.get('bold', True),
-                color=font_color
-            )
-            cell.fill = PatternFill(
-                start_color=fill_color,
-                end_color=fill_color,
-                fill_type="solid"
-            )
+        # 写入矢量"休"字标记，或添加VBA宏代码并转换为.xlsm
+        return self.finish_workbook(filename)
 
-        # 获取当月第一天
-        first_day = datetime(self.year, self.month, 1)
-        week_day = first_day.weekday()
-        
-        # 计算需要的总行数
-        first_weekday = first_day.weekday()
-        total_days = calendar.monthrange(self.year, self.month)[1]
-        total_weeks = (first_weekday + total_days + 6) // 7
-        total_rows = 3 + (total_weeks * 2)  # 标题行 + 星期行 + (每周2行)
-        
-        # 设置行高
-        row_heights = layout.get('row_heights', {})
-        ws.row_dimensions[2].height = row_heights.get('title', 30)  # 标题行
-        ws.row_dimensions[3].height = row_heights.get('weekday', 20)  # 星期行
-        
-        # 设置日期和农历行高
-        for r in range(4, total_rows + 1, 2):
-            ws.row_dimensions[r].height = row_heights.get('date', 30)
-            ws.row_dimensions[r+1].height = row_heights.get('lunar', 30)
-        
-        # 设置日历区域外边框（粗线）
-        border = Border(
-            left=Side(style='thick'),
-            right=Side(style='thick'),
-            top=Side(style='thick'),
-            bottom=Side(style='thick')
-        )
-        
-        # 应用边框到整个日历区域
-        for row in range(2, total_rows + 1):
-            for col in range(2, 9):  # B到H列
-                cell = ws.cell(row=row, column=col)
-                if row == 2:  # 顶部边框
-                    cell.border = Border(top=Side(style='thick'))
-                elif row == total_rows:  # 底部边框
-                    cell.border = Border(bottom=Side(style='thick'))
-                if col == 2:  # 左侧边框
-                    cell.border = Border(left=Side(style='thick'))
-                elif col == 8:  # 右侧边框
-                    cell.border = Border(right=Side(style='thick'))
-                    
-                # 设置角落的边框
-                if row == 2 and col == 2:  # 左上角
-                    cell.border = Border(left=Side(style='thick'), top=Side(style='thick'))
-                elif row == 2 and col == 8:  # 右上角
-                    cell.border = Border(right=Side(style='thick'), top=Side(style='thick'))
-                elif row == total_rows and col == 2:  # 左下角
-                    cell.border = Border(left=Side(style='thick'), bottom=Side(style='thick'))
-                elif row == total_rows and col == 8:  # 右下角
-                    cell.border = Border(right=Side(style='thick'), bottom=Side(style='thick'))
-        
-        # 填充日历数据
-        current_day = first_day
-        row = 4  # 从第4行开始（紧接着星期标题）
-        col = week_day + 3  # 从C列开始，所以要加3而不是2
+    def generate_stream_calendar(self, years, filename="calendar.xlsx"):
+        """使用流式写入生成一个或多个年份的日历，每个月一个工作表
 
-        while current_day.month == self.month:
-            # 日期单元格
-            date_cell = ws.cell(row=row, column=col)
-            # 农历单元格
-            lunar_cell = ws.cell(row=row+1, column=col)
-            
-            # 获取农历和节日信息
-            lunar_date = self.get_lunar_date(current_day)
-            traditional_holiday = self.get_holiday(current_day)
-            is_holiday_day, holiday_name = self.is_holiday(current_day)
-            
-            # 设置日期
-            date_cell.value = current_day.day
-            date_style = styles.get('date', {})
-            date_cell.font = Font(
-                name=date_style.get('font_name', 'DINPro-Bold'),
-                size=date_style.get('font_size', 16)
-            )
-            date_cell.alignment = Alignment(horizontal='center', vertical='bottom')
+        多个年份时工作表名称带上年份，如"2025年1月"。
+        """
+        # 流式写入不使用清单；覆盖输出文件后旧的清单作废，以免之后普通模式误以为月份没有变化
+        BuildManifest(filename).clear()
+        grids = self.iter_month_grids(years)
+        writer = StreamingWorkbookWriter(self)
+        # 排版在后台线程中进行，这里依次写出已排好的月份
+        for grid in grids:
+            title = f"{grid.month}月" if len(years) == 1 else f"{grid.year}年{grid.month}月"
+            writer.add_month(grid.year, grid.month, title)
 
-            # 获取农历文本
-            lunar_text = self.get_lunar_date_str(lunar_date)
-            lunar_style = styles.get('lunar', {})
+        # 保存为.xlsx文件
+        if not writer.save(filename):
+            return False
 
-            if is_holiday_day:
-                # 添加"休"字标记
-                rest_config = self.config.get('layout', {}).get('rest_mark', {})
-                use_shape = rest_config.get('use_shape', True)
-                self.add_rest_mark(ws, col-1, row-1, use_shape)  # 因为Excel的行列索引从0开始
-                
-                # 添加节假日名称（绿色）
-                holiday_text = holiday_name
-                lunar_cell.value = f"{lunar_text}\n{holiday_text}"
-                lunar_cell.font = Font(
-                    name=lunar_style.get('font_name', '华文细黑'),
-                    size=lunar_style.get('font_size', 8),
-                    color=lunar_style.get('holiday_color', "008000")
-                )
-            else:
-                lunar_cell.value = lunar_text
-                # 如果是节气，使用橙色字体
-                if lunar_date.solar_term:
-                    lunar_cell.font = Font(
-                        name=lunar_style.get('font_name', '华文细黑'),
-                        size=lunar_style.get('font_size', 8),
-                        color="FFA500"  # 橙色
-                    )
-                else:
-                    lunar_cell.font = Font(
-                        name=lunar_style.get('font_name', '华文细黑'),
-                        size=lunar_style.get('font_size', 8)
-                    )
-            
-            lunar_cell.alignment = Alignment(horizontal='center', vertical='top', wrap_text=True)
-
-            # 周末设置红色（如果不是节假日和节气）
-            if col in [7, 8] and not is_holiday_day and not lunar_date.solar_term:  # 修改为7和8列
-                date_cell.font = Font(
-                    name=date_style.get('font_name', 'DINPro-Bold'),
-                    size=date_style.get('font_size', 16),
-                    color=date_style.get('weekend_color', "FF0000")
-                )
-                lunar_cell.font = Font(
-                    name=lunar_style.get('font_name', '华文细黑'),
-                    size=lunar_style.get('font_size', 8),
-                    color=lunar_style.get('weekend_color', "FF0000")
-                )
-
-            # 移动到下一个单元格
-            col += 1
-            if col > 8:  # 修改为8
-                col = 3  # 修改为3
-                row += 2
+        print(f"日历已保存到 {filename}（共{writer.sheet_count}个工作表）")
 
-            current_day += timedelta(days=1)
+        # 写入矢量"休"字标记，或添加VBA宏代码并转换为.xlsm
+        return self.finish_workbook(filename)
 
-        # 保存为.xlsx文件
-        if not self.save_with_retry(wb, filename):
+    def month_digest(self, grid):
+        """一个月工作表输入内容的哈希值
+
+        包括当月每天的农历、节假日和节气（已合并法定节假日和自定义节日）、行高、
+        用到的样式和"休"字标记配置，以及程序版本和代码的哈希值（见code_version）。
+        """
+        import hashlib
+
+        config = self.config
+        content = [code_version(), grid.title, grid.row_heights, grid.days, config.column_width,
+                   config.title_style, config.weekday_style, config.date_style, config.lunar_style,
+                   config.rest_mark, self.rest_marks is not None]
+        return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def load_previous_package(self, filename, titles):
+        """读取上次生成的压缩包用于增量更新，工作表与titles不一致或读取失败时返回None"""
+        try:
+            with metrics.phase('load_previous'):
+                parts = _read_package(filename)
+                if [title for title, _ in _sheet_parts(parts)] != titles:
+                    return None
+        except Exception as e:
+            print(f"读取上次生成的 {filename} 失败，将完整生成: {e}")
+            return None
+        return parts
+
+    def save_merged_workbook(self, wb, filename, previous, titles):
+        """保存只渲染了有变化月份的工作簿，其余月份直接复制上次生成的压缩包中的工作表XML
+
+        两次的样式索引相同（见SheetTemplates._prepare），字符串都是内联的，工作表XML可以原样沿用；
+        只去掉上次写入的"休"字标记绘图，保存后与新渲染的月份一起重新写入。
+        """
+        import io
+
+        with metrics.phase('save'):
+            buffer = io.BytesIO()
+            wb.save(buffer)
+            parts = _read_package(buffer)
+            rendered = dict(_sheet_parts(parts))
+            previous_sheets = dict(_sheet_parts(previous))
+            sheets = []
+            copied = []
+            for index, title in enumerate(titles, 1):
+                if title in rendered:
+                    sheets.append((title, rendered[title]))
+                    continue
+                name = f"xl/worksheets/previous{index}.xml"
+                parts[name] = re.sub(rb'<drawing\b[^>]*/>', b'', previous[previous_sheets[title]])
+                sheets.append((title, name))
+                copied.append(name)
+            parts = _select_sheets(parts, sheets)
+            for name in copied:
+                del parts[name]
+            try:
+                _write_package(filename, parts)
+                return True
+            except PermissionError:
+                print(f"无法保存文件 {filename}，请确保文件未被其他程序打开")
+            except Exception as e:
+                print(f"保存文件时出错: {e}")
             return False
-        
-        print(f"日历已保存到 {filename}")
-        
-        # 添加VBA宏代码并转换为.xlsm
-        if filename.endswith('.xlsx'):
-            xlsm_filename = filename[:-5] + '.xlsm'
-            if self.add_vba_macro(filename):
-                print(f"已生成启用宏的Excel文件: {xlsm_filename}")
-        
-        return True
 
-    def generate_year_calendar(self, year=None, filename="calendar.xlsx"):
-        """生成整年的日历，每个月一个工作表"""
+    def generate_year_calendar(self, year=None, filename="calendar.xlsx", backend=None, writer=None):
+        """生成整年的日历，每个月一个工作表
+
+        backend为"stream"时使用流式写入，默认读取配置文件output.backend。
+        普通模式下会在输出文件旁边保存清单，再次生成时只重新渲染内容有变化的月份。
+        writer为后台模式的OutputWriter时，保存及之后的处理交给后台线程，最终结果见writer.wait()。
+        """
         # 先生成.xlsx文件
         if year is None:
-            year = self.config.get('year', 2025)
-            
+            year = self.config.year
+        if backend is None:
+            backend = self.config.backend
+        if backend == 'stream':
+            return self.generate_stream_calendar([year], filename)
+
+        month_grids = self.iter_month_grids([year])
+        from openpyxl import Workbook
+
+        self.start_rest_marks()
+        with metrics.phase('layout'):
+            grids = {f"{grid.month}月": grid for grid in month_grids}
+            digests = {title: self.month_digest(grid) for title, grid in grids.items()}
+
+        # 与上次生成时的清单对比
+        manifest = BuildManifest(filename)
+        previous = manifest.load() if os.path.exists(filename) else {}
+        changed = [title for title in grids if previous.get(title) != digests[title]]
+        metrics.count('months.unchanged', len(grids) - len(changed))
+        if not changed:
+            self.rest_marks = None
+            print(f"{filename} 的内容没有变化，跳过生成")
+            return True
+
+        previous = None
+        # 只有矢量"休"字标记（保存后统一写入）时才沿用上次的工作表，
+        # 位图和文本框标记在各工作表自己的绘图中，只能完整生成
+        if len(changed) < len(grids) and self.rest_marks is not None:
+            previous = self.load_previous_package(filename, list(grids))
+        if previous is None:
+            changed = list(grids)
+
         wb = Workbook()
-        
         # 删除默认创建的工作表
         wb.remove(wb.active)
-        
-        # 为每个月创建一个工作表
-        for month in range(1, 13):
-            # 创建新的日历实例，使用相同的配置文件路径
-            cal = ChineseCalendar(year, month, config_file='config.json')
-            
-            # 创建工作表
-            ws = wb.create_sheet(title=f"{month}月")
-            
-            # 隐藏网格线
-            ws.sheet_view.showGridLines = False
-            
-            # 插入一列在日历区域左边
-            ws.insert_cols(1)
-            
-            # 从配置文件获取列宽
-            column_width = self.config.get('column_width', 10.5)
-            # 设置列宽
-            for col in range(2, 9):  # B到H列
-                ws.column_dimensions[chr(64 + col)].width = column_width
-            # 设置A列宽度（左边空白列）
-            ws.column_dimensions['A'].width = column_width
-
-            # 从配置文件获取样式和布局设置
-            styles = self.config.get('styles', {})
-            layout = self.config.get('layout', {})
-
-            # 设置标题（从第2行开始）
-            ws.merge_cells('B2:H2')
-            ws['B2'] = f"{year}年{month}月"
-            ws['B2'].alignment = Alignment(horizontal='center', vertical='center')
-            title_style = styles.get('title', {})
-            ws['B2'].font = Font(
-                name=title_style.get('font_name', '微软雅黑'),
-                size=title_style.get('font_size', 16),
-                bold=title_style.get('bold', True)
-            )
 
-            # 设置星期标题
-            weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-            weekday_style = styles.get('weekday', {})
-            
-            # 获取背景色和字体颜色
-            fill_color = weekday_style.get('fill_color', "CCCCCC")
-            # 如果没有设置字体颜色，则使用与背景色相反的颜色
-            if 'font_color' not in weekday_style:
-                # 将背景色转换为RGB值
-                r = int(fill_color[0:2], 16)
-                g = int(fill_color[2:4], 16)
-                b = int(fill_color[4:6], 16)
-                # 计算反色
-                r = 255 - r
-                g = 255 - g
-                b = 255 - b
-                # 转换回十六进制
-                font_color = f"{r:02X}{g:02X}{b:02X}"
+        # 注册命名样式
+        self.style_registry.register(wb)
+
+        # 月份工作表的骨架模板，列宽取自配置文件
+        templates = SheetTemplates(wb, self.style_registry, self.config.column_width)
+        
+        # 为每个有变化的月份复制骨架创建工作表，其余月份保存时从上次的文件中复制
+        for title, grid in grids.items():
+            if title in changed:
+                self.render_month_sheet(templates, grid, title)
             else:
-                font_color = weekday_style.get('font_color')
-            
-            for col, day in enumerate(weekdays, 2):  # 从B列开始
-                cell = ws.cell(row=3, column=col)
-                cell.value = day
-                cell.alignment = Alignment(horizontal='center', vertical='center')  # 水平垂直居中
-                cell.font = Font(
-                    name=weekday_style.get('font_name', '微软雅黑'),
-                    size=weekday_style.get('font_size', 10),
-                    bold=weekday_style.get('bold', True),
-                    color=font_color
-                )
-                cell.fill = PatternFill(
-                    start_color=fill_color,
-                    end_color=fill_color,
-                    fill_type="solid"
-                )
-
-            # 获取当月第一天
-            first_day = datetime(year, month, 1)
-            week_day = first_day.weekday()
-            
-            # 计算需要的总行数
-            first_weekday = first_day.weekday()
-            total_days = calendar.monthrange(year, month)[1]
-            total_weeks = (first_weekday + total_days + 6) // 7
-            total_rows = 3 + (total_weeks * 2)  # 标题行 + 星期行 + (每周2行)
-            
-            # 设置行高
-            row_heights = layout.get('row_heights', {})
-            ws.row_dimensions[2].height = row_heights.get('title', 30)  # 标题行
-            ws.row_dimensions[3].height = row_heights.get('weekday', 20)  # 星期行
-            
-            # 设置日期和农历行高
-            for r in range(4, total_rows + 1, 2):
-                ws.row_dimensions[r].height = row_heights.get('date', 30)
-                ws.row_dimensions[r+1].height = row_heights.get('lunar', 30)
-            
-            # 设置日历区域外边框（粗线）
-            border = Border(
-                left=Side(style='thick'),
-                right=Side(style='thick'),
-                top=Side(style='thick'),
-                bottom=Side(style='thick')
-            )
-            
-            # 应用边框到整个日历区域
-            for row in range(2, total_rows + 1):
-                for col in range(2, 9):  # B到H列
-                    cell = ws.cell(row=row, column=col)
-                    if row == 2:  # 顶部边框
-                        cell.border = Border(top=Side(style='thick'))
-                    elif row == total_rows:  # 底部边框
-                        cell.border = Border(bottom=Side(style='thick'))
-                    if col == 2:  # 左侧边框
-                        cell.border = Border(left=Side(style='thick'))
-                    elif col == 8:  # 右侧边框
-                        cell.border = Border(right=Side(style='thick'))
-                        
-                    # 设置角落的边框
-                    if row == 2 and col == 2:  # 左上角
-                        cell.border = Border(left=Side(style='thick'), top=Side(style='thick'))
-                    elif row == 2 and col == 8:  # 右上角
-                        cell.border = Border(right=Side(style='thick'), top=Side(style='thick'))
-                    elif row == total_rows and col == 2:  # 左下角
-                        cell.border = Border(left=Side(style='thick'), bottom=Side(style='thick'))
-                    elif row == total_rows and col == 8:  # 右下角
-                        cell.border = Border(right=Side(style='thick'), bottom=Side(style='thick'))
-            
-            # 填充日历数据
-            current_day = first_day
-            row = 4  # 从第4行开始（紧接着星期标题）
-            col = week_day + 2   # 从C列开始，所以要加3而不是2
-
-            while current_day.month == month:
-                # 日期单元格
-                date_cell = ws.cell(row=row, column=col)
-                # 农历单元格
-                lunar_cell = ws.cell(row=row+1, column=col)
-                
-                # 获取农历和节日信息
-                lunar_date = cal.get_lunar_date(current_day)
-                traditional_holiday = cal.get_holiday(current_day)
-                is_holiday_day, holiday_name = cal.is_holiday(current_day)
-                
-                # 设置日期
-                date_cell.value = current_day.day
-                date_style = styles.get('date', {})
-                date_cell.font = Font(
-                    name=date_style.get('font_name', 'DINPro-Bold'),
-                    size=date_style.get('font_size', 16)
-                )
-                date_cell.alignment = Alignment(horizontal='center', vertical='bottom')
-
-                # 获取农历文本
-                lunar_text = cal.get_lunar_date_str(lunar_date)
-                lunar_style = styles.get('lunar', {})
-
-                if is_holiday_day:
-                    # 添加"休"字标记
-                    rest_config = self.config.get('layout', {}).get('rest_mark', {})
-                    use_shape = rest_config.get('use_shape', True)
-                    self.add_rest_mark(ws, col-1, row-1, use_shape)  # 因为Excel的行列索引从0开始
-                    
-                    # 添加节假日名称（绿色）
-                    holiday_text = holiday_name
-                    lunar_cell.value = f"{lunar_text}\n{holiday_text}"
-                    lunar_cell.font = Font(
-                        name=lunar_style.get('font_name', '华文细黑'),
-                        size=lunar_style.get('font_size', 8),
-                        color=lunar_style.get('holiday_color', "008000")
-                    )
-                else:
-                    lunar_cell.value = lunar_text
-                    # 如果是节气，使用橙色字体
-                    if lunar_date.solar_term:
-                        lunar_cell.font = Font(
-                            name=lunar_style.get('font_name', '华文细黑'),
-                            size=lunar_style.get('font_size', 8),
-                            color="FFA500"  # 橙色
-                        )
-                    else:
-                        lunar_cell.font = Font(
-                            name=lunar_style.get('font_name', '华文细黑'),
-                            size=lunar_style.get('font_size', 8)
-                        )
-                
-                lunar_cell.alignment = Alignment(horizontal='center', vertical='top', wrap_text=True)
-
-                # 周末设置红色（如果不是节假日和节气）
-                if col in [7, 8] and not is_holiday_day and not lunar_date.solar_term:  # 修改为7和8列
-                    date_cell.font = Font(
-                        name=date_style.get('font_name', 'DINPro-Bold'),
-                        size=date_style.get('font_size', 16),
-                        color=date_style.get('weekend_color', "FF0000")
-                    )
-                    lunar_cell.font = Font(
-                        name=lunar_style.get('font_name', '华文细黑'),
-                        size=lunar_style.get('font_size', 8),
-                        color=lunar_style.get('weekend_color', "FF0000")
-                    )
-
-                # 移动到下一个单元格
-                col += 1
-                if col > 8:  # 修改为8
-                    col = 2  # 修改为2
-                    row += 2
-
-                current_day += timedelta(days=1)
+                # 矢量"休"字标记在保存后重新写入
+                for day in grid.days:
+                    if day.holiday:
+                        self.rest_marks.add(title, day.col - 1, day.row - 1)
 
         # 保存为.xlsx文件
-        if not self.save_with_retry(wb, filename):
+        manifest.clear()
+        rest_marks, self.rest_marks = self.rest_marks, None
+        updated = changed if previous is not None else None
+        if writer is None:
+            return self._save_year_workbook(wb, filename, updated, rest_marks, manifest, digests, previous)
+        return writer.submit(filename, self._save_year_workbook, wb, filename, updated, rest_marks,
+                             manifest, digests, previous)
+
+    def _save_year_workbook(self, wb, filename, updated, rest_marks, manifest, digests, previous=None):
+        """保存全年日历（previous为上次生成的压缩包时只保存有变化的月份），写入"休"字标记或VBA宏，最后保存清单"""
+        if previous is None:
+            if not self.save_with_retry(wb, filename):
+                return False
+        elif not self.save_merged_workbook(wb, filename, previous, list(digests)):
             return False
-            
-        print(f"全年日历已保存到 {filename}")
-        
-        # 添加VBA宏代码并转换为.xlsm
-        if filename.endswith('.xlsx'):
-            xlsm_filename = filename[:-5] + '.xlsm'
-            if self.add_vba_macro(filename):
-                print(f"已生成启用宏的Excel文件: {xlsm_filename}")
+
+        if updated:
+            print(f"全年日历已更新 {filename}（重新生成：{'、'.join(updated)}）")
+        else:
+            print(f"全年日历已保存到 {filename}")
         
+        # 写入矢量"休"字标记，或添加VBA宏代码并转换为.xlsm
+        if not self._finish_workbook(filename, rest_marks):
+            return False
+        manifest.save(digests)
         return True
 
+    def generate_overlay_calendars(self, year, calendars, jobs=None):
+        """生成同一年份多个节假日配置的全年日历，各配置之间只有自定义节日不同
+
+        calendars为 {文件名: ChineseCalendar}，样式和布局与self相同，需要使用矢量"休"字标记。
+        各配置的数据表和版面都叠加在self的数据表上（见YearTable.overlay），
+        某个月与法定节假日版面相同时直接共用该月的工作表，只有不同的月份才单独渲染；
+        所有用到的工作表在同一个工作簿中只渲染、保存一次，再按配置选出各自的12个工作表，
+        用线程池并行写出各个文件（压缩和写文件时会释放GIL）。
+        返回 {文件名: 是否成功}。
+        """
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from openpyxl import Workbook
+
+        results = {}
+        pending = []  # (文件名, 日历, 版面, 清单内容)
+        sheets = {}   # id(版面) -> (版面, 合并工作簿中的工作表名称)，相同的版面只渲染一次
+        with metrics.phase('layout'):
+            for filename, cal in calendars.items():
+                cal.start_rest_marks()
+                grids = {f"{month}月": cal.get_month_grid(year, month) for month in range(1, 13)}
+                digests = {title: cal.month_digest(grid) for title, grid in grids.items()}
+                manifest = BuildManifest(filename)
+                if os.path.exists(filename) and manifest.load() == digests:
+                    cal.rest_marks = None
+                    results[filename] = True
+                    print(f"{filename} 的内容没有变化，跳过生成")
+                    continue
+                for grid in grids.values():
+                    if id(grid) not in sheets:
+                        sheets[id(grid)] = (grid, str(len(sheets)))
+                pending.append((filename, cal, grids, digests))
+        if not pending:
+            return results
+        metrics.count('profile_sheets.rendered', len(sheets))
+        metrics.count('profile_sheets.shared', 12 * len(pending) - len(sheets))
+
+        # "休"字标记在写出各个文件时按版面写入，这里只记录位置，不在工作表中插入图片
+        self.start_rest_marks()
+        wb = Workbook()
+        wb.remove(wb.active)
+        self.style_registry.register(wb)
+        templates = SheetTemplates(wb, self.style_registry, self.config.column_width)
+        for grid, sheet_title in sheets.values():
+            self.render_month_sheet(templates, grid, sheet_title)
+        self.rest_marks = None
+
+        with tempfile.TemporaryDirectory() as directory:
+            combined = os.path.join(directory, 'calendars.xlsx')
+            if not self.save_with_retry(wb, combined):
+                results.update((filename, False) for filename, _, _, _ in pending)
+                return results
+            parts = _read_package(combined)
+        sheet_parts = dict(_sheet_parts(parts))
+        png_data = self.rest_image
+
+        def write(filename, cal, grids, digests):
+            try:
+                selected = _select_sheets(parts, [(title, sheet_parts[sheets[id(grid)][1]])
+                                                  for title, grid in grids.items()])
+                for title, grid in grids.items():
+                    for day in grid.days:
+                        if day.holiday:
+                            cal.rest_marks.add(title, day.col - 1, day.row - 1)
+                with metrics.phase('embed_rest_marks'):
+                    count = cal.rest_marks.embed_parts(selected, png_data)
+                manifest = BuildManifest(filename)
+                manifest.clear()
+                _write_package(filename, selected)
+                manifest.save(digests)
+            except Exception as e:
+                print(f"保存文件 {filename} 时出错: {e}")
+                return False
+            finally:
+                cal.rest_marks = None
+            print(f"全年日历已保存到 {filename}（{count}个矢量'休'字标记）")
+            return True
+
+        with metrics.phase('write_profiles'):
+            with ThreadPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(pending))) as executor:
+                futures = {filename: executor.submit(write, filename, cal, grids, digests)
+                           for filename, cal, grids, digests in pending}
+                results.update((filename, future.result()) for filename, future in futures.items())
+        return results
+
     def add_rest_mark_as_shape(self, ws, col, row):
         """使用文本框添加'休'字标记"""
         from openpyxl.drawing.shapes import Shape
@@ -907,18 +3496,17 @@ End Sub'''
         from openpyxl.utils.units import pixels_to_EMU
 
         # 从配置文件获取休字标记的设置
-        rest_config = self.config.get('layout', {}).get('rest_mark', {})
+        rest_config = self.config.rest_mark
         
         # 创建一个文本框
         shape = Shape()
         shape.txBody = RegularTextRun("休")  # 设置文本内容
         
         # 设置文本框样式
-        color_str = rest_config.get('color', "008000")
         font = Font(
-            typeface=rest_config.get('font_name', "华文细黑"),
-            sz=rest_config.get('font_size', 8) * 100,  # 字体大小需要乘以100
-            color=color_str
+            typeface=rest_config.font_name,
+            sz=rest_config.font_size * 100,  # 字体大小需要乘以100
+            color=rest_config.color
         )
         
         # 设置文本属性
@@ -932,10 +3520,10 @@ End Sub'''
         shape.ln = None  # 无边框
         
         # 设置位置和大小
-        width = rest_config.get('width', 15)
-        height = rest_config.get('height', 15)
-        pixels_right = rest_config.get('offset_x', 44)
-        pixels_down = rest_config.get('offset_y', 0)
+        width = rest_config.width
+        height = rest_config.height
+        pixels_right = rest_config.offset_x
+        pixels_down = rest_config.offset_y
         
         # 转换为EMU单位
         p2e = pixels_to_EMU
@@ -955,10 +3543,16 @@ End Sub'''
         ws.add_shape(shape)
 
     def add_rest_mark(self, ws, col, row, use_shape=True):
-        """添加'休'字标记，可选择使用文本框或图片"""
+        """添加'休'字标记，可选择使用文本框、矢量图或图片"""
+        metrics.count('images')
         if use_shape:
             self.add_rest_mark_as_shape(ws, col, row)
+        elif self.rest_marks is not None:
+            # 矢量图在保存后统一写入
+            self.rest_marks.add(ws.title, col, row)
         else:
+            from openpyxl.drawing.image import Image as XLImage
+
             # 使用图片方式
             img = XLImage(self.get_rest_image())
             img.width = 15
@@ -966,28 +3560,560 @@ End Sub'''
             self.offset_image(img, col, row)
             ws.add_image(img)
 
+def parse_years(text):
+    """解析年份列表，如 2020-2035 或 2020,2022,2025-2027"""
+    years = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            start, end = int(start), int(end)
+            if end < start:
+                raise ValueError(f"年份范围错误: {part}")
+            years.extend(range(start, end + 1))
+        else:
+            years.append(int(part))
+    return sorted(set(years))
+
+
+# 子进程中共享的配置（CompiledConfig）
+_worker_config = None
+
+
+def _init_year_worker(config, holiday_data):
+    """子进程初始化：使用父进程编译好的配置和加载好的节假日数据"""
+    global _worker_config
+    _worker_config = config
+    HolidayDataStore.install(holiday_data)
+
+
+def _generate_year_worker(year, filename, writer=None):
+    """在子进程中生成一年的日历"""
+    cal = ChineseCalendar(year, 1, config=_worker_config)
+    return cal.generate_year_calendar(year, filename, writer=writer)
+
+
+def _generate_year_task(year, filename):
+    """进程池任务：生成一年的日历，同时返回本次的计时和计数"""
+    metrics.reset()
+    ok = _generate_year_worker(year, filename)
+    return ok, metrics.snapshot()
+
+
+def generate_years(years, config, jobs=None, filename_pattern="calendar_{year}.xlsx", background=False):
+    """生成多个年份的日历，每年一个工作簿，多个年份时使用进程池并行生成
+
+    只用一个进程且background为True时，每年的工作簿在后台线程中保存，同时计算下一年
+    （保存主要是生成XML，受GIL限制，磁盘较慢、fsync耗时较长时才有明显收益）。
+    config为CompiledConfig。
+    返回 [(年份, 文件名, 是否成功), ...]
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    holiday_data = HolidayDataStore.shared(config.holiday_data).get()
+    jobs = min(jobs or os.cpu_count() or 1, len(years))
+    results = []
+
+    if jobs <= 1:
+        _init_year_worker(config, holiday_data)
+        with OutputWriter(background=background) as writer:
+            for year in years:
+                filename = filename_pattern.format(year=year)
+                results.append((year, filename, _generate_year_worker(year, filename, writer)))
+            saved = writer.wait()
+        return [(year, filename, ok and saved.get(filename, True)) for year, filename, ok in results]
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_year_worker,
+                             initargs=(config, holiday_data)) as executor:
+        futures = []
+        for year in years:
+            filename = filename_pattern.format(year=year)
+            futures.append((year, filename, executor.submit(_generate_year_task, year, filename)))
+        for year, filename, future in futures:
+            try:
+                ok, snapshot = future.result()
+                metrics.merge(snapshot)
+            except Exception as e:
+                print(f"生成{year}年日历失败: {e}")
+                ok = False
+            results.append((year, filename, ok))
+    return results
+
+
+def load_profiles(directory, config):
+    """读取目录中的节假日配置（*.json），返回 {名称: CompiledConfig}，名称为文件名（不含扩展名）
+
+    配置文件的结构与config.json相同，只需写出要覆盖的配置项：
+    custom_holidays替换主配置中的自定义节日（每个配置写出自己的节日），其余配置项与主配置合并。
+    """
+    profiles = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+        except ValueError as e:
+            raise ConfigError(f"配置文件 {path} 格式错误: {e}")
+        if not isinstance(overrides, dict):
+            raise ConfigError(f"配置文件 {path} 的内容应为JSON对象")
+        source = dict(config.source)
+        if 'custom_holidays' in overrides:
+            source['custom_holidays'] = overrides.pop('custom_holidays')
+        try:
+            profiles[name[:-5]] = CompiledConfig(source).merged(overrides)
+        except ConfigError as e:
+            raise ConfigError(f"{path}: {e}")
+    if not profiles:
+        raise ConfigError(f"{directory} 中没有节假日配置文件（*.json）")
+    return profiles
+
+
+def generate_profiles(years, config, profiles, jobs=None, filename_pattern="calendar_{year}_{profile}.xlsx"):
+    """按多个节假日配置生成日历，每个年份、每个配置一个工作簿
+
+    config为主配置，profiles为load_profiles()的结果。与主配置只有自定义节日不同的配置
+    共用同一份农历和法定节假日数据，只渲染与法定节假日版面不同的月份（见generate_overlay_calendars），
+    其余配置（样式、布局等也不同，或者没有矢量"休"字标记）逐个完整生成。
+    返回 [(年份, 配置名称, 文件名, 是否成功), ...]
+    """
+    base_config = CompiledConfig(dict(config.source, custom_holidays={}))
+    overlay = base_config.backend == 'workbook' and VectorRestMarks.from_config(base_config) is not None
+    results = []
+    for year in years:
+        base = ChineseCalendar(year, 1, config=base_config)
+        calendars = {}
+        for name, profile in profiles.items():
+            filename = filename_pattern.format(year=year, profile=name)
+            cal = ChineseCalendar(year, 1, config=profile)
+            if overlay and dict(profile.source, custom_holidays={}) == base_config.source:
+                calendars[filename] = (name, cal)
+            else:
+                results.append((year, name, filename, cal.generate_year_calendar(year, filename)))
+        if calendars:
+            done = base.generate_overlay_calendars(
+                year, {filename: cal for filename, (_, cal) in calendars.items()}, jobs)
+            results.extend((year, name, filename, done[filename])
+                           for filename, (name, _) in calendars.items())
+    return results
+
+
+class RenderedOutputCache:
+    """按总字节数限制大小的LRU缓存，用于保存生成好的文件"""
+
+    def __init__(self, max_bytes):
+        from collections import OrderedDict
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        """item为 (内容, ETag)，超过上限的内容不缓存"""
+        size = len(item[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._items[key] = item
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (data, _) = self._items.popitem(last=False)
+                self.size -= len(data)
+
+
+class CalendarService:
+    """日历下载服务（serve子命令）
+
+    节假日数据、每年的数据表和样式表在进程内常驻，
+    生成好的文件按 (年份, 配置哈希, 格式) 缓存在按大小限制的LRU中。
+    """
+
+    CONTENT_TYPES = {
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'xlsm': 'application/vnd.ms-excel.sheet.macroEnabled.12',
+        **DayExporter.CONTENT_TYPES,
+    }
+
+    # 请求中可以覆盖的配置项，True表示整个配置节都可以覆盖。
+    # 文件路径（svg_file、font_name）、缓存目录和节假日数据来源等只使用服务自己的配置，
+    # 否则客户端可以读取或写入服务器上的任意文件
+    OVERRIDABLE = {
+        'year': True,
+        'column_width': True,
+        'styles': True,
+        'custom_holidays': True,
+        'layout': {
+            'row_heights': True,
+            'rest_mark': {key: True for key in ('width', 'height', 'offset_x', 'offset_y', 'color',
+                                                'text_offset_x', 'text_offset_y', 'use_shape')},
+        },
+    }
+
+    def __init__(self, config, cache_bytes=64 * 1024 * 1024):
+        self.config = config
+        self.cache = RenderedOutputCache(cache_bytes)
+        self._configs = LRUCache(64)  # 相同内容的请求配置共用同一个对象
+        self._configs[self.config_hash(config)] = config
+        self._render_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config_hash(config):
+        """配置内容的哈希值"""
+        import hashlib
+        text = json.dumps(config.source, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def check_overrides(cls, overrides, allowed=None, path=''):
+        """检查请求中的配置只包含OVERRIDABLE中的配置项，否则抛出ConfigError"""
+        allowed = cls.OVERRIDABLE if allowed is None else allowed
+        for key, value in overrides.items():
+            rule = allowed.get(key)
+            if rule is None:
+                raise ConfigError(f"不允许在请求中覆盖配置项 {path}{key}")
+            if rule is not True:
+                if not isinstance(value, dict):
+                    raise ConfigError(f"配置项 {path}{key} 应为JSON对象")
+                cls.check_overrides(value, rule, f"{path}{key}.")
+
+    def resolve_config(self, overrides=None):
+        """合并请求中的配置，相同内容的配置共用同一个对象（样式表等缓存随之共用）"""
+        if overrides:
+            self.check_overrides(overrides)
+        config = self.config.merged(overrides) if overrides else self.config
+        digest = self.config_hash(config)
+        with self._lock:
+            config = self._configs.get(digest) or config
+            self._configs[digest] = config
+            return config, digest
+
+    def warm(self, years=()):
+        """预先加载节假日数据和各年的数据表"""
+        cal = ChineseCalendar(self.config.year, 1, config=self.config)
+        for year in years:
+            cal.get_year_table(year)
+        cal.style_registry
+
+    def get(self, year, fmt, overrides=None):
+        """获取生成好的文件，返回 (内容, ETag, 是否命中缓存)，该格式不可用时返回None"""
+        config, digest = self.resolve_config(overrides)
+        key = (year, digest, fmt)
+        item = self.cache.get(key)
+        if item is not None:
+            metrics.count('output_cache.hit')
+            return item + (True,)
+
+        # 同一个文件同时被多次请求时只生成一次
+        with self._lock:
+            lock = self._render_locks.setdefault((year, digest), threading.Lock())
+        with lock:
+            item = self.cache.get(key)
+            if item is not None:
+                metrics.count('output_cache.hit')
+                return item + (True,)
+            metrics.count('output_cache.miss')
+            if fmt in DayExporter.CONTENT_TYPES:
+                outputs = {fmt: self.export(year, fmt, config)}
+            else:
+                outputs = self.render(year, config)
+            for output_fmt, data in outputs.items():
+                self.cache.put((year, digest, output_fmt), data)
+        with self._lock:
+            self._render_locks.pop((year, digest), None)
+        item = outputs.get(fmt)
+        return None if item is None else item + (False,)
+
+    @staticmethod
+    def _etag(data):
+        import hashlib
+        return '"%s"' % hashlib.sha256(data).hexdigest()[:32]
+
+    def export(self, year, fmt, config):
+        """导出一年的每日数据（jsonl/csv/ics），返回 (内容, ETag)"""
+        cal = ChineseCalendar(year, 1, config=config)
+        records = iter_day_records(date(year, 1, 1), date(year, 12, 31), cal.holiday_data,
+                                   cal.holidays, cal.lunar_holidays)
+        buffer = io.BytesIO()
+        DayExporter.write(fmt, records, buffer)
+        data = buffer.getvalue()
+        return data, self._etag(data)
+
+    def render(self, year, config):
+        """生成一年的日历，返回 {格式: (内容, ETag)}"""
+        import tempfile
+
+        with tempfile.TemporaryDirectory(prefix='chinese_calendar_') as directory:
+            filename = os.path.join(directory, f"calendar_{year}.xlsx")
+            cal = ChineseCalendar(year, 1, config=config)
+            if not cal.generate_year_calendar(year, filename):
+                raise RuntimeError(f"生成{year}年日历失败")
+            outputs = {}
+            for fmt in self.CONTENT_TYPES:
+                path = filename[:-5] + '.' + fmt
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    outputs[fmt] = (data, self._etag(data))
+            return outputs
+
+
+def serve(config, host='127.0.0.1', port=8000, cache_bytes=64 * 1024 * 1024, warm_years=()):
+    """启动日历下载服务
+
+    GET  /calendar/2025.xlsx   下载全年日历（xlsm为启用宏的版本，jsonl/csv/ics为每日数据）
+    POST /calendar/2025.xlsx   请求体为JSON，与配置文件结构相同，覆盖部分配置后生成
+                               （只能覆盖CalendarService.OVERRIDABLE中的配置项）
+    GET  /healthz              健康检查
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    service = CalendarService(config, cache_bytes)
+    service.warm(warm_years)
+
+    class CalendarRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        chunk_size = 64 * 1024
+        max_body = 64 * 1024  # POST请求体（覆盖的配置）的大小上限
+
+        def send_text(self, status, text, close=False):
+            body = text.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if close:
+                # 没有读取的请求体不能留在连接上当作下一个请求
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def handle_calendar(self, overrides=None):
+            match = re.fullmatch(r'/calendar/(\d{4})\.(\w+)', self.path.split('?', 1)[0])
+            if match is None or match.group(2) not in service.CONTENT_TYPES:
+                self.send_text(404, "未找到，请使用 /calendar/<年份>.xlsx\n")
+                return
+            year, fmt = int(match.group(1)), match.group(2)
+            try:
+                item = service.get(year, fmt, overrides)
+            except ConfigError as e:
+                self.send_text(400, f"配置错误: {e}\n")
+                return
+            except Exception as e:
+                self.send_text(500, f"生成失败: {e}\n")
+                return
+            if item is None:
+                self.send_text(404, f"当前配置不生成.{fmt}文件\n")
+                return
+
+            data, etag, cached = item
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', service.CONTENT_TYPES[fmt])
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Content-Disposition', f'attachment; filename="calendar_{year}.{fmt}"')
+            self.send_header('ETag', etag)
+            self.send_header('X-Cache', 'hit' if cached else 'miss')
+            self.end_headers()
+            # 分块写出，不再复制整个文件
+            view = memoryview(data)
+            for start in range(0, len(view), self.chunk_size):
+                self.wfile.write(view[start:start + self.chunk_size])
+
+        def do_GET(self):
+            if self.path == '/healthz':
+                self.send_text(200, "ok\n")
+            else:
+                self.handle_calendar()
+
+        def do_POST(self):
+            length = self.headers.get('Content-Length')
+            if length is None or not re.fullmatch(r'[0-9]+', length.strip()):
+                self.send_text(400, "缺少有效的Content-Length\n", close=True)
+                return
+            length = int(length)
+            if length > self.max_body:
+                self.send_text(413, f"请求体不能超过{self.max_body}字节\n", close=True)
+                return
+            try:
+                overrides = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self.send_text(400, f"请求体不是有效的JSON: {e}\n")
+                return
+            if not isinstance(overrides, dict):
+                self.send_text(400, "请求体应为JSON对象\n")
+                return
+            self.handle_calendar(overrides)
+
+    server = ThreadingHTTPServer((host, port), CalendarRequestHandler)
+    server.daemon_threads = True
+    print(f"日历服务已启动：http://{host}:{server.server_port}/calendar/{config.year}.xlsx")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 # 使用示例
 if __name__ == "__main__":
     import argparse
     
     # 创建命令行参数解析器
-    parser = argparse.ArgumentParser(description='生成中国日历')
+    # 不接受缩写的参数名，以免--profile被当作--profiles
+    parser = argparse.ArgumentParser(description='生成中国日历', allow_abbrev=False)
     parser.add_argument('--year', type=int, help='要生成的年份')
+    parser.add_argument('--years', type=str, help='要生成的多个年份，如 2020-2035 或 2020,2022')
+    parser.add_argument('--jobs', type=int, help='并行生成的进程数（默认为CPU核数）')
+    parser.add_argument('--backend', choices=['workbook', 'stream'], help='工作簿写入方式（stream为流式写入）')
+    parser.add_argument('--output', type=str, help='将--years的所有年份流式写入同一个文件')
+    parser.add_argument('--background-save', action='store_true',
+                        help='--jobs 1时在后台线程中保存，同时计算下一年')
+    parser.add_argument('--profiles', type=str, help='节假日配置目录，每个*.json生成一份日历')
     parser.add_argument('--config', type=str, default='config.json', help='配置文件路径')
+    parser.add_argument('--offline', action='store_true', help='离线模式，只使用缓存的节假日数据')
+    parser.add_argument('--verify-lunar', action='store_true', help='与lunar_python逐日核对1900-2100年的批量农历计算结果')
+    parser.add_argument('--holiday-url', type=str, help='节假日数据地址（覆盖配置文件中的holiday_data.url）')
+    parser.add_argument('--holiday-file', action='append', default=[],
+                        help='本地节假日数据文件（chinese-days.json格式），按日期覆盖在线数据，可以指定多次')
+    parser.add_argument('--profile', choices=['table', 'json'], help='结束时输出各阶段耗时和计数（到标准错误）')
+    commands = parser.add_subparsers(dest='command')
+    serve_parser = commands.add_parser('serve', help='启动日历下载服务')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址')
+    serve_parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    serve_parser.add_argument('--cache-mb', type=int, default=64, help='生成结果缓存的大小上限（MB）')
+    serve_parser.add_argument('--warm-years', type=str, help='启动时预先计算的年份，如 2024-2026')
+    export_parser = commands.add_parser('export', help='导出每日的农历、节气和节假日数据')
+    export_parser.add_argument('--format', choices=sorted(DayExporter.CONTENT_TYPES), default='jsonl',
+                               help='导出格式')
+    export_parser.add_argument('--start', type=date.fromisoformat, help='开始日期（YYYY-MM-DD，默认为当年1月1日）')
+    export_parser.add_argument('--end', type=date.fromisoformat, help='结束日期（含，默认为开始日期所在年的12月31日）')
+    export_parser.add_argument('--output', dest='export_output', default='-', help='输出文件，-为标准输出')
+    compile_parser = commands.add_parser('compile-holidays', help='把chinese-days.json格式的节假日数据编译为二进制文件')
+    compile_parser.add_argument('input', help='节假日数据JSON文件')
+    compile_parser.add_argument('--output', dest='compile_output', help='输出文件（默认为同名的.bin文件）')
     args = parser.parse_args()
+
+    if args.verify_lunar:
+        mismatches = verify_lunar_engine()
+        for day, expected, actual in mismatches[:20]:
+            print(f"{day}: lunar_python={expected} 批量计算={actual}")
+        if mismatches:
+            print(f"\n共有 {len(mismatches)} 天不一致")
+            exit(1)
+        print("1900-2100年每一天的农历和节气均与lunar_python一致")
+        exit(0)
     
+    if args.command == 'compile-holidays':
+        import hashlib
+        with open(args.input, 'rb') as f:
+            raw = f.read()
+        blob = HolidayDataset.compile(json.loads(raw), hashlib.sha256(raw).digest())
+        output = args.compile_output or os.path.splitext(args.input)[0] + '.bin'
+        with open(output, 'wb') as f:
+            f.write(blob)
+        dataset = HolidayDataset(blob)
+        print(f"已编译 {output}（{len(blob)} 字节，{dataset.first_year}-{dataset.first_year + dataset.year_count - 1}年，"
+              f"{len(dataset.values) - 1}个名称）")
+        exit(0)
+
+    started = time.perf_counter()
     try:
+        # 读取并检查配置文件（整个运行过程只读取一次），配置共享的节假日数据存储
+        config = ChineseCalendar.load_config(args.config)
+        if args.backend:
+            config = config.merged({'output': {'backend': args.backend}})
+        if args.holiday_url:
+            config = config.merged({'holiday_data': {'url': args.holiday_url}})
+        if args.holiday_file:
+            files = list(config.holiday_data['files']) + args.holiday_file
+            config = config.merged({'holiday_data': {'files': files}})
+        HolidayDataStore.configure(config.holiday_data, offline=args.offline)
+
+        if args.command == 'serve':
+            serve(config, args.host, args.port, args.cache_mb * 1024 * 1024,
+                  parse_years(args.warm_years) if args.warm_years else ())
+            exit(0)
+
+        if args.command == 'export':
+            # 导出到标准输出时，加载数据的提示信息改为输出到标准错误
+            with contextlib.redirect_stdout(sys.stderr if args.export_output == '-' else sys.stdout):
+                cal = ChineseCalendar(args.year or config.year, 1, config=config)
+                holiday_data = cal.holiday_data
+            start = args.start or date(cal.year, 1, 1)
+            end = args.end or date(start.year, 12, 31)
+            records = iter_day_records(start, end, holiday_data, cal.holidays, cal.lunar_holidays)
+            if args.export_output == '-':
+                DayExporter.write(args.format, records, sys.stdout.buffer)
+            else:
+                counts = []
+                atomic_write(args.export_output,
+                             lambda f: counts.append(DayExporter.write(args.format, records, f)))
+                print(f"已导出 {counts[0]} 天的数据到 {args.export_output}")
+            exit(0)
+
+        if args.profiles:
+            profiles = load_profiles(args.profiles, config)
+            years = parse_years(args.years) if args.years else [args.year or config.year]
+            results = generate_profiles(years, config, profiles, jobs=args.jobs)
+            failed = [f"{year}年{name}" for year, name, _, ok in results if not ok]
+            for year, name, filename, ok in results:
+                print(f"{year}年 {name}：{filename if ok else '生成失败'}")
+            if failed:
+                print(f"\n以下日历生成失败：{', '.join(failed)}")
+                exit(1)
+            print(f"\n已生成 {len(results)} 份日历（{len(profiles)} 个节假日配置）")
+            exit(0)
+
+        if args.years and args.output:
+            cal = ChineseCalendar(2025, 1, config=config)
+            if not cal.generate_stream_calendar(parse_years(args.years), args.output):
+                print("\n生成日历失败。")
+                exit(1)
+            print(f"\n日历生成成功：{args.output}")
+            exit(0)
+
+        if args.years:
+            results = generate_years(parse_years(args.years), config, jobs=args.jobs,
+                                     background=args.background_save)
+            failed = [year for year, _, ok in results if not ok]
+            for year, filename, ok in results:
+                print(f"{year}年：{filename if ok else '生成失败'}")
+            if failed:
+                print(f"\n以下年份生成失败：{', '.join(map(str, failed))}")
+                exit(1)
+            print(f"\n已生成 {len(results)} 个年份的日历")
+            exit(0)
+
         # 创建日历实例
-        cal = ChineseCalendar(args.year if args.year else 2025, 1, config_file=args.config)
+        cal = ChineseCalendar(args.year if args.year else 2025, 1, config=config)
         
         # 生成日历
-        output_filename = f"calendar_{args.year if args.year else cal.config['year']}.xlsx"
+        output_filename = f"calendar_{args.year if args.year else cal.config.year}.xlsx"
         
         # 尝试生成日历
         if not cal.generate_year_calendar(args.year, output_filename):
             print("\n生成日历失败。")
-            print("如果是因为Excel安全设置问题，请按照上述说明修改设置后重试。")
-            print("如果问题仍然存在，请检查是否有其他Excel文件正在使用。")
+            print("请检查是否有其他Excel文件正在使用。")
             exit(1)
         else:
             print("\n日历生成成功！")
@@ -999,7 +4125,14 @@ if __name__ == "__main__":
                 print("1. 将'休.svg'文件放在Excel文件同目录下")
                 print("2. 打开启用宏的Excel文件（.xlsm）")
                 print("3. 点击'启用宏'")
-                print("4. 运行'替换图片'宏")
+                print("4. 运行'替换所有对象为图片'宏")
+    except ConfigError as e:
+        print(f"\n配置文件错误: {e}")
+        exit(1)
     except Exception as e:
         print(f"\n发生错误: {e}")
-        exit(1) 
\ No newline at end of file
+        exit(1)
+    finally:
+        if args.profile:
+            metrics.record_phase('total', time.perf_counter() - started)
+            print(metrics.report(args.profile), file=sys.stderr) 
\ No newline at end of file
@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: 运行时间较长的测试（如逐日核对1900-2100年的农历），可用 -m \"not slow\" 跳过")
@@ -0,0 +1,93 @@
+"""原子写入测试：写入中途失败或目标文件一直被占用时，原来的文件保持不变，也不留下临时文件"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+ORIGINAL = b'original calendar'
+
+
+class BrokenWorkbook:
+    """写出一部分内容后出错的工作簿"""
+
+    def save(self, f):
+        f.write(b'PK\x03\x04 half written')
+        raise RuntimeError('序列化失败')
+
+
+class Workbook:
+    def save(self, f):
+        f.write(b'new calendar')
+
+
+@pytest.fixture
+def target(tmp_path):
+    path = tmp_path / 'calendar_2025.xlsx'
+    path.write_bytes(ORIGINAL)
+    return path
+
+
+def assert_untouched(target):
+    assert target.read_bytes() == ORIGINAL
+    assert os.listdir(target.parent) == [target.name]
+
+
+@pytest.fixture
+def locked(monkeypatch):
+    """模拟目标文件被占用：前times次替换失败"""
+    replace = os.replace
+    calls = []
+
+    def lock(times):
+        def fake_replace(src, dst):
+            calls.append(dst)
+            if len(calls) <= times:
+                raise PermissionError('文件被占用')
+            replace(src, dst)
+        monkeypatch.setattr(cc.os, 'replace', fake_replace)
+        return calls
+
+    return lock
+
+
+def test_serialize_error_keeps_original(target):
+    with pytest.raises(RuntimeError):
+        cc.atomic_write(str(target), BrokenWorkbook().save)
+    assert_untouched(target)
+
+
+def test_replace_keeps_failing(target, locked, capsys):
+    calls = locked(times=3)
+    with pytest.raises(PermissionError):
+        cc.atomic_write(str(target), Workbook().save, retries=3, delay=0)
+    assert len(calls) == 3
+    assert_untouched(target)
+
+
+def test_replace_retried(target, locked, capsys):
+    calls = locked(times=1)
+    cc.atomic_write(str(target), Workbook().save, retries=3, delay=0)
+    assert len(calls) == 2
+    assert target.read_bytes() == b'new calendar'
+    assert os.listdir(target.parent) == [target.name]
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_output_writer_failure(target, background, capsys):
+    with cc.OutputWriter(background=background, delay=0) as writer:
+        writer.submit(str(target), writer.save, BrokenWorkbook(), str(target))
+        results = writer.wait()
+    assert results == {str(target): False}
+    assert "序列化失败" in capsys.readouterr().out
+    assert_untouched(target)
+
+
+def test_output_writer_locked(target, locked, capsys):
+    locked(times=3)
+    assert not cc.OutputWriter(retries=3, delay=0).save(Workbook(), str(target))
+    assert "请确保文件未被其他程序打开" in capsys.readouterr().out
+    assert_untouched(target)
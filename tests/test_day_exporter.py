@@ -0,0 +1,112 @@
+"""DayExporter导出测试：JSONL、CSV、iCalendar解析回来与每日记录一致
+
+日期范围包含春节假期、调休上班和2025年的闰六月；自定义节日的名称含有逗号、分号和反斜杠，
+并且足够长，使iCalendar的SUMMARY需要折行。
+"""
+import csv
+import io
+import json
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+HOLIDAY_DATA = {
+    "holidays": {(date(2025, 1, 28) + timedelta(days=i)).isoformat(): "Spring Festival,春节,4" for i in range(8)},
+    "workdays": {"2025-01-26": "Spring Festival,春节,4", "2025-02-08": "Spring Festival,春节,4"},
+}
+SOLAR_HOLIDAYS = {"0310": "测试节，名称;含有,分隔符\\以及很长很长很长很长的说明文字"}
+LUNAR_HOLIDAYS = {"0115": "元宵节"}
+START = date(2025, 1, 20)
+END = date(2025, 8, 31)
+
+
+@pytest.fixture(scope='module')
+def records():
+    return list(cc.iter_day_records(START, END, HOLIDAY_DATA, SOLAR_HOLIDAYS, LUNAR_HOLIDAYS))
+
+
+def export(fmt, records):
+    stream = io.BytesIO()
+    assert cc.DayExporter.write(fmt, iter(records), stream) == len(records)
+    return stream.getvalue().decode('utf-8')
+
+
+def test_records_cover_range(records):
+    assert [record.date for record in records] == [START + timedelta(days=i) for i in range((END - START).days + 1)]
+    assert any(record.is_leap for record in records)
+    assert any(record.holiday == SOLAR_HOLIDAYS["0310"] for record in records)
+    assert any(record.is_workday and record.weekday >= 5 for record in records)
+
+
+def test_jsonl_round_trip(records):
+    rows = [json.loads(line) for line in export('jsonl', records).splitlines()]
+    assert rows == [{
+        'date': record.date.isoformat(),
+        'weekday': record.weekday + 1,
+        'lunar_month': record.lunar_month,
+        'lunar_day': record.lunar_day,
+        'is_leap': record.is_leap,
+        'lunar': cc.lunar_full_text(record.lunar_month, record.lunar_day, record.is_leap),
+        'solar_term': record.solar_term or "",
+        'holiday': record.holiday,
+        'is_workday': record.is_workday,
+    } for record in records]
+
+
+def test_csv_round_trip(records):
+    reader = csv.DictReader(io.StringIO(export('csv', records), newline=""))
+    assert tuple(reader.fieldnames) == cc.DayExporter.CSV_FIELDS
+    rows = list(reader)
+    assert len(rows) == len(records)
+    for row, record in zip(rows, records):
+        assert date.fromisoformat(row['date']) == record.date
+        assert int(row['weekday']) == record.weekday + 1
+        assert (int(row['lunar_month']), int(row['lunar_day'])) == (record.lunar_month, record.lunar_day)
+        assert bool(int(row['is_leap'])) == record.is_leap
+        assert row['lunar'] == cc.lunar_full_text(record.lunar_month, record.lunar_day, record.is_leap)
+        assert row['solar_term'] == (record.solar_term or "")
+        assert row['holiday'] == record.holiday
+        assert bool(int(row['is_workday'])) == record.is_workday
+
+
+def unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def test_ics_round_trip(records):
+    text = export('ics', records)
+    lines = text.split("\r\n")
+    assert lines[-1] == ""
+    assert all(len(line.encode('utf-8')) <= 75 for line in lines)
+    assert any(line.startswith(" ") for line in lines)
+
+    # 展开续行后逐个读取事件
+    events = []
+    for line in text.replace("\r\n ", "").split("\r\n"):
+        if line == "BEGIN:VEVENT":
+            events.append({})
+        elif events and ":" in line and line != "END:VEVENT":
+            name, value = line.split(":", 1)
+            events[-1][name] = value
+    assert lines[0] == "BEGIN:VCALENDAR" and lines[-2] == "END:VCALENDAR"
+    assert len(events) == len(records)
+
+    for event, record in zip(events, records):
+        day = record.date
+        assert event['UID'] == f"{day:%Y%m%d}@chinese-calendar"
+        assert event['DTSTART;VALUE=DATE'] == f"{day:%Y%m%d}"
+        assert event['DTEND;VALUE=DATE'] == f"{day + timedelta(days=1):%Y%m%d}"
+        parts = [cc.lunar_full_text(record.lunar_month, record.lunar_day, record.is_leap)]
+        parts += [part for part in (record.solar_term, record.holiday) if part]
+        if record.holiday and not record.is_workday:
+            parts.append("休")
+        elif record.is_workday and record.weekday >= 5:
+            parts.append("班")
+        assert unescape(event['SUMMARY']) == " ".join(parts)
@@ -0,0 +1,52 @@
+"""编译后的节假日数据测试：打开失败时关闭映射"""
+import mmap
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+DIGEST = bytes(range(32))
+DATA = {"holidays": {"2025-01-01": "New Year's Day,元旦,1"}, "workdays": {"2025-01-26": "Spring Festival,春节,4"}}
+
+
+@pytest.fixture
+def maps(monkeypatch):
+    """记录open创建的映射"""
+    created = []
+
+    class TrackedMap(mmap.mmap):
+        def __new__(cls, *args, **kwargs):
+            buffer = super().__new__(cls, *args, **kwargs)
+            created.append(buffer)
+            return buffer
+
+    monkeypatch.setattr(mmap, 'mmap', TrackedMap)
+    return created
+
+
+def write(tmp_path, content):
+    path = tmp_path / 'holidays.bin'
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_open_matching_digest(tmp_path, maps):
+    dataset = cc.HolidayDataset.open(write(tmp_path, cc.HolidayDataset.compile(DATA, DIGEST)), DIGEST)
+    assert dataset.names[1:] == ["元旦", "春节"]
+    assert not maps[0].closed
+
+
+def test_digest_mismatch_closes_map(tmp_path, maps):
+    path = write(tmp_path, cc.HolidayDataset.compile(DATA, DIGEST))
+    assert cc.HolidayDataset.open(path, bytes(32)) is None
+    assert maps[0].closed
+
+
+def test_corrupt_names_close_map(tmp_path, maps):
+    content = cc.HolidayDataset.compile(DATA, DIGEST).replace("元旦".encode('utf-8'), b'\xff' * 6)
+    assert cc.HolidayDataset.open(write(tmp_path, content), DIGEST) is None
+    assert maps[0].closed
@@ -0,0 +1,138 @@
+"""节假日数据来源测试：使用本地的http.server模拟镜像
+
+    /fast   立即返回
+    /slow   0.3秒后返回
+    /hang   超过截止时间（5秒）后才返回
+    /drip   立即开始返回，但每0.2秒只发送一个字节
+    /bad    立即返回不符合格式的数据
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+pytest.importorskip('requests')
+
+NEW_YEAR = date(2025, 1, 1)
+
+
+def holiday_data(tag):
+    return {"holidays": {"2025-01-01": f"New Year's Day,元旦-{tag},1"}, "workdays": {"2025-01-26": "Spring Festival,春节,4"}}
+
+
+MIRRORS = {
+    '/fast': (0, holiday_data('fast')),
+    '/slow': (0.3, holiday_data('slow')),
+    '/hang': (5, holiday_data('hang')),
+    '/drip': (0, holiday_data('drip')),
+    '/bad': (0, {"holidays": {"2025-13-01": "不存在的日期"}}),
+}
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        delay, data = MIRRORS[self.path]
+        time.sleep(delay)
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.path == '/drip':
+                for i in range(len(body)):
+                    self.wfile.write(body[i:i + 1])
+                    self.wfile.flush()
+                    time.sleep(0.2)
+            else:
+                self.wfile.write(body)
+        except OSError:
+            pass  # 客户端已超时断开
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def mirror():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MirrorHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield lambda path: f"http://127.0.0.1:{server.server_port}{path}"
+    server.shutdown()
+    server.server_close()
+
+
+def load(tmp_path, urls, timeout=2, files=()):
+    """按给定的地址创建数据存储并加载，返回 (数据, 耗时, 输出)"""
+    store = cc.HolidayDataStore(url=urls[0], mirrors=urls[1:], files=files, timeout=timeout,
+                                cache_dir=str(tmp_path / 'cache'))
+    output = io.StringIO()
+    started = time.monotonic()
+    with contextlib.redirect_stdout(output):
+        data = store.get()
+    return data, time.monotonic() - started, output.getvalue()
+
+
+def source_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'holiday-source']
+
+
+def test_fast_mirror_wins(tmp_path, mirror):
+    data, elapsed, output = load(tmp_path, [mirror('/slow'), mirror('/fast')])
+    assert data.holiday_name(NEW_YEAR) == "元旦-fast"
+    assert mirror('/fast') in output
+    assert elapsed < 0.3
+
+
+def test_slow_mirror_wins_over_hanging_and_invalid(tmp_path, mirror):
+    data, elapsed, _ = load(tmp_path, [mirror('/hang'), mirror('/bad'), mirror('/slow')], timeout=1)
+    assert data.holiday_name(NEW_YEAR) == "元旦-slow"
+    assert data.is_adjusted_workday(date(2025, 1, 26))
+    assert elapsed < 1
+
+
+def test_deadline_and_schema_failures(tmp_path, mirror):
+    data, elapsed, output = load(tmp_path, [mirror('/hang'), mirror('/drip'), mirror('/bad')], timeout=0.5)
+    assert data.holiday_name(NEW_YEAR) == ""
+    assert "格式错误" in output and "没有返回" in output
+    assert elapsed < 1.5
+    # 超时的请求在截止时间后自行结束，不会一直占用线程
+    for _ in range(30):
+        if not source_threads():
+            break
+        time.sleep(0.1)
+    assert not source_threads()
+
+
+def test_local_files_override_by_date_in_order(tmp_path, mirror):
+    first = tmp_path / 'first.json'
+    second = tmp_path / 'second.json'
+    first.write_text(json.dumps({"holidays": {"2025-01-01": "A,第一个文件,1", "2025-01-02": "B,第一个文件,1"}},
+                                ensure_ascii=False), encoding='utf-8')
+    second.write_text(json.dumps({"holidays": {"2025-01-02": "C,第二个文件,1"},
+                                  "workdays": {"2025-01-01": "D,补班,1"}}, ensure_ascii=False), encoding='utf-8')
+    data, _, _ = load(tmp_path, [mirror('/fast')], files=[str(first), str(second)])
+    # 后面的文件优先；同一天改为调休上班时去掉节假日
+    assert data.holiday_name(NEW_YEAR) == ""
+    assert data.is_adjusted_workday(NEW_YEAR)
+    assert data.holiday_name(date(2025, 1, 2)) == "第二个文件"
+    assert data.is_adjusted_workday(date(2025, 1, 26))
+
+
+def test_online_data_over_custom_holidays(tmp_path, mirror):
+    data, _, _ = load(tmp_path, [mirror('/fast')])
+    table = cc.YearTable(2025, data, {"0101": "自定义元旦", "0102": "自定义节日"}, {})
+    assert table.holiday_name(NEW_YEAR) == "元旦-fast"
+    assert table.holiday_name(date(2025, 1, 2)) == "自定义节日"
@@ -0,0 +1,97 @@
+"""LunarEngine批量农历计算与lunar_python逐日结果的一致性测试
+
+1900-2100年间按固定间隔抽样，另外逐日检查所有闰月及其前后相邻的月份；
+分别在使用numpy和不使用numpy（array数组）的情况下计算。
+test_every_day_matches_lunar_python逐日核对1900-2100年的每一天（即 --verify-lunar），标记为slow。
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+lunar_python = pytest.importorskip('lunar_python')
+
+START = date(1900, 1, 1)
+END = date(2100, 12, 31)
+SAMPLE_STEP = 29  # 与朔望月长度错开，抽样的日期落在农历月中的不同位置
+
+
+def leap_month_days():
+    """所有闰月及其前后相邻月份的每一天"""
+    days = set()
+    for year in range(START.year - 1, END.year + 1):
+        lunar_year = lunar_python.LunarYear.fromYear(year)
+        if not lunar_year.getLeapMonth():
+            continue
+        months = lunar_year.getMonths()
+        for i, month in enumerate(months):
+            if month.getMonth() >= 0:
+                continue
+            for neighbour in months[max(i - 1, 0):i + 2]:
+                solar = lunar_python.Solar.fromJulianDay(neighbour.getFirstJulianDay())
+                first = date(solar.getYear(), solar.getMonth(), solar.getDay())
+                for offset in range(neighbour.getDayCount()):
+                    day = first + timedelta(days=offset)
+                    if START <= day <= END:
+                        days.add(day)
+    return days
+
+
+@pytest.fixture(scope='module')
+def expected():
+    """抽样日期 -> lunar_python的 (月份(闰月为负), 日, 节气名称或None)"""
+    days = {START + timedelta(days=offset) for offset in range(0, (END - START).days + 1, SAMPLE_STEP)}
+    days |= leap_month_days()
+    result = {}
+    for day in sorted(days):
+        lunar = lunar_python.Lunar.fromDate(datetime(day.year, day.month, day.day))
+        result[day] = (lunar.getMonth(), lunar.getDay(), lunar.getJieQi() or None)
+    return result
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def engine(request, monkeypatch):
+    """分别使用numpy和array两种实现"""
+    if request.param == 'numpy':
+        numpy = pytest.importorskip('numpy')
+        monkeypatch.setattr(cc, '_numpy', lambda: numpy)
+    else:
+        monkeypatch.setattr(cc, '_numpy', lambda: None)
+    return request.param
+
+
+@pytest.fixture
+def columns(engine):
+    """1900-2100年的批量计算结果"""
+    result = cc.LunarEngine.lunar_range(START, END)
+    assert type(result.month).__module__ == engine
+    return result
+
+
+def test_includes_leap_months(expected):
+    assert sum(1 for month, _, _ in expected.values() if month < 0) > 70 * 29
+
+
+def test_matches_lunar_python(expected, columns):
+    mismatches = []
+    for day, value in expected.items():
+        i = day.toordinal() - columns.start
+        month = int(columns.month[i])
+        if columns.leap[i]:
+            month = -month
+        term = int(columns.term[i])
+        actual = (month, int(columns.day[i]), cc.SOLAR_TERMS[term] if term >= 0 else None)
+        if actual != value:
+            mismatches.append((day, value, actual))
+    assert not mismatches, f"{len(mismatches)}天不一致，如 {mismatches[:5]}"
+
+
+@pytest.mark.slow
+def test_every_day_matches_lunar_python(engine):
+    mismatches = cc.verify_lunar_engine(START.year, END.year)
+    assert not mismatches, f"{len(mismatches)}天不一致，如 {mismatches[:5]}"
@@ -0,0 +1,60 @@
+"""Pipeline的提前结束和出错处理测试：各阶段线程都应退出，不会一直等待"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+
+def pipeline(fail_at=None):
+    def double(item):
+        if item == fail_at:
+            raise ValueError(item)
+        yield item
+        yield item
+
+    return (cc.Pipeline(maxsize=1)
+            .add_stage('first', double)
+            .add_stage('second', double)
+            .add_stage('third', lambda item: [item]))
+
+
+def run_in_thread(target):
+    """在线程中运行target，返回是否在5秒内结束"""
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(5)
+    return not thread.is_alive()
+
+
+def test_all_results():
+    results = []
+    assert run_in_thread(lambda: results.extend(pipeline().run(range(20))))
+    assert results == [i for i in range(20) for _ in range(4)]
+
+
+@pytest.mark.parametrize('taken', [0, 1, 5, 30])
+def test_early_exit(taken):
+    def consume():
+        results = pipeline().run(range(100))
+        for i, _ in enumerate(results):
+            if i + 1 >= taken:
+                break
+        results.close()
+    assert run_in_thread(consume)
+
+
+def test_error_in_stage():
+    errors = []
+
+    def consume():
+        try:
+            list(pipeline(fail_at=10).run(range(100)))
+        except ValueError as e:
+            errors.append(e)
+    assert run_in_thread(consume)
+    assert [e.args for e in errors] == [(10,)]
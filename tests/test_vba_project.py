@@ -0,0 +1,42 @@
+"""启用宏的.xlsm打包测试：vbaProject.bin原样写入，并设置内容类型、工作簿关系和代码名称"""
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+
+@pytest.fixture
+def xlsm(tmp_path):
+    from openpyxl import Workbook
+    wb = Workbook()
+    wb.create_sheet("二月")
+    wb.save(tmp_path / 'calendar.xlsx')
+    cc.package_xlsm(str(tmp_path / 'calendar.xlsx'), str(tmp_path / 'calendar.xlsm'))
+    with zipfile.ZipFile(tmp_path / 'calendar.xlsm') as package:
+        yield package
+
+
+def test_vba_project_copied_unchanged(xlsm):
+    with open(cc.VBA_PROJECT_FILE, 'rb') as f:
+        assert xlsm.read('xl/vbaProject.bin') == f.read()
+
+
+def test_package_parts(xlsm):
+    content_types = xlsm.read('[Content_Types].xml').decode('utf-8')
+    assert 'application/vnd.ms-excel.sheet.macroEnabled.main+xml' in content_types
+    assert 'application/vnd.ms-office.vbaProject' in content_types
+    assert 'relationships/vbaProject' in xlsm.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+    assert 'codeName="ThisWorkbook"' in xlsm.read('xl/workbook.xml').decode('utf-8')
+    assert 'codeName="Sheet2"' in xlsm.read('xl/worksheets/sheet2.xml').decode('utf-8')
+
+
+def test_vba_project_contains_macro():
+    olevba = pytest.importorskip('oletools.olevba')
+    with open(cc.VBA_PROJECT_FILE, 'rb') as f:
+        parser = olevba.VBA_Parser('vbaProject.bin', data=f.read())
+    assert any("Sub 替换所有对象为图片()" in code for _, _, _, code in parser.extract_macros())
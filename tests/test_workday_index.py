@@ -0,0 +1,112 @@
+"""WorkdayIndex与逐日判断、逐日计数结果的一致性测试
+
+节假日数据覆盖2024-2025年，查询范围前后各多出一个月
+（范围之外按周一至周五为工作日，不考虑自定义节日）；批量查询分别在使用numpy和不使用numpy的情况下计算。
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+HOLIDAY_DATA = {
+    "holidays": {
+        **{f"2024-10-0{day}": "National Day,国庆节,3" for day in range(1, 8)},
+        "2025-01-01": "New Year's Day,元旦,1",
+        **{(date(2025, 1, 28) + timedelta(days=i)).isoformat(): "Spring Festival,春节,4" for i in range(8)},
+    },
+    "workdays": {
+        "2024-09-29": "National Day,国庆节,3",     # 周日
+        "2024-10-12": "National Day,国庆节,3",     # 周六
+        "2025-01-26": "Spring Festival,春节,4",    # 周日
+        "2025-02-08": "Spring Festival,春节,4",    # 周六
+    },
+}
+SOLAR_HOLIDAYS = {"0310": "测试节"}  # 2024年为周日，2025年为周一
+
+START = date(2023, 12, 1)
+END = date(2026, 1, 31)
+DAYS = [START + timedelta(days=offset) for offset in range((END - START).days + 1)]
+
+
+def naive_is_workday(day):
+    if not 2024 <= day.year <= 2025:
+        return day.weekday() < 5
+    if day.isoformat() in HOLIDAY_DATA["workdays"]:
+        return True
+    if day.isoformat() in HOLIDAY_DATA["holidays"] or f"{day:%m%d}" in SOLAR_HOLIDAYS:
+        return False
+    return day.weekday() < 5
+
+
+def naive_add_workdays(day, n):
+    step = 1 if n > 0 else -1
+    for _ in range(abs(n)):
+        day += timedelta(days=step)
+        while not naive_is_workday(day):
+            day += timedelta(days=step)
+    return day
+
+
+def naive_count_workdays(start, end):
+    return sum(naive_is_workday(start + timedelta(days=i)) for i in range((end - start).days + 1))
+
+
+@pytest.fixture(scope='module')
+def index():
+    return cc.WorkdayIndex(HOLIDAY_DATA, SOLAR_HOLIDAYS, {})
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def engine(request, monkeypatch):
+    """批量查询分别使用numpy和列表两种实现"""
+    if request.param == 'numpy':
+        numpy = pytest.importorskip('numpy')
+        monkeypatch.setattr(cc, '_numpy', lambda: numpy)
+    else:
+        monkeypatch.setattr(cc, '_numpy', lambda: None)
+    return request.param
+
+
+def as_list(result):
+    return result.tolist() if hasattr(result, 'tolist') else list(result)
+
+
+def pairs():
+    rng = random.Random(2025)
+    result = [(START, END), (END, START), (date(2024, 10, 1), date(2024, 10, 7)),
+              (date(2023, 12, 31), date(2024, 1, 1)), (date(2025, 12, 31), date(2026, 1, 2))]
+    result += [(rng.choice(DAYS), rng.choice(DAYS)) for _ in range(300)]
+    return result
+
+
+def test_is_workday(index):
+    assert [index.is_workday(day) for day in DAYS] == [naive_is_workday(day) for day in DAYS]
+
+
+def test_next_workday(index):
+    assert [index.next_workday(day) for day in DAYS] == [naive_add_workdays(day, 1) for day in DAYS]
+
+
+@pytest.mark.parametrize('n', [-30, -5, -1, 0, 1, 5, 30])
+def test_add_workdays(index, n):
+    assert [index.add_workdays(day, n) for day in DAYS] == [naive_add_workdays(day, n) for day in DAYS]
+
+
+def test_count_workdays(index):
+    for start, end in pairs():
+        assert index.count_workdays(start, end) == naive_count_workdays(start, end), (start, end)
+
+
+def test_batch_queries(index, engine):
+    assert as_list(index.is_workday_many(DAYS)) == [naive_is_workday(day) for day in DAYS]
+    assert as_list(index.next_workday_many(DAYS)) == [naive_add_workdays(day, 1) for day in DAYS]
+    steps = [(i % 61) - 30 for i in range(len(DAYS))]
+    assert as_list(index.add_workdays_many(DAYS, steps)) == [naive_add_workdays(day, n) for day, n in zip(DAYS, steps)]
+    starts, ends = zip(*pairs())
+    assert as_list(index.count_workdays_many(starts, ends)) == [naive_count_workdays(a, b) for a, b in zip(starts, ends)]
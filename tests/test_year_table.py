@@ -0,0 +1,85 @@
+"""YearTable叠加自定义节日的测试
+
+叠加得到的表与直接完整计算的表逐日一致；同一天有多个来源时，
+法定节假日优先于自定义公历节日，公历节日优先于农历节日；调休上班日仍然是工作日。
+不同的节日配置共用只含法定节假日的表，互不影响。
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chinese_calendar as cc  # noqa: E402
+
+YEAR = 2025
+HOLIDAY_DATA = {
+    "holidays": {
+        "2025-01-01": "New Year's Day,元旦,1",
+        **{(date(2025, 1, 28) + timedelta(days=i)).isoformat(): "Spring Festival,春节,4" for i in range(8)},
+    },
+    "workdays": {"2025-01-26": "Spring Festival,春节,4", "2025-02-08": "Spring Festival,春节,4"},
+}
+PROFILE = {
+    'solar': {
+        "0101": "公历新年",   # 与法定节假日同一天
+        "0126": "调休纪念日",  # 调休上班日
+        "0212": "公历节",      # 与正月十五同一天
+        "0310": "植树周",
+    },
+    'lunar': {
+        "0115": "元宵节",
+        "1200": "除夕",        # 2025年1月28日，在春节假期中
+        "0202": "龙抬头",
+    },
+}
+OTHER = {'solar': {"0310": "另一个地区的节日"}, 'lunar': {}}
+DAYS = [date(YEAR, 1, 1) + timedelta(days=i) for i in range(365)]
+
+
+@pytest.fixture
+def data():
+    # 每个测试使用新的数据对象，不与其他测试共用缓存的表
+    return cc.HolidayDataset.coerce(HOLIDAY_DATA)
+
+
+def columns(table):
+    return ([table.holiday_name(day) for day in DAYS], [table.is_workday(day) for day in DAYS],
+            table.lunar_month, table.lunar_day, table.leap, table.solar_term, table.weekday)
+
+
+def test_overlay_matches_full_table(data):
+    overlaid = cc.YearTable.get(YEAR, data, PROFILE['solar'], PROFILE['lunar'])
+    full = cc.YearTable(YEAR, data, PROFILE['solar'], PROFILE['lunar'])
+    assert overlaid.base is cc.YearTable.get(YEAR, data, {}, {})
+    assert columns(overlaid) == columns(full)
+
+
+def test_precedence(data):
+    table = cc.YearTable.get(YEAR, data, PROFILE['solar'], PROFILE['lunar'])
+    assert table.holiday_name(date(2025, 1, 1)) == "元旦"
+    assert table.holiday_name(date(2025, 1, 28)) == "春节"
+    assert table.holiday_name(date(2025, 2, 12)) == "公历节"
+    assert "元宵节" not in [table.holiday_name(day) for day in DAYS]
+    assert table.holiday_name(date(2025, 3, 1)) == "龙抬头"
+    assert table.holiday_name(date(2025, 3, 10)) == "植树周"
+    assert not table.is_workday(date(2025, 3, 10))
+    assert table.holiday_name(date(2025, 1, 26)) == "调休纪念日"
+    assert table.is_workday(date(2025, 1, 26))
+    assert table.overlaid == {date(2025, month, day).toordinal()
+                              for month, day in ((1, 26), (2, 12), (3, 1), (3, 10))}
+
+
+def test_profiles_share_base_without_leaking(data):
+    base = cc.YearTable.get(YEAR, data, {}, {})
+    before = columns(base)
+    first = cc.YearTable.get(YEAR, data, PROFILE['solar'], PROFILE['lunar'])
+    second = cc.YearTable.get(YEAR, data, OTHER['solar'], OTHER['lunar'])
+    assert first.base is base and second.base is base
+    assert columns(base) == before
+    assert base.holiday_name(date(2025, 3, 10)) == ""
+    assert second.holiday_name(date(2025, 3, 10)) == "另一个地区的节日"
+    assert second.holiday_name(date(2025, 2, 12)) == ""
+    assert first.lunar_month is base.lunar_month
@@ -2,13 +2,14 @@ Sub 
     Dim ws As Worksheet
     Dim shp As Shape
     Dim picturePath As String
+    Dim i As Long
     
-    ' ͼƬ· - ޸ΪʵͼƬ·
-    picturePath = "D:\Green\ű\\.svg"
+    ' ͼƬڹͬĿ¼£ChrW(&H4F11)""֣ϵͳҳӰ죩
+    picturePath = ThisWorkbook.Path & Application.PathSeparator & ChrW(&H4F11) & ".svg"
     
     ' ȷͼƬļ
     If Dir(picturePath) = "" Then
-        MsgBox "ҲָͼƬļ", vbExclamation
+        MsgBox "ҲָͼƬļ" & vbCrLf & picturePath, vbExclamation
         Exit Sub
     End If
     